@@ -0,0 +1,129 @@
+"""Shared helpers for the ellar-jwt benchmarks."""
+
+import asyncio
+import contextlib
+import json
+import secrets
+import threading
+import time
+import typing as t
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+from jwt.algorithms import get_default_algorithms
+from jwt.utils import base64url_encode
+
+_CURVES = {"ES256": ec.SECP256R1, "ES384": ec.SECP384R1, "ES512": ec.SECP521R1}
+
+
+def generate_pem_keys(algorithm: str) -> t.Tuple[str, str]:
+    """
+    Returns a freshly generated (private, public) PEM key pair for `algorithm`,
+    or a (secret, secret) pair for HMAC algorithms.
+    """
+    if algorithm.startswith("HS"):
+        secret = secrets.token_hex(32)
+        return secret, secret
+
+    if algorithm.startswith("ES"):
+        private_key: t.Any = ec.generate_private_key(_CURVES[algorithm]())
+    elif algorithm == "EdDSA":
+        private_key = ed25519.Ed25519PrivateKey.generate()
+    else:
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+    public_pem = (
+        private_key.public_key()
+        .public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.SubjectPublicKeyInfo,
+        )
+        .decode()
+    )
+    return private_pem, public_pem
+
+
+def measure(func: t.Callable[[], t.Any], number: int) -> float:
+    """Calls `func` `number` times and returns the achieved operations per second."""
+    func()  # warm up
+    start = time.perf_counter()
+    for _ in range(number):
+        func()
+    return number / (time.perf_counter() - start)
+
+
+async def measure_async(
+    func: t.Callable[[], t.Awaitable[t.Any]], number: int, concurrency: int = 1
+) -> float:
+    """Awaits `func` `number` times, `concurrency` calls at a time, and returns ops/s."""
+    await func()  # warm up, e.g. starts the process pool
+
+    async def worker(count: int) -> None:
+        for _ in range(count):
+            await func()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(number // concurrency) for _ in range(concurrency)))
+    return (number // concurrency * concurrency) / (time.perf_counter() - start)
+
+
+def make_payload(claim_count: int) -> t.Dict[str, t.Any]:
+    """Returns a payload with `claim_count` structured custom claims."""
+    return {
+        f"claim_{index}": {
+            "id": index,
+            "name": f"resource-{index}",
+            "scopes": ["read", "write"],
+            "ratio": index / 7,
+            "active": index % 2 == 0,
+        }
+        for index in range(claim_count)
+    }
+
+
+def make_jwk(algorithm: str, public_pem: str, kid: str) -> t.Dict[str, t.Any]:
+    """Returns the public JWK of `public_pem`, identified by `kid`."""
+    algorithm_obj = get_default_algorithms()[algorithm]
+    public_key = algorithm_obj.prepare_key(public_pem)
+    jwk = json.loads(algorithm_obj.to_jwk(public_key))
+    if isinstance(public_key, ec.EllipticCurvePublicKey):
+        # some PyJWT releases don't pad P-521 coordinates to their fixed length
+        size = (public_key.curve.key_size + 7) // 8
+        numbers = public_key.public_numbers()
+        jwk["x"] = base64url_encode(numbers.x.to_bytes(size, "big")).decode()
+        jwk["y"] = base64url_encode(numbers.y.to_bytes(size, "big")).decode()
+    jwk.update(kid=kid, use="sig", alg=algorithm)
+    return jwk
+
+
+@contextlib.contextmanager
+def serve_jwks(keys: t.List[t.Dict[str, t.Any]]) -> t.Iterator[str]:
+    """Serves `keys` as a JWK set on a local HTTP server and yields its url."""
+    body = json.dumps({"keys": keys}).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args: t.Any) -> None:
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        host, port = httpd.server_address[:2]
+        yield f"http://{host}:{port}/.well-known/jwks.json"
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
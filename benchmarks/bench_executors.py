@@ -0,0 +1,62 @@
+"""
+Throughput of `sign_async`/`decode_async` for each `executor` mode
+(thread, process, inline) with CPU bound RSA/ECDSA algorithms.
+
+    python -m benchmarks.bench_executors [--number 2000] [--concurrency 64]
+"""
+
+import argparse
+import asyncio
+import typing as t
+
+from ellar_jwt import JWTConfiguration, JWTService
+
+from ._utils import generate_pem_keys, measure_async
+
+ALGORITHMS = ("RS512", "ES512")
+EXECUTORS = ("thread", "process", "inline")
+
+
+async def bench_executor(
+    algorithm: str,
+    executor: str,
+    keys: t.Tuple[str, str],
+    number: int,
+    concurrency: int,
+) -> None:
+    service = JWTService(
+        JWTConfiguration(
+            algorithm=algorithm,
+            signing_secret_key=keys[0],
+            verifying_secret_key=keys[1],
+            executor=executor,
+        )
+    )
+    payload = {"sub": "23", "scope": "read write"}
+    token = service.sign(payload)
+    try:
+        sign = await measure_async(
+            lambda: service.sign_async(payload), number, concurrency
+        )
+        decode = await measure_async(
+            lambda: service.decode_async(token), number, concurrency
+        )
+    finally:
+        service.executor.shutdown()
+    print(f"{algorithm:<10}{executor:<10}{sign:>14.0f}{decode:>16.0f}")
+
+
+async def run(number: int, concurrency: int) -> None:
+    print(f"{'algorithm':<10}{'executor':<10}{'sign ops/s':>14}{'decode ops/s':>16}")
+    for algorithm in ALGORITHMS:
+        keys = generate_pem_keys(algorithm)
+        for executor in EXECUTORS:
+            await bench_executor(algorithm, executor, keys, number, concurrency)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+    asyncio.run(run(args.number, args.concurrency))
@@ -0,0 +1,68 @@
+"""
+Compares signing/verifying with PEM strings handed to PyJWT on every call against
+`JWTService`, which parses the PEM keys once into `cryptography` key objects.
+
+    python -m benchmarks.bench_keys [--number 500]
+"""
+
+import argparse
+
+import jwt
+
+from ellar_jwt import JWTConfiguration, JWTService
+
+from ._utils import generate_pem_keys, measure
+
+ALGORITHMS = ("RS256", "ES256")
+
+
+def bench_algorithm(algorithm: str, number: int) -> None:
+    private_pem, public_pem = generate_pem_keys(algorithm)
+    service = JWTService(
+        JWTConfiguration(
+            algorithm=algorithm,
+            signing_secret_key=private_pem,
+            verifying_secret_key=public_pem,
+        )
+    )
+    payload = {"sub": "23", "scope": "read write"}
+    token = service.sign(payload)
+
+    results = {
+        "sign": (
+            measure(
+                lambda: jwt.encode(payload, private_pem, algorithm=algorithm), number
+            ),
+            measure(
+                lambda: jwt.encode(
+                    payload, service.plan.signing_key, algorithm=algorithm
+                ),
+                number,
+            ),
+        ),
+        "verify": (
+            measure(
+                lambda: jwt.decode(token, public_pem, algorithms=[algorithm]), number
+            ),
+            measure(
+                lambda: jwt.decode(
+                    token, service.plan.verifying_key, algorithms=[algorithm]
+                ),
+                number,
+            ),
+        ),
+    }
+    for operation, (pem, loaded) in results.items():
+        print(f"{algorithm:<10}{operation:<10}{pem:>14.0f}{loaded:>16.0f}")
+
+
+def run(number: int) -> None:
+    print(f"{'algorithm':<10}{'operation':<10}{'PEM ops/s':>14}{'loaded ops/s':>16}")
+    for algorithm in ALGORITHMS:
+        bench_algorithm(algorithm, number)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=500)
+    run(parser.parse_args().number)
@@ -0,0 +1,41 @@
+"""
+Compares the claim serializers on HS256 tokens with a growing number of custom claims,
+which is where payload encoding and decoding dominate over signing.
+
+    python -m benchmarks.bench_serializers [--number 2000]
+"""
+
+import argparse
+
+from ellar_jwt import JWTConfiguration, JWTService
+from ellar_jwt.serializers import is_available
+
+from ._utils import make_payload, measure
+
+CLAIM_COUNTS = (10, 100, 1000)
+
+
+def bench_serializer(serializer: str, claim_count: int, number: int) -> None:
+    service = JWTService(
+        JWTConfiguration(signing_secret_key="secret", serializer=serializer)
+    )
+    payload = make_payload(claim_count)
+    token = service.sign(payload)
+
+    sign = measure(lambda: service.sign(payload), number)
+    decode = measure(lambda: service.decode(token), number)
+    print(f"{serializer:<10}{claim_count:>8}{sign:>14.0f}{decode:>16.0f}")
+
+
+def run(number: int) -> None:
+    serializers = [name for name in ("json", "orjson", "msgspec") if is_available(name)]
+    print(f"{'serializer':<10}{'claims':>8}{'sign ops/s':>14}{'decode ops/s':>16}")
+    for claim_count in CLAIM_COUNTS:
+        for serializer in serializers:
+            bench_serializer(serializer, claim_count, max(number // claim_count, 20))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=2000)
+    run(parser.parse_args().number)
@@ -0,0 +1,54 @@
+"""
+Compares building the registered claims of a token (`exp`, `iat`, `jti`) with
+`Token` against the datetime based construction it replaced, and checks both
+produce the same claims.
+
+    python -m benchmarks.bench_token [--number 100000]
+"""
+
+import argparse
+import typing as t
+from calendar import timegm
+from datetime import datetime, timezone
+from uuid import uuid4
+
+from ellar_jwt import JWTConfiguration
+from ellar_jwt.plan import JWTPlan
+from ellar_jwt.token import Token
+
+from ._utils import measure
+
+
+def legacy_build(plan: JWTPlan, payload: t.Dict[str, t.Any]) -> t.Dict[str, t.Any]:
+    current_time = datetime.utcnow().replace(tzinfo=timezone.utc)
+    claims = {
+        "exp": timegm((current_time + plan.lifetime).utctimetuple()),
+        "iat": timegm(current_time.utctimetuple()),
+        plan.jti: uuid4().hex,
+    }
+    claims.update(payload)
+    return claims
+
+
+def run(number: int) -> None:
+    plan = JWTPlan(JWTConfiguration(signing_secret_key="secret"))
+    payload = {"sub": "23", "scope": "read write"}
+
+    current_time = datetime.now(timezone.utc)
+    legacy = legacy_build(plan, payload)
+    current = Token(plan, current_time=current_time).build(payload)
+    assert set(legacy) == set(current)
+    assert abs(legacy["iat"] - current["iat"]) <= 1
+    assert current["exp"] - current["iat"] == legacy["exp"] - legacy["iat"]
+
+    before = measure(lambda: legacy_build(plan, payload), number)
+    after = measure(lambda: Token(plan).build(payload), number)
+    print(f"{'claims':<12}{'ops/s':>14}")
+    print(f"{'datetime':<12}{before:>14.0f}")
+    print(f"{'epoch':<12}{after:>14.0f}{after / before:>8.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=100000)
+    run(parser.parse_args().number)
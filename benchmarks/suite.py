@@ -0,0 +1,263 @@
+"""
+Reproducible benchmark suite of `JWTService.sign`, `decode`, `sign_async` and
+`decode_async` across every `JWTConfiguration.algorithm`, payload size,
+per-call configuration overrides and JWKS (served locally) versus static keys.
+
+Results are written as JSON, and two result files can be compared to catch regressions:
+
+    python -m benchmarks.suite [--number 200] [--repeat 3] [--output results.json]
+    python -m benchmarks.suite --compare baseline.json results.json [--tolerance 0.1]
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import typing as t
+
+import cryptography
+import jwt
+
+import ellar_jwt
+from ellar_jwt import JWTConfiguration, JWTService
+from ellar_jwt.jwks import jwks_registry
+
+from ._utils import (
+    generate_pem_keys,
+    make_jwk,
+    make_payload,
+    measure,
+    measure_async,
+    serve_jwks,
+)
+
+ALGORITHMS: t.Tuple[str, ...] = t.get_args(
+    JWTConfiguration.model_fields["algorithm"].annotation
+)
+PAYLOADS = {
+    "small": {"sub": "23", "scope": "read write"},
+    "medium": make_payload(10),
+    "large": make_payload(100),
+}
+OPERATIONS = ("sign", "decode", "sign_async", "decode_async")
+OVERRIDE = {"leeway": 5}
+KID = "benchmark-key"
+
+
+class Result(t.NamedTuple):
+    algorithm: str
+    payload: str
+    variant: str
+    operation: str
+    number: int
+    ops_per_sec: float
+
+    @property
+    def name(self) -> str:
+        return f"{self.algorithm}/{self.payload}/{self.variant}/{self.operation}"
+
+    def to_dict(self) -> t.Dict[str, t.Any]:
+        return {
+            "name": self.name,
+            **self._asdict(),
+            "ops_per_sec": round(self.ops_per_sec, 2),
+            "mean_us": round(1e6 / self.ops_per_sec, 2),
+        }
+
+
+def best_of(repeat: int, func: t.Callable[[], float]) -> float:
+    return max(func() for _ in range(repeat))
+
+
+def bench_cell(
+    service: JWTService,
+    operation: str,
+    payload: t.Dict[str, t.Any],
+    token: str,
+    jwt_config: t.Dict[str, t.Any],
+    number: int,
+    repeat: int,
+) -> float:
+    if operation == "sign":
+        return best_of(
+            repeat, lambda: measure(lambda: service.sign(payload, **jwt_config), number)
+        )
+    if operation == "decode":
+        return best_of(
+            repeat, lambda: measure(lambda: service.decode(token, **jwt_config), number)
+        )
+    if operation == "sign_async":
+        return best_of(
+            repeat,
+            lambda: asyncio.run(
+                measure_async(lambda: service.sign_async(payload, **jwt_config), number)
+            ),
+        )
+    return best_of(
+        repeat,
+        lambda: asyncio.run(
+            measure_async(lambda: service.decode_async(token, **jwt_config), number)
+        ),
+    )
+
+
+def bench_algorithm(algorithm: str, number: int, repeat: int) -> t.List[Result]:
+    private_pem, public_pem = generate_pem_keys(algorithm)
+    service = JWTService(
+        JWTConfiguration(
+            algorithm=algorithm,
+            signing_secret_key=private_pem,
+            verifying_secret_key=public_pem,
+        )
+    )
+    # "static": configured keys, "override": per-call `jwt_config` override,
+    # "jwks": verifying key resolved from a local JWKS endpoint (asymmetric algorithms)
+    services = {"static": service, "override": service}
+    jwks_keys = []
+    if not algorithm.startswith("HS"):
+        jwks_keys.append(make_jwk(algorithm, public_pem, KID))
+
+    results = []
+    with serve_jwks(jwks_keys) as jwks_url:
+        if jwks_keys:
+            services["jwks"] = JWTService(
+                JWTConfiguration(
+                    algorithm=algorithm,
+                    signing_secret_key=private_pem,
+                    jwk_url=jwks_url,
+                )
+            )
+        for variant, variant_service in services.items():
+            jwt_config = OVERRIDE if variant == "override" else {}
+            for payload_name, payload in PAYLOADS.items():
+                token = variant_service.sign(payload, headers={"kid": KID})
+                for operation in OPERATIONS:
+                    if variant == "jwks" and "decode" not in operation:
+                        # signing never involves the JWK set
+                        continue
+                    ops_per_sec = bench_cell(
+                        variant_service,
+                        operation,
+                        payload,
+                        token,
+                        jwt_config,
+                        number,
+                        repeat,
+                    )
+                    result = Result(
+                        algorithm, payload_name, variant, operation, number, ops_per_sec
+                    )
+                    print(f"{result.name:<40}{ops_per_sec:>14.0f}", file=sys.stderr)
+                    results.append(result)
+        jwks_registry.clear()
+    return results
+
+
+def environment() -> t.Dict[str, t.Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "commit": commit,
+        "ellar_jwt": ellar_jwt.__version__,
+        "pyjwt": jwt.__version__,
+        "cryptography": cryptography.__version__,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def run(algorithms: t.Sequence[str], number: int, repeat: int) -> t.Dict[str, t.Any]:
+    results = []
+    for algorithm in algorithms:
+        results.extend(bench_algorithm(algorithm, number, repeat))
+    return {
+        "environment": environment(),
+        "settings": {"number": number, "repeat": repeat},
+        "results": [result.to_dict() for result in results],
+    }
+
+
+def compare(baseline_path: str, current_path: str, tolerance: float) -> int:
+    """Prints the throughput change of every benchmark, returns the regression count"""
+    with open(baseline_path) as baseline_file, open(current_path) as current_file:
+        baseline = {row["name"]: row for row in json.load(baseline_file)["results"]}
+        current = {row["name"]: row for row in json.load(current_file)["results"]}
+
+    regressions = 0
+    print(f"{'benchmark':<40}{'baseline':>12}{'current':>12}{'change':>9}")
+    for name in sorted(baseline.keys() & current.keys()):
+        before = baseline[name]["ops_per_sec"]
+        after = current[name]["ops_per_sec"]
+        change = after / before - 1
+        flag = ""
+        if change < -tolerance:
+            regressions += 1
+            flag = "  REGRESSION"
+        print(f"{name:<40}{before:>12.0f}{after:>12.0f}{change:>+9.1%}{flag}")
+
+    for name in sorted(baseline.keys() - current.keys()):
+        print(f"{name:<40} missing from {current_path}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--number", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--algorithms",
+        default=",".join(ALGORITHMS),
+        help="comma separated subset of the algorithms to run",
+    )
+    parser.add_argument("--output", help="file to write the JSON results to")
+    parser.add_argument(
+        "--compare",
+        nargs=2,
+        metavar=("BASELINE", "CURRENT"),
+        help="compare two result files instead of running the suite",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.1,
+        help="throughput loss reported as a regression by --compare",
+    )
+    args = parser.parse_args()
+
+    if args.compare:
+        return 1 if compare(*args.compare, args.tolerance) else 0
+
+    algorithms = [name for name in args.algorithms.split(",") if name]
+    unknown = set(algorithms) - set(ALGORITHMS)
+    if unknown:
+        parser.error(f"unknown algorithms: {', '.join(sorted(unknown))}")
+
+    report = json.dumps(run(algorithms, args.number, args.repeat), indent=2)
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(report + "\n")
+    else:
+        print(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
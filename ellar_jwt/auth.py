@@ -0,0 +1,160 @@
+import asyncio
+import typing as t
+
+from ellar.auth.guards import GuardHttpBearerAuth
+from ellar.common import Identity, IExecutionContext, IHostContext
+from ellar.common.serializer.guard import HTTPAuthorizationCredentials
+from ellar.common.types import ASGIApp, TReceive, TScope, TSend
+from ellar.di import injectable
+
+from .exceptions import JWTTokenException
+from .services import JWTService
+
+__all__ = [
+    "JWTAuthGuard",
+    "JWTAuthMiddleware",
+    "get_bearer_token",
+    "get_request_claims",
+    "CLAIMS_SCOPE_KEY",
+    "SERVICE_SCOPE_KEY",
+]
+
+# request scope entries shared by every consumer of the request
+CLAIMS_SCOPE_KEY = "ellar_jwt.claims"
+SERVICE_SCOPE_KEY = "ellar_jwt.service"
+AUTH_TYPE = "jwt"
+
+
+def _create_identity(claims: t.Dict[str, t.Any]) -> Identity:
+    if "auth_type" in claims:
+        # set by the identity itself, the claim would clash with its argument
+        claims = {name: value for name, value in claims.items() if name != "auth_type"}
+    return Identity(auth_type=AUTH_TYPE, **claims)
+
+
+def get_bearer_token(scope: TScope) -> t.Optional[str]:
+    """Returns the token of the `Authorization: Bearer <token>` header, if any"""
+    for name, value in scope.get("headers", ()):
+        if name == b"authorization":
+            header: str = value.decode("latin-1")
+            scheme, _, token = header.partition(" ")
+            if scheme.lower() == "bearer" and token.strip():
+                return token.strip()
+            return None
+    return None
+
+
+async def get_request_claims(
+    scope: TScope,
+    jwt_service: t.Optional[JWTService] = None,
+    token: t.Optional[str] = None,
+) -> t.Optional[t.Dict[str, t.Any]]:
+    """
+    Returns the verified claims of the bearer token of the request, or None when it
+    has none. Raises `JWTTokenException` when the token is invalid.
+
+    The token is decoded once per request, by the first consumer, e.g. the
+    `JWTAuthMiddleware`, the `JWTAuthGuard`, a dependency or audit logging. Every
+    later consumer, including concurrent ones, shares its claims or its error.
+    Without `jwt_service`, the service set on the request by `JWTAuthMiddleware` is used.
+    """
+    decoding: t.Optional["asyncio.Future[t.Dict[str, t.Any]]"] = scope.get(
+        CLAIMS_SCOPE_KEY
+    )
+    if decoding is None:
+        token = token or get_bearer_token(scope)
+        if token is None:
+            return None
+        jwt_service = jwt_service or scope.get(SERVICE_SCOPE_KEY)
+        if jwt_service is None:
+            raise RuntimeError(
+                "No JWTService to decode the request token with, "
+                "pass one or add JWTAuthMiddleware."
+            )
+
+        decoding = asyncio.get_running_loop().create_future()
+        scope[CLAIMS_SCOPE_KEY] = decoding
+        try:
+            claims = await jwt_service.decode_async(token)
+        except Exception as ex:
+            decoding.set_exception(ex)
+            # marks the error as retrieved, consumers that never await it are fine
+            decoding.exception()
+            raise
+        except BaseException:
+            # e.g. the request was cancelled, consumers waiting on it are too
+            decoding.cancel()
+            raise
+        decoding.set_result(claims)
+        return claims
+    return await decoding
+
+
+class JWTAuthMiddleware:
+    """
+    ASGI middleware making the `JWTService` available to every HTTP and websocket
+    request, added by `JWTModule.setup(auth_middleware="eager" | "lazy")`.
+
+    Eagerly, it decodes the bearer token before the request is handled and sets the
+    request `user` to an `Identity` of its claims. A request with an invalid token
+    stays anonymous, and `JWTAuthGuard` rejects it with the same error.
+    Lazily, nothing is decoded until a consumer calls `get_request_claims`, so routes
+    that never look at the identity never pay for a decode.
+    """
+
+    def __init__(
+        self, app: ASGIApp, jwt_service: JWTService, lazy: bool = False
+    ) -> None:
+        self.app = app
+        self.jwt_service = jwt_service
+        self.lazy = lazy
+
+    async def __call__(self, scope: TScope, receive: TReceive, send: TSend) -> None:
+        if scope["type"] in ("http", "websocket"):
+            scope[SERVICE_SCOPE_KEY] = self.jwt_service
+            if not self.lazy:
+                await self._authenticate(scope)
+        await self.app(scope, receive, send)
+
+    async def _authenticate(self, scope: TScope) -> None:
+        try:
+            claims = await get_request_claims(scope, self.jwt_service)
+        except JWTTokenException:
+            return
+        if claims is not None:
+            scope["user"] = _create_identity(claims)
+
+
+@injectable
+class JWTAuthGuard(GuardHttpBearerAuth):
+    """
+    Guard accepting requests with a valid bearer token, and setting the request
+    `user` to an `Identity` of its claims.
+
+    The token is decoded through `get_request_claims`, so a token already decoded
+    by `JWTAuthMiddleware` or another consumer of the request isn't decoded again.
+    """
+
+    openapi_name = "JWTAuth"
+    openapi_bearer_format = "JWT"
+
+    def __init__(self, jwt_service: JWTService) -> None:
+        self.jwt_service = jwt_service
+
+    async def authentication_handler(
+        self,
+        context: t.Union[IHostContext, IExecutionContext],
+        credentials: HTTPAuthorizationCredentials,
+    ) -> t.Optional[t.Any]:
+        connection = context.switch_to_http_connection().get_client()
+        try:
+            claims = await get_request_claims(
+                connection.scope, self.jwt_service, credentials.credentials
+            )
+        except JWTTokenException as ex:
+            raise self.exception_class(
+                status_code=self.status_code, detail=str(ex)
+            ) from ex
+        if claims is None:
+            return None
+        return _create_identity(claims)
@@ -0,0 +1,141 @@
+import hashlib
+import sys
+import threading
+import time
+import typing as t
+from collections import OrderedDict
+from copy import deepcopy
+
+__all__ = ["VerifiedTokenCache", "TokenCacheStats"]
+
+
+class TokenCacheStats(t.NamedTuple):
+    hits: int
+    misses: int
+    size: int
+    bytes: int
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+_SCALARS = (str, int, float, bool, type(None))
+
+
+def _copy_claims(claims: t.Dict[str, t.Any]) -> t.Dict[str, t.Any]:
+    # scalars are shared, nested lists and dicts are copied so that no request
+    # sees another one's changes to them
+    return {
+        name: value if isinstance(value, _SCALARS) else deepcopy(value)
+        for name, value in claims.items()
+    }
+
+
+class _Entry(t.NamedTuple):
+    owner: t.Any
+    claims: t.Dict[str, t.Any]
+    expires_at: float
+    size: int
+
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU mapping of token digests to the claims they were verified to carry.
+
+    An entry never outlives the token it was built from: it expires at the token's
+    `exp` plus `leeway`, or after `ttl` seconds when that comes first.
+    Entries are tied to the object (e.g. the `JWTPlan`) they were verified with,
+    so a token verified with one configuration is never served to another.
+    """
+
+    def __init__(
+        self, maxsize: int = 1024, max_bytes: int = 16 * 1024 * 1024, ttl: float = 300
+    ) -> None:
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._bytes = 0
+        self._data: "OrderedDict[bytes, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def digest(token: t.Union[str, bytes]) -> bytes:
+        # a token and its bytes share one entry
+        data = token if isinstance(token, bytes) else token.encode()
+        return hashlib.blake2b(data, digest_size=16).digest()
+
+    def get(
+        self, token: t.Union[str, bytes], owner: t.Any, copy: bool = True
+    ) -> t.Optional[t.Dict[str, t.Any]]:
+        """
+        Returns a deep copy of the cached claims of `token`, or None.
+        With `copy=False` the cached dict itself is returned, and must not be modified.
+        """
+        key = self.digest(token)
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry.owner is not owner:
+                self.misses += 1
+                return None
+
+            if entry.expires_at <= time.time():
+                self._remove(key)
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+        return _copy_claims(entry.claims) if copy else entry.claims
+
+    def set(
+        self,
+        token: t.Union[str, bytes],
+        owner: t.Any,
+        claims: t.Dict[str, t.Any],
+        leeway: float = 0,
+    ) -> None:
+        expires_at = time.time() + self.ttl
+        exp = claims.get("exp")
+        if isinstance(exp, (int, float)):
+            expires_at = min(expires_at, exp + leeway)
+
+        size = len(token) + sys.getsizeof(claims)
+        if size > self.max_bytes:
+            return
+
+        key = self.digest(token)
+        with self._lock:
+            self._remove(key)
+            self._data[key] = _Entry(owner, _copy_claims(claims), expires_at, size)
+            self._bytes += size
+            while len(self._data) > self.maxsize or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._data)))
+
+    def invalidate(self, token: t.Union[str, bytes]) -> bool:
+        """Drops `token` from the cache. Returns whether it was cached"""
+        with self._lock:
+            return self._remove(self.digest(token))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> TokenCacheStats:
+        return TokenCacheStats(
+            hits=self.hits, misses=self.misses, size=len(self._data), bytes=self._bytes
+        )
+
+    def _remove(self, key: bytes) -> bool:
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return False
+        self._bytes -= entry.size
+        return True
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -0,0 +1,199 @@
+import functools
+import keyword
+import re
+import typing as t
+
+from .exceptions import ErrorCode, JWTTokenException
+
+__all__ = ["ClaimsView", "claims_view"]
+
+_MISSING: t.Any = object()
+
+
+def _compile_check(annotation: t.Any) -> t.Optional[t.Callable[[t.Any], bool]]:
+    """Returns a shallow type check for a claim annotation, None when anything goes"""
+    if annotation is t.Any:
+        return None
+    if annotation is float:
+        return lambda value: isinstance(value, (int, float)) and not isinstance(
+            value, bool
+        )
+    if isinstance(annotation, type):
+        return lambda value: isinstance(value, annotation)
+
+    origin = t.get_origin(annotation)
+    if origin is t.Union:
+        checks = [_compile_check(arg) for arg in t.get_args(annotation)]
+        if any(check is None for check in checks):
+            return None
+        return lambda value: any(check(value) for check in checks)  # type:ignore[misc]
+    if isinstance(origin, type):
+        # e.g. `t.List[str]` only checks for a list, the items are not inspected
+        return lambda value: isinstance(value, origin)
+    return None
+
+
+def _is_class_var(annotation: t.Any) -> bool:
+    if isinstance(annotation, str):
+        return "ClassVar" in annotation
+    return annotation is t.ClassVar or t.get_origin(annotation) is t.ClassVar
+
+
+def _attribute_name(name: str, taken: t.Set[str]) -> str:
+    """
+    Returns an attribute name for the claim `name`, which may be any string, e.g.
+    `https://example.com/roles` becomes `https___example_com_roles`
+    """
+    attribute = re.sub(r"\W", "_", name) or "_"
+    if (
+        not attribute.isidentifier()
+        or keyword.iskeyword(attribute)
+        or attribute.startswith("__")
+        or hasattr(ClaimsView, attribute)
+    ):
+        attribute = f"claim_{attribute}"
+    while attribute in taken:
+        attribute += "_"
+    taken.add(attribute)
+    return attribute
+
+
+class _Claim(t.NamedTuple):
+    name: str
+    attribute: str
+    default: t.Any
+    check: t.Optional[t.Callable[[t.Any], bool]]
+    # `__set__` of the slot, bypassing the read-only `__setattr__`
+    setter: t.Callable[[t.Any, t.Any], None]
+
+
+class _ClaimsViewMeta(type):
+    def __new__(
+        mcs, name: str, bases: t.Tuple[type, ...], namespace: t.Dict[str, t.Any]
+    ) -> "_ClaimsViewMeta":
+        annotations = namespace.get("__annotations__", {})
+        # claim names by attribute, of the claims that are not valid attribute names
+        claim_names: t.Dict[str, str] = namespace.pop("__claim_names__", {})
+        namespace["__slots__"] = tuple(
+            claim
+            for claim, annotation in annotations.items()
+            if not _is_class_var(annotation)
+        )
+        defaults = {}
+        for claim in namespace["__slots__"]:
+            # class attributes would conflict with the slots, defaults are kept aside
+            if claim in namespace:
+                defaults[claim] = namespace.pop(claim)
+        cls = super().__new__(mcs, name, bases, namespace)
+
+        try:
+            hints = t.get_type_hints(cls)
+        except (NameError, TypeError):
+            hints = {}
+        inherited: t.Tuple[_Claim, ...] = getattr(cls, "__claims__", ())
+        claims = {claim.name: claim for claim in inherited}
+        for attribute in namespace["__slots__"]:
+            claim = claim_names.get(attribute, attribute)
+            claims[claim] = _Claim(
+                claim,
+                attribute,
+                defaults.get(attribute, _MISSING),
+                _compile_check(hints.get(attribute, t.Any)),
+                cls.__dict__[attribute].__set__,
+            )
+        cls.__claims__ = tuple(claims.values())  # type:ignore[attr-defined]
+        cls.__attributes__ = {  # type:ignore[attr-defined]
+            claim.name: claim.attribute for claim in claims.values()
+        }
+        return cls
+
+
+class ClaimsView(metaclass=_ClaimsViewMeta):
+    """
+    Slotted, read-only view of the claims of a verified token, declared like a
+    dataclass. Only the declared claims are copied out of the payload, and they are
+    validated once, when the view is built by `JWTService.decode_claims`:
+
+        class AccessClaims(ClaimsView):
+            sub: str
+            scope: str = ""
+            exp: int
+
+    A missing claim without a default is rejected with `ErrorCode.MISSING_CLAIM`,
+    a claim of the wrong type with `ErrorCode.INVALID`. Types are checked shallowly,
+    e.g. `t.List[str]` only checks for a list.
+
+    Claims are read as attributes, or by claim name with `view["sub"]`.
+    """
+
+    __claims__: t.ClassVar[t.Tuple[_Claim, ...]] = ()
+    # attribute names by claim name
+    __attributes__: t.ClassVar[t.Dict[str, str]] = {}
+
+    @classmethod
+    def from_claims(cls: t.Type["V"], claims: t.Mapping[str, t.Any]) -> "V":
+        view = object.__new__(cls)
+        for name, _, default, check, setter in cls.__claims__:
+            value = claims.get(name, default)
+            if value is _MISSING:
+                raise JWTTokenException(
+                    f"Token has no '{name}' claim", ErrorCode.MISSING_CLAIM
+                )
+            if check is not None and value is not default and not check(value):
+                raise JWTTokenException(
+                    f"Token has an invalid '{name}' claim", ErrorCode.INVALID
+                )
+            setter(view, value)
+        return view
+
+    def to_dict(self) -> t.Dict[str, t.Any]:
+        return {claim.name: getattr(self, claim.attribute) for claim in self.__claims__}
+
+    def __getitem__(self, name: str) -> t.Any:
+        try:
+            attribute = self.__attributes__[name]
+        except KeyError:
+            raise KeyError(name) from None
+        return getattr(self, attribute)
+
+    def __setattr__(self, name: str, value: t.Any) -> None:
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
+
+    def __eq__(self, other: t.Any) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return bool(self.to_dict() == other.to_dict())
+
+    def __repr__(self) -> str:
+        claims = ", ".join(
+            f"{name}={value!r}" for name, value in self.to_dict().items()
+        )
+        return f"{self.__class__.__name__}({claims})"
+
+
+V = t.TypeVar("V", bound=ClaimsView)
+
+
+@functools.lru_cache(maxsize=128)
+def claims_view(*names: str) -> t.Type[ClaimsView]:
+    """
+    Returns a `ClaimsView` projecting the named claims, of any type.
+    Claims missing from the token are None. A claim whose name isn't a valid
+    attribute name, e.g. `https://example.com/roles`, is read with `view[name]`.
+    """
+    if any(not isinstance(name, str) for name in names):
+        raise TypeError("Claim names must be str instances.")
+    taken: t.Set[str] = set()
+    attributes = {name: _attribute_name(name, taken) for name in names}
+    namespace: t.Dict[str, t.Any] = {
+        "__annotations__": dict.fromkeys(attributes.values(), t.Any),
+        "__claim_names__": {attribute: name for name, attribute in attributes.items()},
+        **dict.fromkeys(attributes.values()),
+    }
+    return t.cast(
+        t.Type[ClaimsView],
+        _ClaimsViewMeta("ClaimsProjection", (ClaimsView,), namespace),
+    )
@@ -0,0 +1,38 @@
+import time
+import typing as t
+from datetime import datetime, timedelta
+
+from .util import make_utc
+
+__all__ = ["Clock", "system_clock", "FakeClock"]
+
+# returns the current epoch time in seconds, like `time.time`
+Clock = t.Callable[[], float]
+
+system_clock: Clock = time.time
+
+
+class FakeClock:
+    """
+    Clock standing still until it is moved, to sign tokens at a fixed time in tests:
+
+        clock = FakeClock(datetime(2024, 1, 1, tzinfo=timezone.utc))
+        service = JWTService(JWTConfiguration(signing_secret_key="secret", clock=clock))
+        clock.advance(timedelta(minutes=5))
+    """
+
+    def __init__(self, now: t.Union[float, datetime, None] = None) -> None:
+        self.now = time.time()
+        if now is not None:
+            self.set(now)
+
+    def __call__(self) -> float:
+        return self.now
+
+    def set(self, now: t.Union[float, datetime]) -> None:
+        self.now = make_utc(now).timestamp() if isinstance(now, datetime) else now
+
+    def advance(self, seconds: t.Union[float, timedelta]) -> None:
+        if isinstance(seconds, timedelta):
+            seconds = seconds.total_seconds()
+        self.now += seconds
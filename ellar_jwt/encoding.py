@@ -0,0 +1,120 @@
+import json
+import typing as t
+from calendar import timegm
+from datetime import datetime
+
+from jwt.algorithms import Algorithm
+from jwt.exceptions import InvalidTokenError
+from jwt.utils import base64url_encode
+
+from .serializers import JSONSerializer, StdlibJSONSerializer
+from .util import LRUCache
+
+__all__ = ["encode_header_segment", "encode_token", "HeaderSegmentCache"]
+
+_TIME_CLAIMS = ("exp", "iat", "nbf")
+_STDLIB_SERIALIZER = StdlibJSONSerializer()
+# header values that can be part of a cache key
+_SCALARS = (str, int, float, bool, type(None))
+
+
+def encode_header_segment(
+    algorithm: str,
+    headers: t.Optional[t.Dict[str, t.Any]] = None,
+    json_encoder: t.Optional[t.Type[json.JSONEncoder]] = None,
+) -> bytes:
+    """
+    Returns the base64url encoded JOSE header segment, built the same way
+    `jwt.encode` builds it, so it can be computed once and reused for many tokens.
+    """
+    header: t.Dict[str, t.Any] = {"typ": "JWT", "alg": algorithm}
+
+    if headers:
+        if "kid" in headers and not isinstance(headers["kid"], str):
+            raise InvalidTokenError("Key ID header parameter must be a string")
+        header.update(headers)
+
+    if not header["typ"]:
+        del header["typ"]
+    # True is the standard value for b64, so no need for it
+    header.pop("b64", None)
+
+    json_header = json.dumps(
+        header, separators=(",", ":"), cls=json_encoder, sort_keys=True
+    ).encode()
+    return base64url_encode(json_header)
+
+
+def encode_token(
+    header_segment: bytes,
+    payload: t.Dict[str, t.Any],
+    signing_key: t.Any,
+    algorithm: Algorithm,
+    serializer: t.Optional[JSONSerializer] = None,
+) -> str:
+    """
+    Serializes and signs `payload` into a compact JWS using an already encoded
+    header segment and an already prepared signing key.
+    """
+    for time_claim in _TIME_CLAIMS:
+        # Convert datetime to a intDate value in known time-format claims
+        value = payload.get(time_claim)
+        if isinstance(value, datetime):
+            payload[time_claim] = timegm(value.utctimetuple())
+
+    json_payload = (serializer or _STDLIB_SERIALIZER).dumps(payload)
+    signing_input = b".".join((header_segment, base64url_encode(json_payload)))
+    signature = algorithm.sign(signing_input, signing_key)
+
+    return b".".join((signing_input, base64url_encode(signature))).decode()
+
+
+class HeaderSegmentCache:
+    """
+    Encoded header segments by algorithm, JSON encoder and headers, so signing
+    with the same headers, e.g. the `kid` of the current key, encodes them once.
+
+    Headers with values other than strings, numbers, booleans and None are
+    encoded on every call.
+    """
+
+    __slots__ = ("_segments",)
+
+    def __init__(self, maxsize: int = 256) -> None:
+        self._segments: LRUCache[t.Tuple, bytes] = LRUCache(maxsize)
+
+    def get(
+        self,
+        algorithm: str,
+        headers: t.Optional[t.Dict[str, t.Any]] = None,
+        json_encoder: t.Optional[t.Type[json.JSONEncoder]] = None,
+    ) -> bytes:
+        key = self._key(algorithm, headers or {}, json_encoder)
+        if key is None:
+            return encode_header_segment(algorithm, headers, json_encoder)
+
+        segment = self._segments.get(key)
+        if segment is None:
+            segment = encode_header_segment(algorithm, headers, json_encoder)
+            self._segments.set(key, segment)
+        return segment
+
+    @staticmethod
+    def _key(
+        algorithm: str,
+        headers: t.Dict[str, t.Any],
+        json_encoder: t.Optional[t.Type[json.JSONEncoder]],
+    ) -> t.Optional[t.Tuple]:
+        items = []
+        for name, value in headers.items():
+            if type(value) not in _SCALARS:
+                return None
+            # `True == 1`, the type keeps their segments apart
+            items.append((name, type(value), value))
+        return algorithm, json_encoder, tuple(items)
+
+    def clear(self) -> None:
+        self._segments.clear()
+
+    def __len__(self) -> int:
+        return len(self._segments)
@@ -1,2 +1,40 @@
+import typing as t
+
+
+class ErrorCode:
+    """Machine readable reasons a token was rejected, see `JWTTokenException.code`"""
+
+    INVALID = "invalid"
+    MALFORMED = "malformed"
+    INVALID_SIGNATURE = "invalid_signature"
+    INVALID_ALGORITHM = "invalid_algorithm"
+    EXPIRED = "expired"
+    IMMATURE = "immature"
+    INVALID_AUDIENCE = "invalid_audience"
+    INVALID_ISSUER = "invalid_issuer"
+    MISSING_CLAIM = "missing_claim"
+    KEY_NOT_FOUND = "key_not_found"
+    JWKS_UNAVAILABLE = "jwks_unavailable"
+    REVOKED = "revoked"
+    WRONG_TOKEN_TYPE = "wrong_token_type"
+    REFRESH_TOKEN_REUSED = "refresh_token_reused"
+    DECRYPTION_FAILED = "decryption_failed"
+
+
 class JWTTokenException(Exception):
-    pass
+    """
+    Raised when a token can not be accepted. The message stays generic,
+    `code` holds the `ErrorCode` telling why.
+    """
+
+    def __init__(
+        self,
+        message: str = "Token is invalid or expired",
+        code: str = ErrorCode.INVALID,
+    ) -> None:
+        super().__init__(message)
+        self.code = code
+
+    def __reduce__(self) -> t.Tuple[t.Any, ...]:
+        # keeps `code` when raised in a process executor worker
+        return self.__class__, (str(self), self.code)
@@ -0,0 +1,171 @@
+import asyncio
+import functools
+import threading
+import typing as t
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+
+import anyio
+
+from .keys import dump_key
+
+if t.TYPE_CHECKING:  # pragma: no cover
+    from .schemas import JWTConfiguration
+    from .services import JWTService
+
+__all__ = [
+    "JWTExecutor",
+    "InlineExecutor",
+    "ThreadExecutor",
+    "ProcessExecutor",
+    "create_executor",
+]
+
+
+class JWTExecutor(ABC):
+    """
+    Runs the `JWTService` operations behind its async APIs, e.g. `sign_async`
+    runs `service._sign_unobserved` through `executor.run(service, "_sign_unobserved", ...)`.
+    """
+
+    @abstractmethod
+    async def run(
+        self, service: "JWTService", method: str, *args: t.Any, **jwt_config: t.Any
+    ) -> t.Any:
+        """Runs `getattr(service, method)(*args, **jwt_config)`"""
+
+    def shutdown(self) -> None:
+        """Releases any resource held by the executor"""
+        return None
+
+
+class InlineExecutor(JWTExecutor):
+    """Runs operations directly on the event loop."""
+
+    async def run(
+        self, service: "JWTService", method: str, *args: t.Any, **jwt_config: t.Any
+    ) -> t.Any:
+        return getattr(service, method)(*args, **jwt_config)
+
+
+class ThreadExecutor(JWTExecutor):
+    """Runs operations in anyio's worker threads. This is the default executor."""
+
+    def __init__(self, limiter: t.Optional[anyio.CapacityLimiter] = None) -> None:
+        self.limiter = limiter
+
+    async def run(
+        self, service: "JWTService", method: str, *args: t.Any, **jwt_config: t.Any
+    ) -> t.Any:
+        func = getattr(service, method)
+        if jwt_config:
+            func = functools.partial(func, **jwt_config)
+        return await anyio.to_thread.run_sync(func, *args, limiter=self.limiter)
+
+
+_worker_service: t.Optional["JWTService"] = None
+
+
+def _init_worker(config_values: t.Dict[str, t.Any]) -> None:
+    from .schemas import JWTConfiguration
+    from .services import JWTService
+
+    global _worker_service
+    _worker_service = JWTService(JWTConfiguration(**config_values))
+
+
+def _run_in_worker(
+    method: str, args: t.Tuple[t.Any, ...], jwt_config: t.Dict[str, t.Any]
+) -> t.Any:
+    assert _worker_service is not None
+    return getattr(_worker_service, method)(*args, **jwt_config)
+
+
+class ProcessExecutor(JWTExecutor):
+    """
+    Runs operations in a process pool, for CPU bound RSA/ECDSA work.
+
+    Each worker builds its own `JWTService` with preloaded keys once, when it starts,
+    so a task only ships the payload or token string to the worker.
+    Requires an asyncio event loop.
+    """
+
+    def __init__(self, max_workers: t.Optional[int] = None) -> None:
+        self.max_workers = max_workers
+        self._jwt_config: t.Optional["JWTConfiguration"] = None
+        self._pool: t.Optional[ProcessPoolExecutor] = None
+        self._keyring_version: t.Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self, jwt_config: "JWTConfiguration") -> ProcessPoolExecutor:
+        keyring_version = (
+            jwt_config.keyring.version if jwt_config.keyring is not None else None
+        )
+        if self._pool is None or self._keyring_version != keyring_version:
+            with self._lock:
+                if (
+                    self._pool is not None
+                    and self._jwt_config is jwt_config
+                    and self._keyring_version != keyring_version
+                ):
+                    # workers hold a copy of the keyring, new ones get the changed keys
+                    self._pool.shutdown(wait=False)
+                    self._pool = None
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        initializer=_init_worker,
+                        initargs=(self._worker_config_values(jwt_config),),
+                    )
+                    self._jwt_config = jwt_config
+                    self._keyring_version = keyring_version
+
+        if self._jwt_config is not jwt_config:
+            raise RuntimeError(
+                f"{self.__class__.__name__} can not be shared between JWTServices "
+                f"with different configurations."
+            )
+        return self._pool
+
+    @staticmethod
+    def _worker_config_values(jwt_config: "JWTConfiguration") -> t.Dict[str, t.Any]:
+        values = jwt_config.dict()
+        # loaded key objects can't be pickled, workers load them from PEM again
+        values["signing_secret_key"] = dump_key(values["signing_secret_key"])
+        values["verifying_secret_key"] = dump_key(values["verifying_secret_key"])
+        values["encryption_key"] = dump_key(values["encryption_key"])
+        values["decryption_key"] = dump_key(values["decryption_key"])
+        values["executor"] = "inline"
+        # verified tokens are cached and checked for revocation by the parent process
+        values["token_cache_size"] = 0
+        values["revocation_store"] = None
+        # and report the events of their operations
+        values["hooks"] = []
+        values["jwks_fetcher"] = None
+        return values
+
+    async def run(
+        self, service: "JWTService", method: str, *args: t.Any, **jwt_config: t.Any
+    ) -> t.Any:
+        pool = self._get_pool(service.jwt_config)
+        return await asyncio.wrap_future(
+            pool.submit(_run_in_worker, method, args, jwt_config)
+        )
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+                self._jwt_config = None
+
+
+def create_executor(jwt_config: "JWTConfiguration") -> JWTExecutor:
+    executor = jwt_config.executor
+    if isinstance(executor, JWTExecutor):
+        return executor
+    if executor == "inline":
+        return InlineExecutor()
+    if executor == "process":
+        return ProcessExecutor(max_workers=jwt_config.executor_max_workers)
+    return ThreadExecutor()
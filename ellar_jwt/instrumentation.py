@@ -0,0 +1,204 @@
+import math
+import threading
+import typing as t
+from abc import ABC, abstractmethod
+
+__all__ = [
+    "JWTEvent",
+    "JWTHook",
+    "EventCounter",
+    "DurationHistogram",
+    "PrometheusMetrics",
+    "DEFAULT_BUCKETS",
+]
+
+# seconds, from HMAC verification to JWK set fetches
+DEFAULT_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+)
+
+
+class JWTEvent(t.NamedTuple):
+    # "sign", "decode", "key_resolution" or "jwks_fetch"
+    operation: str
+    algorithm: str
+    # "ok", an `ErrorCode` value, or "error" for unexpected exceptions
+    outcome: str
+    # seconds
+    duration: float
+    error: t.Optional[BaseException] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.outcome == "ok"
+
+
+class JWTHook(ABC):
+    """
+    Receives a `JWTEvent` for every operation of the `JWTService` it is attached to.
+
+    `on_event` runs synchronously on the calling thread, so it should only record the event.
+    """
+
+    @abstractmethod
+    def on_event(self, event: JWTEvent) -> None:
+        """Records `event`"""
+
+
+def _labels(**labels: str) -> str:
+    escaped = (
+        value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        for value in labels.values()
+    )
+    return (
+        "{"
+        + ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped))
+        + "}"
+    )
+
+
+class EventCounter(JWTHook):
+    """Counts events by operation, algorithm and outcome."""
+
+    def __init__(self, name: str = "ellar_jwt_operations_total") -> None:
+        self.name = name
+        self._counts: t.Dict[t.Tuple[str, str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def on_event(self, event: JWTEvent) -> None:
+        key = (event.operation, event.algorithm, event.outcome)
+        with self._lock:
+            self._counts[key] = self._counts.get(key, 0) + 1
+
+    def count(
+        self,
+        operation: str,
+        outcome: t.Optional[str] = None,
+        algorithm: t.Optional[str] = None,
+    ) -> int:
+        """Returns the number of `operation` events, optionally of one outcome/algorithm"""
+        return sum(
+            count
+            for (event_operation, event_algorithm, event_outcome), count in list(
+                self._counts.items()
+            )
+            if event_operation == operation
+            and (outcome is None or event_outcome == outcome)
+            and (algorithm is None or event_algorithm == algorithm)
+        )
+
+    def render(self) -> str:
+        """Returns the counters in the Prometheus text exposition format"""
+        lines = [
+            f"# HELP {self.name} JWT operations by outcome.",
+            f"# TYPE {self.name} counter",
+        ]
+        with self._lock:
+            counts = sorted(self._counts.items())
+        for (operation, algorithm, outcome), count in counts:
+            labels = _labels(operation=operation, algorithm=algorithm, outcome=outcome)
+            lines.append(f"{self.name}{labels} {count}")
+        return "\n".join(lines) + "\n"
+
+
+class _Histogram:
+    __slots__ = ("buckets", "total", "count")
+
+    def __init__(self, size: int) -> None:
+        self.buckets = [0] * size
+        self.total = 0.0
+        self.count = 0
+
+
+class DurationHistogram(JWTHook):
+    """Histogram of event durations by operation and algorithm."""
+
+    def __init__(
+        self,
+        name: str = "ellar_jwt_operation_duration_seconds",
+        buckets: t.Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.buckets = tuple(sorted(buckets))
+        if not self.buckets or self.buckets[-1] != math.inf:
+            self.buckets += (math.inf,)
+        self._histograms: t.Dict[t.Tuple[str, str], _Histogram] = {}
+        self._lock = threading.Lock()
+
+    def on_event(self, event: JWTEvent) -> None:
+        key = (event.operation, event.algorithm)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(len(self.buckets))
+            for index, bound in enumerate(self.buckets):
+                if event.duration <= bound:
+                    histogram.buckets[index] += 1
+                    break
+            histogram.total += event.duration
+            histogram.count += 1
+
+    def summary(self, operation: str, algorithm: str) -> t.Tuple[int, float]:
+        """Returns the (count, total duration) of `operation` events with `algorithm`"""
+        histogram = self._histograms.get((operation, algorithm))
+        if histogram is None:
+            return 0, 0.0
+        return histogram.count, histogram.total
+
+    def render(self) -> str:
+        """Returns the histograms in the Prometheus text exposition format"""
+        lines = [
+            f"# HELP {self.name} Duration of JWT operations.",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            histograms = sorted(
+                (key, list(histogram.buckets), histogram.total, histogram.count)
+                for key, histogram in self._histograms.items()
+            )
+        for (operation, algorithm), buckets, total, count in histograms:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, buckets):
+                cumulative += bucket_count
+                le = "+Inf" if bound == math.inf else repr(bound)
+                labels = _labels(operation=operation, algorithm=algorithm, le=le)
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _labels(operation=operation, algorithm=algorithm)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return "\n".join(lines) + "\n"
+
+
+class PrometheusMetrics(JWTHook):
+    """
+    Counter and duration histogram of every event, rendered together
+    in the Prometheus text exposition format, e.g. to serve from a `/metrics` route.
+    """
+
+    def __init__(
+        self, prefix: str = "ellar_jwt", buckets: t.Sequence[float] = DEFAULT_BUCKETS
+    ) -> None:
+        self.counter = EventCounter(f"{prefix}_operations_total")
+        self.histogram = DurationHistogram(
+            f"{prefix}_operation_duration_seconds", buckets
+        )
+
+    def on_event(self, event: JWTEvent) -> None:
+        self.counter.on_event(event)
+        self.histogram.on_event(event)
+
+    def render(self) -> str:
+        return self.counter.render() + self.histogram.render()
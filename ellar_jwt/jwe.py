@@ -0,0 +1,251 @@
+import binascii
+import json
+import os
+import typing as t
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding, rsa
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.keywrap import (
+    InvalidUnwrap,
+    aes_key_unwrap,
+    aes_key_wrap,
+)
+from cryptography.hazmat.primitives.serialization import (
+    load_pem_private_key,
+    load_pem_public_key,
+)
+from jwt.utils import base64url_decode, base64url_encode
+
+from .exceptions import ErrorCode, JWTTokenException
+
+__all__ = ["JWECipher", "ENCRYPTION_ALGORITHMS", "ENCRYPTION_METHODS"]
+
+# AES key sizes in bytes, of the key wrapping algorithms and the content encryptions
+ENCRYPTION_ALGORITHMS: t.Dict[str, t.Optional[int]] = {
+    "dir": None,
+    "A128KW": 16,
+    "A192KW": 24,
+    "A256KW": 32,
+    "RSA-OAEP-256": None,
+}
+ENCRYPTION_METHODS: t.Dict[str, int] = {"A128GCM": 16, "A192GCM": 24, "A256GCM": 32}
+
+_IV_SIZE = 12
+_TAG_SIZE = 16
+
+
+def _reject(code: str, message: str = "Token is invalid or expired") -> t.NoReturn:
+    raise JWTTokenException(message, code)
+
+
+def _load_aes_key(key: t.Any, size: int, setting: str, name: str) -> bytes:
+    if isinstance(key, str):
+        key = key.encode()
+    if not isinstance(key, (bytes, bytearray)) or len(key) != size:
+        raise ValueError(f"{setting} of {name} must be {size} bytes.")
+    return bytes(key)
+
+
+def _load_rsa_keys(
+    encryption_key: t.Any, decryption_key: t.Any
+) -> t.Tuple[t.Any, t.Any]:
+    try:
+        if isinstance(decryption_key, (str, bytes)) and decryption_key:
+            decryption_key = load_pem_private_key(
+                _to_bytes(decryption_key), password=None
+            )
+        if isinstance(encryption_key, (str, bytes)) and encryption_key:
+            encryption_key = load_pem_public_key(_to_bytes(encryption_key))
+    except (TypeError, ValueError):
+        decryption_key = encryption_key = None
+    if not encryption_key and decryption_key is not None:
+        encryption_key = decryption_key.public_key()
+
+    if not isinstance(encryption_key, rsa.RSAPublicKey):
+        raise ValueError("encryption_key of RSA-OAEP-256 must be an RSA public key.")
+    if decryption_key is not None and not isinstance(decryption_key, rsa.RSAPrivateKey):
+        raise ValueError("decryption_key of RSA-OAEP-256 must be an RSA private key.")
+    return encryption_key, decryption_key
+
+
+def _to_bytes(key: t.Union[str, bytes]) -> bytes:
+    return key.encode() if isinstance(key, str) else key
+
+
+class JWECipher:
+    """
+    Encrypts signed tokens into compact JWE tokens (RFC 7516), nested JWTs with
+    `"cty": "JWT"`, and decrypts them back.
+
+    Everything that doesn't change between tokens is set up once: the keys are
+    loaded, the protected header segment, which is also the additional
+    authenticated data, is encoded, and with `dir` the AES-GCM cipher of the
+    content encryption key is built. `dir` encrypts with the key itself, so a
+    token costs one AES-GCM operation and carries no encrypted key. The `A*KW`
+    and `RSA-OAEP-256` algorithms wrap a fresh content encryption key per token.
+    """
+
+    __slots__ = (
+        "algorithm",
+        "method",
+        "header_segment",
+        "_key_size",
+        "_content_cipher",
+        "_wrapping_key",
+        "_encryption_key",
+        "_decryption_key",
+        "_padding",
+    )
+
+    def __init__(
+        self,
+        algorithm: str,
+        method: str,
+        encryption_key: t.Any,
+        decryption_key: t.Any = None,
+    ) -> None:
+        if algorithm not in ENCRYPTION_ALGORITHMS:
+            raise ValueError(f"Unsupported encryption algorithm '{algorithm}'.")
+        if method not in ENCRYPTION_METHODS:
+            raise ValueError(f"Unsupported encryption method '{method}'.")
+
+        self.algorithm = algorithm
+        self.method = method
+        self._key_size = ENCRYPTION_METHODS[method]
+        self._content_cipher: t.Optional[AESGCM] = None
+        self._wrapping_key: t.Optional[bytes] = None
+        self._encryption_key: t.Any = None
+        self._decryption_key: t.Any = None
+        self._padding: t.Any = None
+
+        if algorithm == "dir":
+            key = decryption_key or encryption_key
+            self._content_cipher = AESGCM(
+                _load_aes_key(key, self._key_size, "encryption_key", method)
+            )
+        elif algorithm == "RSA-OAEP-256":
+            self._encryption_key, self._decryption_key = _load_rsa_keys(
+                encryption_key, decryption_key
+            )
+            self._padding = padding.OAEP(
+                mgf=padding.MGF1(algorithm=hashes.SHA256()),
+                algorithm=hashes.SHA256(),
+                label=None,
+            )
+        else:
+            self._wrapping_key = _load_aes_key(
+                decryption_key or encryption_key,
+                t.cast(int, ENCRYPTION_ALGORITHMS[algorithm]),
+                "encryption_key",
+                algorithm,
+            )
+
+        self.header_segment = base64url_encode(
+            json.dumps(
+                {"alg": algorithm, "enc": method, "cty": "JWT"},
+                separators=(",", ":"),
+                sort_keys=True,
+            ).encode()
+        )
+
+    def encrypt(self, token: str) -> str:
+        """Returns the compact JWE of the signed `token`"""
+        content_cipher = self._content_cipher
+        encrypted_key = b""
+        if content_cipher is None:
+            content_key = os.urandom(self._key_size)
+            encrypted_key = self._wrap_key(content_key)
+            content_cipher = AESGCM(content_key)
+
+        iv = os.urandom(_IV_SIZE)
+        sealed = memoryview(
+            content_cipher.encrypt(iv, token.encode(), self.header_segment)
+        )
+        return b".".join(
+            (
+                self.header_segment,
+                base64url_encode(encrypted_key),
+                base64url_encode(iv),
+                base64url_encode(sealed[:-_TAG_SIZE]),
+                base64url_encode(sealed[-_TAG_SIZE:]),
+            )
+        ).decode()
+
+    def decrypt(self, token: t.Any) -> str:
+        """
+        Returns the signed token encrypted in the compact JWE `token`. Its signature
+        isn't verified here.
+        """
+        if isinstance(token, str):
+            token = token.encode("ascii", "replace")
+        if not isinstance(token, bytes):
+            _reject(ErrorCode.MALFORMED)
+
+        segments = token.split(b".")
+        if len(segments) != 5:
+            _reject(ErrorCode.MALFORMED)
+        header_segment = segments[0]
+        if header_segment != self.header_segment:
+            # same parameters, encoded by another issuer
+            self._check_header(header_segment)
+
+        try:
+            encrypted_key, iv, ciphertext, tag = (
+                base64url_decode(segment) for segment in segments[1:]
+            )
+        except (binascii.Error, ValueError):
+            _reject(ErrorCode.MALFORMED)
+        if len(iv) != _IV_SIZE or len(tag) != _TAG_SIZE:
+            _reject(ErrorCode.MALFORMED)
+
+        content_cipher = self._content_cipher
+        if content_cipher is None:
+            content_cipher = AESGCM(self._unwrap_key(encrypted_key))
+        elif encrypted_key:
+            _reject(ErrorCode.MALFORMED)
+
+        try:
+            plaintext = content_cipher.decrypt(iv, ciphertext + tag, header_segment)
+        except InvalidTag:
+            _reject(ErrorCode.DECRYPTION_FAILED)
+        try:
+            return plaintext.decode("ascii")
+        except UnicodeDecodeError:
+            _reject(ErrorCode.MALFORMED)
+
+    def _check_header(self, header_segment: bytes) -> None:
+        try:
+            header = json.loads(base64url_decode(header_segment))
+        except (binascii.Error, ValueError):
+            _reject(ErrorCode.MALFORMED)
+        if not isinstance(header, dict):
+            _reject(ErrorCode.MALFORMED)
+        if header.get("alg") != self.algorithm or header.get("enc") != self.method:
+            _reject(ErrorCode.INVALID_ALGORITHM, "Invalid algorithm specified")
+        # compressed or critical extension tokens are not supported
+        if "zip" in header or "crit" in header:
+            _reject(ErrorCode.MALFORMED)
+
+    def _wrap_key(self, content_key: bytes) -> bytes:
+        if self._wrapping_key is not None:
+            return aes_key_wrap(self._wrapping_key, content_key)
+        return t.cast(bytes, self._encryption_key.encrypt(content_key, self._padding))
+
+    def _unwrap_key(self, encrypted_key: bytes) -> bytes:
+        try:
+            if self._wrapping_key is not None:
+                content_key = aes_key_unwrap(self._wrapping_key, encrypted_key)
+            elif self._decryption_key is None:
+                raise RuntimeError("No `decryption_key` is configured.")
+            else:
+                content_key = self._decryption_key.decrypt(encrypted_key, self._padding)
+        except (InvalidUnwrap, ValueError):
+            _reject(ErrorCode.DECRYPTION_FAILED)
+        if len(content_key) != self._key_size:
+            _reject(ErrorCode.DECRYPTION_FAILED)
+        return content_key
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {self.algorithm}+{self.method}>"
@@ -0,0 +1,389 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+import typing as t
+import urllib.request
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+
+from jwt import PyJWK, PyJWKClient, PyJWKSet
+from jwt.exceptions import PyJWKSetError
+
+from .exceptions import ErrorCode, JWTTokenException
+from .serializers import is_available
+from .util import LRUCache
+
+__all__ = [
+    "JWKSClient",
+    "JWKSClientRegistry",
+    "JWKSClientStats",
+    "JWKSFetcher",
+    "URLLibJWKSFetcher",
+    "HTTPXJWKSFetcher",
+    "create_jwks_fetcher",
+    "JWKSManager",
+    "jwks_registry",
+]
+
+logger = logging.getLogger("ellar_jwt")
+
+
+class JWKSClientStats(t.NamedTuple):
+    hits: int
+    misses: int
+    fetches: int
+
+
+class JWKSClient(PyJWKClient):
+    """
+    PyJWKClient that always caches both the JWK set and the resolved signing keys,
+    and counts how many times the JWK set was fetched from the remote endpoint.
+    """
+
+    def __init__(
+        self, uri: str, lifespan: int = 300, max_cached_keys: int = 16, **kwargs: t.Any
+    ) -> None:
+        super().__init__(
+            uri,
+            cache_keys=True,
+            max_cached_keys=max_cached_keys,
+            cache_jwk_set=True,
+            lifespan=lifespan,
+            **kwargs,
+        )
+        self.fetches = 0
+        self.last_fetch_duration = 0.0
+
+    def fetch_data(self) -> t.Any:
+        self.fetches += 1
+        start = time.perf_counter()
+        try:
+            return super().fetch_data()
+        finally:
+            self.last_fetch_duration = time.perf_counter() - start
+
+    def stats(self) -> JWKSClientStats:
+        info = self.get_signing_key.cache_info()  # type:ignore[attr-defined]
+        return JWKSClientStats(hits=info.hits, misses=info.misses, fetches=self.fetches)
+
+
+class JWKSFetcher(ABC):
+    """Fetches the JWK set document of a JWKS url for `JWKSManager`."""
+
+    @abstractmethod
+    async def fetch(self, uri: str) -> t.Dict[str, t.Any]:
+        """Returns the decoded JWK set, e.g. `{"keys": [...]}`"""
+
+
+class URLLibJWKSFetcher(JWKSFetcher):
+    """
+    Fetcher running a `urllib` request in one of its own `max_workers` threads, so an
+    unreachable JWKS url never ties up the worker threads that verify signatures.
+    """
+
+    def __init__(
+        self,
+        timeout: float = 30,
+        headers: t.Optional[t.Dict[str, str]] = None,
+        max_workers: int = 2,
+    ) -> None:
+        self.timeout = timeout
+        self.headers = {"User-agent": "ellar-jwt", **(headers or {})}
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="ellar-jwt-jwks"
+        )
+
+    async def fetch(self, uri: str) -> t.Dict[str, t.Any]:
+        # unlike `anyio.to_thread`, the wait can be cancelled by the fetch timeout
+        return await asyncio.get_running_loop().run_in_executor(
+            self._pool, self._fetch, uri
+        )
+
+    def _fetch(self, uri: str) -> t.Dict[str, t.Any]:
+        request = urllib.request.Request(uri, headers=self.headers)
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.load(response)  # type:ignore[no-any-return]
+
+
+class HTTPXJWKSFetcher(JWKSFetcher):
+    """
+    Fetcher running an `httpx.AsyncClient` request on the event loop, without any
+    thread. Requires httpx.
+
+    A client is opened per fetch unless `client` is given, the JWK set is only
+    fetched every few minutes.
+    """
+
+    def __init__(
+        self,
+        timeout: float = 30,
+        headers: t.Optional[t.Dict[str, str]] = None,
+        client: t.Any = None,
+    ) -> None:
+        if not is_available("httpx"):
+            raise RuntimeError("You must have httpx installed to use HTTPXJWKSFetcher.")
+        self.timeout = timeout
+        self.headers = {"User-agent": "ellar-jwt", **(headers or {})}
+        self.client = client
+
+    async def fetch(self, uri: str) -> t.Dict[str, t.Any]:
+        import httpx
+
+        if self.client is not None:
+            response = await self.client.get(
+                uri, headers=self.headers, timeout=self.timeout
+            )
+        else:
+            async with httpx.AsyncClient(timeout=self.timeout) as client:
+                response = await client.get(uri, headers=self.headers)
+        response.raise_for_status()
+        return response.json()  # type:ignore[no-any-return]
+
+
+def create_jwks_fetcher() -> JWKSFetcher:
+    """Returns the default fetcher, `HTTPXJWKSFetcher` when httpx is installed"""
+    if is_available("httpx"):
+        return HTTPXJWKSFetcher()
+    return URLLibJWKSFetcher()
+
+
+class JWKSManager:
+    """
+    Keeps the signing keys of a JWK set in memory, indexed by `kid`, for the async APIs.
+
+    `start` fetches the key set and then refreshes it every `refresh_interval` seconds
+    in the background. Known keys are always answered from memory, even while a
+    refresh is in flight or after it failed (stale-while-revalidate).
+    Concurrent lookups of an unknown `kid` share a single fetch, and a `kid` that is
+    still unknown afterwards is remembered as missing for `negative_cache_ttl` seconds.
+    A fetch taking longer than `fetch_timeout` seconds is abandoned and counts as failed.
+    """
+
+    def __init__(
+        self,
+        uri: str,
+        fetcher: t.Optional[JWKSFetcher] = None,
+        refresh_interval: float = 300,
+        negative_cache_ttl: float = 30,
+        min_refresh_interval: float = 1,
+        fetch_timeout: float = 10,
+    ) -> None:
+        self.uri = uri
+        self.fetcher = fetcher or create_jwks_fetcher()
+        self.refresh_interval = refresh_interval
+        self.negative_cache_ttl = negative_cache_ttl
+        self.min_refresh_interval = min_refresh_interval
+        self.fetch_timeout = fetch_timeout
+        self.fetches = 0
+        self.last_fetch_duration = 0.0
+        self._keys: t.Dict[str, PyJWK] = {}
+        self._fetched_at = -float("inf")
+        self._attempted_at = -float("inf")
+        self._refresh_failed = False
+        self._missing: LRUCache[str, float] = LRUCache(1024)
+        self._refresh_task: t.Optional["asyncio.Future[None]"] = None
+        self._background_task: t.Optional["asyncio.Task[None]"] = None
+
+    @property
+    def is_stale(self) -> bool:
+        return time.monotonic() - self._fetched_at >= self.refresh_interval
+
+    @property
+    def is_servable(self) -> bool:
+        """
+        Whether the cached key set may be served: it is fresh, or stale while the
+        manager runs in the background, after its last refresh failed, or while its
+        revalidation is in flight or was attempted within `min_refresh_interval`.
+        """
+        return (
+            not self.is_stale
+            or self.is_running
+            or self._refresh_failed
+            or not self._may_refresh()
+        )
+
+    @property
+    def is_running(self) -> bool:
+        return self._background_task is not None and not self._background_task.done()
+
+    async def start(self) -> None:
+        """Fetches the key set, then keeps refreshing it in the background"""
+        await self._refresh_safely()
+        if not self.is_running:
+            self._background_task = asyncio.ensure_future(self._refresh_periodically())
+
+    async def stop(self) -> None:
+        task, self._background_task = self._background_task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def refresh(self) -> None:
+        """Fetches the key set, joining the fetch already in flight if there is one"""
+        task = self._refresh_task
+        if task is None or task.done():
+            task = self._refresh_task = asyncio.ensure_future(self._fetch())
+        await asyncio.shield(task)
+
+    def get_cached_key(self, kid: str) -> t.Optional[PyJWK]:
+        """Returns the key of `kid` from memory, without ever fetching"""
+        return self._keys.get(kid)
+
+    def is_missing(self, kid: str) -> bool:
+        """Returns whether `kid` is negatively cached, i.e. was recently not found"""
+        expires_at = self._missing.get(kid)
+        return expires_at is not None and expires_at > time.monotonic()
+
+    async def get_signing_key(self, kid: str) -> PyJWK:
+        key = self._keys.get(kid)
+        if key is not None:
+            if self.is_stale and self._may_refresh():
+                # serve the stale key while the key set is revalidated
+                asyncio.ensure_future(self._refresh_safely())
+            return key
+
+        if self.is_missing(kid):
+            raise JWTTokenException(
+                "Token is invalid or expired", ErrorCode.KEY_NOT_FOUND
+            )
+
+        if self._is_refreshing() or self._may_refresh():
+            try:
+                await self.refresh()
+            except Exception as ex:
+                if not self._keys:
+                    raise JWTTokenException(
+                        "Token is invalid or expired", ErrorCode.JWKS_UNAVAILABLE
+                    ) from ex
+
+        key = self._keys.get(kid)
+        if key is None:
+            self._missing.set(kid, time.monotonic() + self.negative_cache_ttl)
+            raise JWTTokenException(
+                "Token is invalid or expired", ErrorCode.KEY_NOT_FOUND
+            )
+        return key
+
+    def _is_refreshing(self) -> bool:
+        return self._refresh_task is not None and not self._refresh_task.done()
+
+    def _may_refresh(self) -> bool:
+        # at most one fetch attempt per `min_refresh_interval`, so neither unknown
+        # `kid`s nor an unreachable IdP turn requests into a stream of fetches
+        return (
+            not self._is_refreshing()
+            and time.monotonic() - self._attempted_at >= self.min_refresh_interval
+        )
+
+    async def _fetch(self) -> None:
+        self.fetches += 1
+        self._attempted_at = time.monotonic()
+        start = time.perf_counter()
+        try:
+            data = await asyncio.wait_for(
+                self.fetcher.fetch(self.uri), self.fetch_timeout
+            )
+        except BaseException:
+            self._refresh_failed = True
+            raise
+        finally:
+            self.last_fetch_duration = time.perf_counter() - start
+        try:
+            key_set = PyJWKSet.from_dict(data)
+        except PyJWKSetError:
+            # a set without any usable signing key
+            key_set = None
+
+        keys = {}
+        for key in key_set.keys if key_set is not None else ():
+            if key.key_id and key.public_key_use in ("sig", None):
+                keys[key.key_id] = key
+        # swapped in one assignment, readers never see a partial key set
+        self._keys = keys
+        self._fetched_at = time.monotonic()
+        self._refresh_failed = False
+        self._missing.clear()
+
+    async def _refresh_safely(self) -> None:
+        try:
+            await self.refresh()
+        except Exception:
+            logger.exception("Fetching the JWK set from %s failed", self.uri)
+
+    async def _refresh_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(max(self.refresh_interval, self.min_refresh_interval))
+            await self._refresh_safely()
+
+
+class JWKSClientRegistry:
+    """
+    Process-wide registry of JWKS clients, so that every `JWTService` pointing at
+    the same JWK url shares one key set cache instead of fetching it on each decode.
+
+    It also holds the `JWKSManager` of each JWK url, created by `JWTModule`.
+    """
+
+    def __init__(self) -> None:
+        self._clients: t.Dict[t.Tuple[str, int, int], JWKSClient] = {}
+        self._managers: t.Dict[str, JWKSManager] = {}
+        self._lock = threading.Lock()
+
+    def get_client(
+        self, uri: str, lifespan: int = 300, max_cached_keys: int = 16
+    ) -> JWKSClient:
+        key = (uri, lifespan, max_cached_keys)
+        client = self._clients.get(key)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(key)
+                if client is None:
+                    client = JWKSClient(
+                        uri, lifespan=lifespan, max_cached_keys=max_cached_keys
+                    )
+                    self._clients[key] = client
+        return client
+
+    def get_manager(self, uri: str, **kwargs: t.Any) -> JWKSManager:
+        """Returns the `JWKSManager` of `uri`, creating it with `kwargs` if needed"""
+        with self._lock:
+            manager = self._managers.get(uri)
+            if manager is None:
+                manager = self._managers[uri] = JWKSManager(uri, **kwargs)
+        return manager
+
+    def find_manager(self, uri: str) -> t.Optional[JWKSManager]:
+        return self._managers.get(uri)
+
+    def remove_manager(self, uri: str) -> t.Optional[JWKSManager]:
+        """Forgets the `JWKSManager` of `uri`, returning it if there was one"""
+        with self._lock:
+            return self._managers.pop(uri, None)
+
+    def stats(self, uri: t.Optional[str] = None) -> JWKSClientStats:
+        """
+        Returns the aggregated signing key cache hits/misses and JWK set fetches,
+        optionally restricted to a single JWK url.
+        """
+        hits = misses = fetches = 0
+        for (client_uri, _, _), client in list(self._clients.items()):
+            if uri is not None and client_uri != uri:
+                continue
+            client_stats = client.stats()
+            hits += client_stats.hits
+            misses += client_stats.misses
+            fetches += client_stats.fetches
+        return JWKSClientStats(hits=hits, misses=misses, fetches=fetches)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clients.clear()
+            self._managers.clear()
+
+
+jwks_registry = JWKSClientRegistry()
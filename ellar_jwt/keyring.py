@@ -0,0 +1,240 @@
+import math
+import threading
+import time
+import typing as t
+from datetime import datetime, timedelta
+
+from .exceptions import ErrorCode, JWTTokenException
+from .keys import dump_key, load_signing_key, load_verifying_key
+from .util import make_utc
+
+__all__ = ["Keyring", "KeyringKey"]
+
+
+class KeyringKey(t.NamedTuple):
+    kid: str
+    # None for keys that only verify, e.g. the public key of another issuer
+    signing_key: t.Any
+    verifying_key: t.Any
+    # epoch time from which tokens signed with the key are rejected
+    retire_at: float = math.inf
+
+    def is_retired(self, now: t.Optional[float] = None) -> bool:
+        return self.retire_at <= (time.time() if now is None else now)
+
+
+def _to_epoch(value: t.Union[datetime, float, None]) -> float:
+    if value is None:
+        return math.inf
+    if isinstance(value, datetime):
+        return make_utc(value).timestamp()
+    return float(value)
+
+
+class Keyring:
+    """
+    Keys of one algorithm indexed by their `kid`, for rotating keys without
+    swapping the `JWTConfiguration`.
+
+    `JWTService.sign` signs with the current key and stamps its `kid` into the token
+    header, and `JWTService.decode` looks the verifying key up by the `kid` of the
+    token header. Keys stay verifiable until they retire, so tokens signed with
+    a previous key keep working while they expire.
+
+    Lookups read an immutable mapping that every change replaces,
+    so only changes to the keyring take its lock.
+    """
+
+    def __init__(self, algorithm: str = "HS256") -> None:
+        self.algorithm = algorithm
+        self._keys: t.Dict[str, KeyringKey] = {}
+        self._current: t.Optional[str] = None
+        self._next_retirement = math.inf
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def add(
+        self,
+        kid: str,
+        signing_key: t.Any = None,
+        verifying_key: t.Any = None,
+        current: bool = False,
+        retire_at: t.Union[datetime, float, None] = None,
+    ) -> KeyringKey:
+        """
+        Adds a key, or replaces the key with the same `kid`.
+
+        It becomes the current signing key when `current` is set, or when it is
+        the first key of the keyring that can sign. For HMAC algorithms the signing
+        key verifies too, and for asymmetric algorithms the public key is derived
+        from the private signing key when no `verifying_key` is given.
+        """
+        if signing_key is None and not verifying_key:
+            raise ValueError(f"Key '{kid}' needs a signing or a verifying key.")
+        if current and signing_key is None:
+            raise ValueError(f"Key '{kid}' can not be current without a signing key.")
+
+        loaded_signing_key = None
+        if signing_key is not None:
+            loaded_signing_key = load_signing_key(self.algorithm, signing_key)
+        if self.algorithm.startswith("HS") and signing_key is None:
+            loaded_verifying_key = load_signing_key(self.algorithm, verifying_key)
+        else:
+            loaded_verifying_key = load_verifying_key(
+                self.algorithm, verifying_key, loaded_signing_key
+            )
+        key = KeyringKey(
+            kid, loaded_signing_key, loaded_verifying_key, _to_epoch(retire_at)
+        )
+        with self._lock:
+            keys = dict(self._keys)
+            keys[kid] = key
+            if current or (self._current is None and signing_key is not None):
+                self._current = kid
+            elif self._current == kid and signing_key is None:
+                self._current = None
+            self._replace(keys)
+        return key
+
+    def rotate(
+        self,
+        kid: str,
+        signing_key: t.Any,
+        verifying_key: t.Any = None,
+        grace: t.Optional[timedelta] = None,
+    ) -> KeyringKey:
+        """
+        Adds a new current signing key. The previous current key stops signing and,
+        when `grace` is given, retires after it, e.g. the token lifetime plus leeway.
+        """
+        previous = self._current
+        key = self.add(kid, signing_key, verifying_key, current=True)
+        if previous is not None and previous != kid and grace is not None:
+            self.retire(previous, time.time() + grace.total_seconds())
+        return key
+
+    def retire(self, kid: str, at: t.Union[datetime, float, None] = None) -> None:
+        """
+        Schedules `kid` to stop verifying tokens at `at`, or right away.
+        A retired key never signs again.
+        """
+        retire_at = time.time() if at is None else _to_epoch(at)
+        with self._lock:
+            key = self._keys.get(kid)
+            if key is None:
+                raise KeyError(kid)
+            keys = dict(self._keys)
+            keys[kid] = key._replace(retire_at=retire_at)
+            if self._current == kid:
+                self._current = None
+            self._replace(keys)
+
+    def remove(self, kid: str) -> None:
+        """Drops `kid`, tokens signed with it are rejected from now on"""
+        with self._lock:
+            if kid not in self._keys:
+                raise KeyError(kid)
+            keys = dict(self._keys)
+            del keys[kid]
+            if self._current == kid:
+                self._current = None
+            self._replace(keys)
+
+    def purge(self) -> int:
+        """Drops the keys that retired. Returns their count"""
+        now = time.time()
+        with self._lock:
+            keys = {
+                kid: key for kid, key in self._keys.items() if not key.is_retired(now)
+            }
+            purged = len(self._keys) - len(keys)
+            if purged:
+                self._replace(keys)
+            return purged
+
+    def _replace(self, keys: t.Dict[str, KeyringKey]) -> None:
+        self._keys = keys
+        self._next_retirement = min(
+            (key.retire_at for key in keys.values()), default=math.inf
+        )
+        self._version += 1
+
+    @property
+    def version(self) -> int:
+        """Changes whenever a key is added, replaced, removed or retires"""
+        if self._next_retirement <= time.time():
+            self.purge()
+        return self._version
+
+    @property
+    def current(self) -> t.Optional[KeyringKey]:
+        """The key `JWTService.sign` signs with"""
+        if self._current is None:
+            return None
+        return self._keys.get(self._current)
+
+    def get_signing_key(self, kid: t.Optional[str] = None) -> KeyringKey:
+        """Returns the key to sign with, the current one unless `kid` is given"""
+        if kid is None:
+            key = self.current
+            if key is None or key.is_retired():
+                raise RuntimeError("The keyring has no current signing key.")
+            return key
+
+        key = self._keys.get(kid)
+        if key is None:
+            raise ValueError(f"Key '{kid}' is not in the keyring.")
+        if key.signing_key is None:
+            raise ValueError(f"Key '{kid}' has no signing key.")
+        if key.is_retired():
+            raise ValueError(f"Key '{kid}' is retired.")
+        return key
+
+    def get_verifying_key(self, kid: t.Optional[str]) -> t.Any:
+        """Returns the verifying key of `kid`, unless it is unknown or retired"""
+        key = self._keys.get(kid) if kid is not None else None
+        if key is None or key.retire_at <= time.time():
+            raise JWTTokenException(
+                "Token is invalid or expired", ErrorCode.KEY_NOT_FOUND
+            )
+        return key.verifying_key
+
+    @property
+    def kids(self) -> t.List[str]:
+        return list(self._keys)
+
+    def __contains__(self, kid: t.Any) -> bool:
+        return kid in self._keys
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __getstate__(self) -> t.Dict[str, t.Any]:
+        # loaded key objects can't be pickled, e.g. for process executor workers
+        return {
+            "algorithm": self.algorithm,
+            "current": self._current,
+            "version": self._version,
+            "keys": [
+                (
+                    key.kid,
+                    dump_key(key.signing_key),
+                    dump_key(key.verifying_key),
+                    key.retire_at,
+                )
+                for key in self._keys.values()
+            ],
+        }
+
+    def __setstate__(self, state: t.Dict[str, t.Any]) -> None:
+        self.__init__(state["algorithm"])  # type:ignore[misc]
+        for kid, signing_key, verifying_key, retire_at in state["keys"]:
+            self.add(kid, signing_key, verifying_key, retire_at=retire_at)
+        self._current = state["current"]
+        self._version = state["version"]
+
+    def __repr__(self) -> str:
+        return (
+            f"<{self.__class__.__name__} algorithm={self.algorithm!r} "
+            f"current={self._current!r} kids={self.kids!r}>"
+        )
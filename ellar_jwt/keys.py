@@ -0,0 +1,137 @@
+import functools
+import typing as t
+
+from jwt.algorithms import Algorithm, get_default_algorithms
+from jwt.exceptions import InvalidKeyError
+
+__all__ = [
+    "get_algorithm",
+    "get_signature_size",
+    "load_signing_key",
+    "load_verifying_key",
+    "dump_key",
+]
+
+_KEY_ERRORS = (InvalidKeyError, TypeError, ValueError)
+_HMAC_DIGEST_SIZES = {"HS256": 32, "HS384": 48, "HS512": 64}
+
+
+def get_algorithm(algorithm: str) -> Algorithm:
+    return get_default_algorithms()[algorithm]
+
+
+def load_signing_key(algorithm: str, key: t.Any) -> t.Any:
+    """
+    Parses a signing key once into the object PyJWT would otherwise build on every
+    `jwt.encode` call, e.g. a `cryptography` private key for RS/ES algorithms.
+
+    Keys that can not be parsed are returned untouched, so that PyJWT keeps
+    raising the same error it always did, at signing time.
+    """
+    try:
+        return get_algorithm(algorithm).prepare_key(key)
+    except _KEY_ERRORS:
+        return key
+
+
+def load_verifying_key(algorithm: str, key: t.Any, signing_key: t.Any = None) -> t.Any:
+    """
+    Parses a verifying key once into the object PyJWT would otherwise build on
+    every `jwt.decode` call.
+
+    For HMAC algorithms the signing key is the verifying key. For asymmetric
+    algorithms without a verifying key, the public key is derived from the
+    already loaded private signing key.
+    """
+    if algorithm.startswith("HS"):
+        return signing_key
+
+    if not key:
+        if hasattr(signing_key, "public_key"):
+            return signing_key.public_key()
+        return b""
+
+    try:
+        return get_algorithm(algorithm).prepare_key(key)
+    except _KEY_ERRORS:
+        return key.encode() if isinstance(key, str) else key
+
+
+def get_signature_size(algorithm: str, verifying_key: t.Any) -> t.Optional[int]:
+    """
+    Returns the size in bytes of every signature `verifying_key` can verify for
+    `algorithm`, or None when it can't be told from the key.
+
+    HMAC signatures are as long as the digest, RSA and RSA-PSS ones as the modulus,
+    ECDSA ones are twice the size of the curve, and EdDSA ones are 64 bytes for
+    Ed25519 and 114 bytes for Ed448.
+    """
+    if algorithm in _HMAC_DIGEST_SIZES:
+        return _HMAC_DIGEST_SIZES[algorithm]
+
+    try:
+        from cryptography.hazmat.primitives.asymmetric import ec, ed448, ed25519, rsa
+    except ImportError:  # pragma: no cover
+        return None
+
+    if algorithm[:2] in ("RS", "PS") and isinstance(verifying_key, rsa.RSAPublicKey):
+        return (verifying_key.key_size + 7) // 8
+    if algorithm[:2] == "ES" and isinstance(verifying_key, ec.EllipticCurvePublicKey):
+        return 2 * ((verifying_key.curve.key_size + 7) // 8)
+    if algorithm == "EdDSA":
+        if isinstance(verifying_key, ed25519.Ed25519PublicKey):
+            return 64
+        if isinstance(verifying_key, ed448.Ed448PublicKey):
+            return 114
+    return None
+
+
+def dump_key(key: t.Any) -> t.Any:
+    """
+    Returns a PEM encoded copy of a loaded `cryptography` key object, e.g. to ship it
+    to another process. Any other key is returned untouched.
+    """
+    if not hasattr(key, "private_bytes") and not hasattr(key, "public_bytes"):
+        return key
+
+    from cryptography.hazmat.primitives import serialization
+
+    if hasattr(key, "private_bytes"):
+        return key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+    return key.public_bytes(
+        serialization.Encoding.PEM,
+        serialization.PublicFormat.SubjectPublicKeyInfo,
+    )
+
+
+class ResolvedKey:
+    """
+    A verifying key resolved by the caller, e.g. from the JWK set on the event loop,
+    handed to an executor along with the token. It pickles as PEM, so process workers
+    verify with it instead of fetching the JWK set themselves, and each worker loads
+    a given key once.
+    """
+
+    __slots__ = ("key",)
+
+    def __init__(self, key: t.Any) -> None:
+        self.key = key
+
+    def __reduce__(self) -> t.Tuple[t.Any, ...]:
+        pem = dump_key(self.key)
+        if pem is self.key:
+            return ResolvedKey, (self.key,)
+        return _load_resolved_key, (pem,)
+
+
+@functools.lru_cache(maxsize=64)
+def _load_resolved_key(pem: bytes) -> ResolvedKey:
+    from cryptography.hazmat.primitives import serialization
+
+    if b"PRIVATE KEY" in pem:
+        return ResolvedKey(serialization.load_pem_private_key(pem, password=None))
+    return ResolvedKey(serialization.load_pem_public_key(pem))
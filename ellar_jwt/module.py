@@ -2,44 +2,143 @@ import json
 import typing as t
 from datetime import timedelta
 
-from ellar.common import IModuleSetup, Module
+from ellar.common import (
+    IApplicationShutdown,
+    IApplicationStartup,
+    IModuleSetup,
+    Module,
+)
 from ellar.core import Config, ModuleSetup
+from ellar.core.middleware.middleware import EllarMiddleware
 from ellar.core.modules import DynamicModule, ModuleBase, ModuleRefBase
 from ellar.di import ProviderConfig
 from pydantic import AnyHttpUrl
 
+from .auth import JWTAuthMiddleware
+from .clock import Clock
+from .executors import JWTExecutor
+from .instrumentation import JWTHook
+from .jwks import JWKSFetcher, JWKSManager, jwks_registry
+from .keyring import Keyring
+from .revocation import RevocationStore
 from .schemas import JWTConfiguration
+from .serializers import JSONSerializer
 from .services import JWTService
 
+if t.TYPE_CHECKING:  # pragma: no cover
+    from ellar.app import App
+
 
 @Module(exports=[JWTService, JWTConfiguration])
-class JWTModule(ModuleBase, IModuleSetup):
+class JWTModule(ModuleBase, IModuleSetup, IApplicationStartup, IApplicationShutdown):
+    _jwks_manager: t.Optional[JWKSManager] = None
+    _jwt_service: t.Optional[JWTService] = None
+
+    async def on_startup(self, app: "App") -> None:
+        # kept to release its executor, e.g. the process pool, on shutdown
+        self._jwt_service = app.injector.get(JWTService)
+
+        # prefetches the JWK set and keeps it fresh in the background
+        jwt_config: JWTConfiguration = app.injector.get(JWTConfiguration)
+        if not jwt_config.jwk_url or jwt_config.algorithm.startswith("HS"):
+            return
+
+        self._jwks_manager = jwks_registry.get_manager(
+            str(jwt_config.jwk_url),
+            fetcher=jwt_config.jwks_fetcher,
+            refresh_interval=jwt_config.jwks_lifespan,
+            negative_cache_ttl=jwt_config.jwks_negative_cache_ttl,
+            fetch_timeout=jwt_config.jwks_fetch_timeout,
+        )
+        await self._jwks_manager.start()
+
+    async def on_shutdown(self) -> None:
+        if self._jwks_manager is not None:
+            await self._jwks_manager.stop()
+            jwks_registry.remove_manager(self._jwks_manager.uri)
+            self._jwks_manager = None
+        if self._jwt_service is not None:
+            self._jwt_service.executor.shutdown()
+            self._jwt_service = None
+
     @classmethod
     def setup(
         cls,
-        signing_secret_key: str,
-        verifying_secret_key: str = "",
+        signing_secret_key: t.Union[str, bytes, t.Any],
+        verifying_secret_key: t.Union[str, bytes, t.Any] = "",
         algorithm: str = "HS256",
         audience: t.Optional[str] = None,
         issuer: t.Optional[str] = None,
         jwk_url: t.Optional[AnyHttpUrl] = None,
+        jwks_lifespan: int = 300,
+        jwks_max_cached_keys: int = 16,
+        jwks_fetcher: t.Optional[JWKSFetcher] = None,
+        jwks_negative_cache_ttl: float = 30,
+        jwks_fetch_timeout: float = 10,
+        keyring: t.Optional[Keyring] = None,
         leeway: t.Union[float, int, timedelta] = 0,
+        default_claims: t.Optional[t.Dict[str, t.Any]] = None,
+        default_headers: t.Optional[t.Dict[str, t.Any]] = None,
+        compact: bool = False,
+        claim_aliases: t.Optional[t.Dict[str, str]] = None,
+        encryption_algorithm: t.Optional[str] = None,
+        encryption_method: str = "A256GCM",
+        encryption_key: t.Union[str, bytes, t.Any] = None,
+        decryption_key: t.Union[str, bytes, t.Any] = None,
         jti: str = "jti",
         lifetime: t.Optional[timedelta] = None,
+        clock: t.Optional[Clock] = None,
         json_encoder: t.Any = json.JSONEncoder,
+        serializer: t.Union[str, JSONSerializer] = "json",
+        executor: t.Union[str, JWTExecutor] = "thread",
+        executor_max_workers: t.Optional[int] = None,
+        inline_cost_threshold: int = 1,
+        token_cache_size: int = 0,
+        token_cache_max_bytes: int = 16 * 1024 * 1024,
+        token_cache_ttl: float = 300,
+        revocation_store: t.Optional[RevocationStore] = None,
+        hooks: t.Optional[t.Sequence[JWTHook]] = None,
+        profiles: t.Optional[t.Dict[str, t.Dict[str, t.Any]]] = None,
+        auth_middleware: t.Optional[str] = None,
     ) -> DynamicModule:
         configuration = JWTConfiguration(
             signing_secret_key=signing_secret_key,
+            verifying_secret_key=verifying_secret_key,
             algorithm=algorithm,  # type: ignore[arg-type]
             audience=audience,
             issuer=issuer,
             jwk_url=jwk_url,
+            jwks_lifespan=jwks_lifespan,
+            jwks_max_cached_keys=jwks_max_cached_keys,
+            jwks_fetcher=jwks_fetcher,
+            jwks_negative_cache_ttl=jwks_negative_cache_ttl,
+            jwks_fetch_timeout=jwks_fetch_timeout,
+            keyring=keyring,
             leeway=leeway,
+            default_claims=default_claims or {},
+            default_headers=default_headers or {},
+            compact=compact,
+            claim_aliases=claim_aliases or {},
+            encryption_algorithm=encryption_algorithm,  # type: ignore[arg-type]
+            encryption_method=encryption_method,  # type: ignore[arg-type]
+            encryption_key=encryption_key,
+            decryption_key=decryption_key,
             jti=jti,
             lifetime=lifetime or timedelta(minutes=5),
+            clock=clock,
             json_encoder=json_encoder,
+            serializer=serializer,
+            executor=executor,
+            executor_max_workers=executor_max_workers,
+            inline_cost_threshold=inline_cost_threshold,
+            token_cache_size=token_cache_size,
+            token_cache_max_bytes=token_cache_max_bytes,
+            token_cache_ttl=token_cache_ttl,
+            revocation_store=revocation_store,
+            hooks=list(hooks or []),
+            profiles=profiles or {},
+            auth_middleware=auth_middleware,  # type: ignore[arg-type]
         )
-
         return DynamicModule(
             cls,
             providers=[
@@ -48,6 +147,23 @@ class JWTModule(ModuleBase, IModuleSetup):
             ],
         )
 
+    @classmethod
+    def post_build(cls, module_ref: ModuleRefBase) -> None:
+        # the auth middleware goes to the config of the application being built,
+        # not to the module class every application of the process shares
+        provider = module_ref.providers.get(JWTConfiguration)
+        jwt_config = getattr(provider, "use_value", None)
+        if (
+            isinstance(jwt_config, JWTConfiguration)
+            and jwt_config.auth_middleware is not None
+        ):
+            module_ref.config.MIDDLEWARE = [
+                *module_ref.config.MIDDLEWARE,
+                EllarMiddleware(
+                    JWTAuthMiddleware, lazy=jwt_config.auth_middleware == "lazy"
+                ),
+            ]
+
     @classmethod
     def register_setup(cls) -> ModuleSetup:
         return ModuleSetup(cls, inject=[Config], factory=cls.register_setup_factory)
@@ -0,0 +1,268 @@
+import typing as t
+from datetime import timedelta
+
+from ellar.common import serialize_object
+from jwt import PyJWT
+from jwt.algorithms import Algorithm
+
+from .clock import Clock, system_clock
+from .encoding import encode_header_segment
+from .keyring import Keyring
+from .keys import (
+    get_algorithm,
+    get_signature_size,
+    load_signing_key,
+    load_verifying_key,
+)
+from .schemas import JWTConfiguration
+from .serializers import (
+    JSONSerializer,
+    SerializerPyJWT,
+    StdlibJSONSerializer,
+    create_serializer,
+    is_json_native,
+)
+from .token import compile_claims_template
+
+__all__ = ["JWTPlan", "ALGORITHM_COSTS"]
+
+# Rough cost of signing/verifying a token relative to HMAC, see `inline_cost_threshold`
+ALGORITHM_COSTS: t.Dict[str, int] = {
+    "HS256": 1,
+    "HS384": 1,
+    "HS512": 1,
+    "RS256": 20,
+    "RS384": 20,
+    "RS512": 25,
+    "ES256": 10,
+    "ES384": 30,
+    "ES512": 50,
+    "PS256": 20,
+    "PS384": 20,
+    "PS512": 25,
+    "EdDSA": 20,
+    # and of decrypting the content encryption key of a JWE
+    "dir": 1,
+    "A128KW": 1,
+    "A192KW": 1,
+    "A256KW": 1,
+    "RSA-OAEP-256": 20,
+}
+
+
+class JWTPlan:
+    """
+    Immutable, precompiled view of a `JWTConfiguration`.
+
+    Everything `JWTService.sign` and `JWTService.decode` need per call is resolved
+    once here, so the hot path never re-validates or re-dumps the pydantic configuration.
+    """
+
+    __slots__ = (
+        "jwt_config",
+        "algorithm",
+        "algorithms",
+        "algorithm_obj",
+        "signing_key",
+        "verifying_key",
+        "keyring",
+        "audience",
+        "issuer",
+        "jwk_url",
+        "jwks_lifespan",
+        "jwks_max_cached_keys",
+        "leeway",
+        "jti",
+        "lifetime",
+        "clock",
+        "claims_template",
+        "enforced_claims",
+        "default_headers",
+        "header_segment",
+        "json_encoder",
+        "serializer",
+        "jwt_api",
+        "options",
+        "unverified_options",
+        "inline",
+        "precheck",
+        "accept_refresh_tokens",
+        "precheck_claims",
+        "requires_kid",
+        "max_token_size",
+        "signature_length",
+        "compact",
+        "claim_aliases",
+        "claim_names",
+        "cipher",
+        "inline_decryption",
+    )
+
+    jwt_config: JWTConfiguration
+    algorithm: str
+    algorithms: t.List[str]
+    algorithm_obj: Algorithm
+    signing_key: t.Any
+    verifying_key: t.Any
+    keyring: t.Optional[Keyring]
+    audience: t.Optional[str]
+    issuer: t.Optional[str]
+    jwk_url: t.Optional[str]
+    jwks_lifespan: int
+    jwks_max_cached_keys: int
+    leeway: timedelta
+    jti: t.Optional[str]
+    lifetime: timedelta
+    clock: Clock
+    # see `ellar_jwt.token.compile_claims_template`
+    claims_template: t.Dict[str, t.Any]
+    enforced_claims: t.Dict[str, t.Any]
+    default_headers: t.Dict[str, t.Any]
+    # encoded header of tokens signed without per-call headers or a keyring `kid`
+    header_segment: bytes
+    json_encoder: t.Any
+    serializer: JSONSerializer
+    # None when PyJWT's own `jwt.encode`/`jwt.decode` serialize the payload
+    jwt_api: t.Optional[PyJWT]
+    options: t.Dict[str, bool]
+    unverified_options: t.Dict[str, bool]
+    inline: bool
+    precheck: bool
+    accept_refresh_tokens: bool
+    # whether the pre-check also rejects expired and immature tokens
+    precheck_claims: bool
+    requires_kid: bool
+    max_token_size: t.Optional[int]
+    # base64url length of every signature the verifying key can verify, if known
+    signature_length: t.Optional[int]
+    compact: bool
+    claim_aliases: t.Dict[str, str]
+    # claim names by alias, to expand the claims of decoded tokens
+    claim_names: t.Dict[str, str]
+    # `ellar_jwt.jwe.JWECipher` of `encrypt` and `decrypt`, if configured
+    cipher: t.Any
+    inline_decryption: bool
+
+    def __init__(self, jwt_config: JWTConfiguration) -> None:
+        is_hmac = jwt_config.algorithm.startswith("HS")
+        signing_key = load_signing_key(
+            jwt_config.algorithm, jwt_config.signing_secret_key
+        )
+        values: t.Dict[str, t.Any] = {
+            "jwt_config": jwt_config,
+            "algorithm": jwt_config.algorithm,
+            "algorithms": [jwt_config.algorithm],
+            "algorithm_obj": get_algorithm(jwt_config.algorithm),
+            "signing_key": signing_key,
+            "verifying_key": load_verifying_key(
+                jwt_config.algorithm, jwt_config.verifying_secret_key, signing_key
+            ),
+            "keyring": jwt_config.keyring,
+            "audience": jwt_config.audience,
+            "issuer": jwt_config.issuer,
+            # HMAC keys are never resolved from a JWK set
+            "jwk_url": (
+                str(jwt_config.jwk_url) if jwt_config.jwk_url and not is_hmac else None
+            ),
+            "jwks_lifespan": jwt_config.jwks_lifespan,
+            "jwks_max_cached_keys": jwt_config.jwks_max_cached_keys,
+            "leeway": self._compile_leeway(jwt_config.leeway),
+            "jti": jwt_config.jti,
+            "lifetime": jwt_config.lifetime,
+            "clock": jwt_config.clock or system_clock,
+            "json_encoder": jwt_config.json_encoder,
+            "options": {
+                "verify_aud": jwt_config.audience is not None,
+                "verify_signature": True,
+            },
+            "unverified_options": {
+                "verify_aud": jwt_config.audience is not None,
+                "verify_signature": False,
+            },
+        }
+        # cheap operations run on the event loop instead of paying for a thread hop,
+        # unless resolving the key may block on a JWK set fetch
+        values["inline"] = values["jwk_url"] is None and (
+            ALGORITHM_COSTS.get(jwt_config.algorithm, max(ALGORITHM_COSTS.values()))
+            <= jwt_config.inline_cost_threshold
+        )
+        values["precheck"] = jwt_config.precheck
+        values["accept_refresh_tokens"] = jwt_config.accept_refresh_tokens
+        values["requires_kid"] = (
+            jwt_config.keyring is not None or values["jwk_url"] is not None
+        )
+        # decoding the payload twice only pays off when it saves a costly
+        # signature check or a JWK set lookup
+        values["precheck_claims"] = jwt_config.precheck and (
+            values["jwk_url"] is not None
+            or ALGORITHM_COSTS.get(jwt_config.algorithm, 0) > 1
+        )
+        values["max_token_size"] = jwt_config.max_token_size
+        # keys of a keyring or JWK set are only known per token, but the size of
+        # HMAC signatures doesn't depend on the key
+        signature_size = (
+            get_signature_size(jwt_config.algorithm, values["verifying_key"])
+            if is_hmac or not values["requires_kid"]
+            else None
+        )
+        values["signature_length"] = (
+            None if signature_size is None else (signature_size * 4 + 2) // 3
+        )
+        values["compact"] = jwt_config.compact
+        values["claim_aliases"] = dict(jwt_config.claim_aliases)
+        values["claim_names"] = {
+            alias: name for name, alias in jwt_config.claim_aliases.items()
+        }
+        values["cipher"] = None
+        if jwt_config.encryption_algorithm is not None:
+            from .jwe import JWECipher
+
+            values["cipher"] = JWECipher(
+                jwt_config.encryption_algorithm,
+                jwt_config.encryption_method,
+                jwt_config.encryption_key,
+                jwt_config.decryption_key,
+            )
+        values["inline_decryption"] = (
+            ALGORITHM_COSTS.get(jwt_config.encryption_algorithm or "dir", 1)
+            <= jwt_config.inline_cost_threshold
+        )
+        default_claims = jwt_config.default_claims
+        if not is_json_native(default_claims):
+            default_claims = serialize_object(default_claims)
+        values["claims_template"], values["enforced_claims"] = compile_claims_template(
+            jwt_config, default_claims
+        )
+        values["default_headers"] = dict(jwt_config.default_headers)
+        values["header_segment"] = encode_header_segment(
+            jwt_config.algorithm,
+            values["default_headers"],
+            # `alg` and `typ` alone never need the encoder
+            jwt_config.json_encoder if values["default_headers"] else None,
+        )
+        serializer = create_serializer(jwt_config.serializer, jwt_config.json_encoder)
+        values["serializer"] = serializer
+        values["jwt_api"] = (
+            None
+            if type(serializer) is StdlibJSONSerializer
+            else SerializerPyJWT(serializer)
+        )
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    @staticmethod
+    def _compile_leeway(leeway: t.Union[float, int, timedelta, None]) -> timedelta:
+        if leeway is None:
+            return timedelta(seconds=0)
+        if isinstance(leeway, timedelta):
+            return leeway
+        return timedelta(seconds=leeway)
+
+    def __setattr__(self, name: str, value: t.Any) -> None:
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} algorithm={self.algorithm!r}>"
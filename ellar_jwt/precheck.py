@@ -0,0 +1,89 @@
+import binascii
+import json
+import time
+import typing as t
+
+from jwt.utils import base64url_decode
+
+from .exceptions import ErrorCode, JWTTokenException
+from .util import LRUCache
+
+if t.TYPE_CHECKING:  # pragma: no cover
+    from .plan import JWTPlan
+
+__all__ = ["precheck_token"]
+
+
+# decoded headers by header segment. Tokens of one issuer share a handful of headers,
+# so most pre-checks don't decode the header at all
+_headers: "LRUCache[str, t.Dict[str, t.Any]]" = LRUCache(256)
+
+
+def _reject(code: str, message: str = "Token is invalid or expired") -> t.NoReturn:
+    raise JWTTokenException(message, code)
+
+
+def _decode_segment(segment: str) -> t.Any:
+    try:
+        return json.loads(base64url_decode(segment))
+    except (binascii.Error, ValueError):
+        _reject(ErrorCode.MALFORMED)
+
+
+def precheck_token(token: t.Any, plan: "JWTPlan") -> t.Dict[str, t.Any]:
+    """
+    Rejects tokens that can't verify, before any key is resolved or signature checked,
+    and returns the unverified header of the others.
+
+    Only the header is decoded, unless `plan.precheck_claims` is set: then the
+    unverified `exp` and `nbf` claims are checked too, as PyJWT would check them
+    once the signature verified.
+    """
+    if isinstance(token, bytes):
+        try:
+            token = token.decode("ascii")
+        except UnicodeDecodeError:
+            _reject(ErrorCode.MALFORMED)
+    if not isinstance(token, str) or (
+        plan.max_token_size is not None and len(token) > plan.max_token_size
+    ):
+        _reject(ErrorCode.MALFORMED)
+
+    segments = token.split(".")
+    if len(segments) != 3 or not segments[0] or not segments[2]:
+        _reject(ErrorCode.MALFORMED)
+
+    header_segment, payload_segment, signature = segments
+    cached = _headers.get(header_segment)
+    if cached is None:
+        cached = _decode_segment(header_segment)
+        if not isinstance(cached, dict):
+            _reject(ErrorCode.MALFORMED)
+        _headers.set(header_segment, cached)
+    # callers get their own copy, the cached header is shared by every token
+    header = dict(cached)
+
+    if header.get("alg") not in plan.algorithms:
+        _reject(ErrorCode.INVALID_ALGORITHM, "Invalid algorithm specified")
+
+    if plan.signature_length is not None and len(signature) != plan.signature_length:
+        _reject(ErrorCode.INVALID_SIGNATURE)
+
+    if plan.requires_kid and not isinstance(header.get("kid"), str):
+        _reject(ErrorCode.KEY_NOT_FOUND)
+
+    if plan.precheck_claims and header.get("b64", True):
+        payload = _decode_segment(payload_segment)
+        if not isinstance(payload, dict):
+            _reject(ErrorCode.MALFORMED)
+
+        now = time.time()
+        leeway = plan.leeway.total_seconds()
+        exp = payload.get("exp")
+        if isinstance(exp, (int, float)) and exp <= now - leeway:
+            _reject(ErrorCode.EXPIRED)
+        nbf = payload.get("nbf")
+        if isinstance(nbf, (int, float)) and nbf > now + leeway:
+            _reject(ErrorCode.IMMATURE)
+
+    return header
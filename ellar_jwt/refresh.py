@@ -0,0 +1,256 @@
+import secrets
+import threading
+import time
+import typing as t
+from abc import ABC, abstractmethod
+from datetime import timedelta
+
+from .exceptions import ErrorCode, JWTTokenException
+from .services import JWTService
+from .token import REFRESH_TOKEN_TYP
+
+__all__ = [
+    "TokenPair",
+    "RefreshTokenStore",
+    "InMemoryRefreshTokenStore",
+    "TokenPairService",
+]
+
+ACCESS_TOKEN = "access"
+REFRESH_TOKEN = "refresh"
+REFRESH_HEADERS = {"typ": REFRESH_TOKEN_TYP}
+
+
+class TokenPair(t.NamedTuple):
+    access_token: str
+    refresh_token: str
+
+
+class RefreshTokenStore(ABC):
+    """
+    Bookkeeping of refresh token families. A family starts with `issue` and holds
+    the `jti` of the only refresh token of the family that may still be used.
+    """
+
+    @abstractmethod
+    def create_family(self, family: str, jti: str, expires_at: float) -> None:
+        """Starts a family whose current refresh token is `jti`"""
+
+    @abstractmethod
+    def rotate(self, family: str, jti: str, new_jti: str, expires_at: float) -> bool:
+        """
+        Atomically replaces the current refresh token of `family` with `new_jti`,
+        if `jti` is its current refresh token. Returns False otherwise,
+        i.e. when `jti` was already used, or the family is unknown or revoked.
+        """
+
+    @abstractmethod
+    def revoke_family(self, family: str) -> None:
+        """Prevents any refresh token of `family` from being rotated again"""
+
+
+class InMemoryRefreshTokenStore(RefreshTokenStore):
+    purge_every = 1024
+
+    def __init__(self) -> None:
+        # family -> (current jti or None once revoked, expires_at)
+        self._families: t.Dict[str, t.Tuple[t.Optional[str], float]] = {}
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def create_family(self, family: str, jti: str, expires_at: float) -> None:
+        with self._lock:
+            self._families[family] = (jti, expires_at)
+            self._created += 1
+            if self._created % self.purge_every == 0:
+                self._purge(time.time())
+
+    def rotate(self, family: str, jti: str, new_jti: str, expires_at: float) -> bool:
+        with self._lock:
+            current = self._families.get(family)
+            if current is None or current[0] != jti:
+                return False
+            self._families[family] = (new_jti, expires_at)
+            return True
+
+    def revoke_family(self, family: str) -> None:
+        with self._lock:
+            current = self._families.get(family)
+            self._families[family] = (None, current[1] if current else time.time())
+
+    def is_family_revoked(self, family: str) -> bool:
+        current = self._families.get(family)
+        return current is not None and current[0] is None
+
+    def purge(self) -> int:
+        """Forgets families whose last refresh token expired. Returns their count"""
+        with self._lock:
+            return self._purge(time.time())
+
+    def _purge(self, now: float) -> int:
+        expired = [
+            family
+            for family, (_, expires_at) in self._families.items()
+            if expires_at <= now
+        ]
+        for family in expired:
+            del self._families[family]
+        return len(expired)
+
+    def __len__(self) -> int:
+        return len(self._families)
+
+
+class TokenPairService:
+    """
+    Issues access/refresh token pairs and rotates refresh tokens.
+
+    Every refresh token belongs to a family started by `issue`. `rotate` exchanges
+    the current refresh token of a family for a new pair, and any attempt to use a
+    refresh token of the family again revokes the whole family.
+
+    Access tokens stay stateless: `decode_access` never touches the store.
+    Refresh tokens are typed `"typ": "refresh+jwt"`, so `JWTService.decode`, and
+    the guards built on it, reject them as access tokens.
+    """
+
+    def __init__(
+        self,
+        jwt_service: JWTService,
+        store: t.Optional[RefreshTokenStore] = None,
+        refresh_lifetime: timedelta = timedelta(days=1),
+        family_claim: str = "fam",
+        type_claim: str = "token_type",
+    ) -> None:
+        self.jwt_service = jwt_service
+        self.store = store or InMemoryRefreshTokenStore()
+        self.refresh_lifetime = refresh_lifetime
+        self.family_claim = family_claim
+        self.type_claim = type_claim
+
+    @property
+    def jti_claim(self) -> str:
+        return self.jwt_service.plan.jti or "jti"
+
+    def _reserved_claims(self) -> t.Set[str]:
+        return {
+            "exp",
+            "iat",
+            "nbf",
+            "aud",
+            "iss",
+            self.jti_claim,
+            self.family_claim,
+            self.type_claim,
+        }
+
+    def _pair_claims(
+        self, claims: t.Dict[str, t.Any], family: str, jti: str
+    ) -> t.Tuple[t.Dict[str, t.Any], t.Dict[str, t.Any]]:
+        access_claims = {**claims, self.type_claim: ACCESS_TOKEN}
+        refresh_claims = {
+            **claims,
+            self.type_claim: REFRESH_TOKEN,
+            self.family_claim: family,
+            self.jti_claim: jti,
+        }
+        return access_claims, refresh_claims
+
+    def _sign_pair(
+        self, claims: t.Dict[str, t.Any], family: str, jti: str
+    ) -> TokenPair:
+        access_claims, refresh_claims = self._pair_claims(claims, family, jti)
+        return TokenPair(
+            self.jwt_service.sign(access_claims),
+            self.jwt_service.sign(
+                refresh_claims, REFRESH_HEADERS, lifetime=self.refresh_lifetime
+            ),
+        )
+
+    async def _sign_pair_async(
+        self, claims: t.Dict[str, t.Any], family: str, jti: str
+    ) -> TokenPair:
+        access_claims, refresh_claims = self._pair_claims(claims, family, jti)
+        return TokenPair(
+            await self.jwt_service.sign_async(access_claims),
+            await self.jwt_service.sign_async(
+                refresh_claims, REFRESH_HEADERS, lifetime=self.refresh_lifetime
+            ),
+        )
+
+    def _expires_at(self) -> float:
+        leeway = self.jwt_service.plan.leeway
+        return time.time() + (self.refresh_lifetime + leeway).total_seconds()
+
+    def _start_family(self) -> t.Tuple[str, str]:
+        family = secrets.token_hex(16)
+        jti = secrets.token_hex(16)
+        self.store.create_family(family, jti, self._expires_at())
+        return family, jti
+
+    def _rotate_family(
+        self, payload: t.Dict[str, t.Any]
+    ) -> t.Tuple[t.Dict[str, t.Any], str, str]:
+        if payload.get(self.type_claim) != REFRESH_TOKEN:
+            raise JWTTokenException(
+                "Token is not a refresh token", ErrorCode.WRONG_TOKEN_TYPE
+            )
+
+        family = payload.get(self.family_claim)
+        jti = payload.get(self.jti_claim)
+        if not family or not jti:
+            raise JWTTokenException(
+                "Token is invalid or expired", ErrorCode.MISSING_CLAIM
+            )
+
+        new_jti = secrets.token_hex(16)
+        if not self.store.rotate(family, jti, new_jti, self._expires_at()):
+            self.store.revoke_family(family)
+            raise JWTTokenException(
+                "Refresh token reuse detected", ErrorCode.REFRESH_TOKEN_REUSED
+            )
+
+        reserved = self._reserved_claims()
+        claims = {key: value for key, value in payload.items() if key not in reserved}
+        return claims, family, new_jti
+
+    def _check_access(self, payload: t.Dict[str, t.Any]) -> t.Dict[str, t.Any]:
+        if payload.get(self.type_claim) == REFRESH_TOKEN:
+            raise JWTTokenException(
+                "Token is not an access token", ErrorCode.WRONG_TOKEN_TYPE
+            )
+        return payload
+
+    def issue(self, claims: t.Dict[str, t.Any]) -> TokenPair:
+        """Starts a new refresh token family and returns its first token pair"""
+        family, jti = self._start_family()
+        return self._sign_pair(claims, family, jti)
+
+    async def issue_async(self, claims: t.Dict[str, t.Any]) -> TokenPair:
+        family, jti = self._start_family()
+        return await self._sign_pair_async(claims, family, jti)
+
+    def rotate(self, refresh_token: str) -> TokenPair:
+        """
+        Exchanges the current refresh token of a family for a new token pair.
+        Reusing an already rotated refresh token revokes its whole family.
+        """
+        payload = self.jwt_service.decode(refresh_token, accept_refresh_tokens=True)
+        return self._sign_pair(*self._rotate_family(payload))
+
+    async def rotate_async(self, refresh_token: str) -> TokenPair:
+        payload = await self.jwt_service.decode_async(
+            refresh_token, accept_refresh_tokens=True
+        )
+        return await self._sign_pair_async(*self._rotate_family(payload))
+
+    def decode_access(self, token: str, **jwt_config: t.Any) -> t.Dict[str, t.Any]:
+        """Verifies an access token without consulting the refresh token store"""
+        return self._check_access(self.jwt_service.decode(token, **jwt_config))
+
+    async def decode_access_async(
+        self, token: str, **jwt_config: t.Any
+    ) -> t.Dict[str, t.Any]:
+        return self._check_access(
+            await self.jwt_service.decode_async(token, **jwt_config)
+        )
@@ -0,0 +1,244 @@
+import hashlib
+import heapq
+import math
+import sqlite3
+import threading
+import time
+import typing as t
+from abc import ABC, abstractmethod
+
+__all__ = [
+    "BloomFilter",
+    "RevocationStore",
+    "InMemoryRevocationStore",
+    "SQLiteRevocationStore",
+]
+
+
+class BloomFilter:
+    """
+    Compact probabilistic set. `key in bloom` is False for keys that were never
+    added, and True (with a false positive rate of about `error_rate` up to
+    `capacity` keys) for keys that were.
+    """
+
+    __slots__ = ("capacity", "error_rate", "size", "hash_count", "count", "_bits")
+
+    def __init__(self, capacity: int = 100_000, error_rate: float = 0.001) -> None:
+        self.capacity = max(capacity, 1)
+        self.error_rate = error_rate
+        self.size = max(
+            8, int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2))
+        )
+        self.hash_count = max(1, round(self.size / self.capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str) -> t.Iterator[int]:
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for index in range(self.hash_count):
+            yield (h1 + index * h2) % self.size
+
+    def add(self, key: str) -> None:
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        bits = self._bits
+        return all(
+            bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+
+class RevocationStore(ABC):
+    """
+    Storage of revoked token ids (`jti`), consulted by `JWTService.decode`.
+
+    A revocation only needs to be kept until the token it revokes expires.
+    """
+
+    @abstractmethod
+    def revoke(self, jti: str, expires_at: float = math.inf) -> None:
+        """Marks `jti` as revoked until the `expires_at` epoch time"""
+
+    @abstractmethod
+    def is_revoked(self, jti: str) -> bool:
+        """Returns whether `jti` is currently revoked"""
+
+    def purge(self) -> int:
+        """Removes revocations of tokens that already expired and returns their count"""
+        return 0
+
+
+class InMemoryRevocationStore(RevocationStore):
+    """
+    Per-process revocation store. Revocations expire at their token's `exp`,
+    and a bloom filter answers the common "not revoked" case without a lookup.
+    """
+
+    def __init__(self, capacity: int = 100_000, error_rate: float = 0.001) -> None:
+        self.error_rate = error_rate
+        self._revoked: t.Dict[str, float] = {}
+        self._expiry_heap: t.List[t.Tuple[float, str]] = []
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._lock = threading.Lock()
+
+    def revoke(self, jti: str, expires_at: float = math.inf) -> None:
+        with self._lock:
+            self._purge(time.time())
+            self._revoked[jti] = expires_at
+            heapq.heappush(self._expiry_heap, (expires_at, jti))
+            self._bloom.add(jti)
+            if self._bloom.count > self._bloom.capacity:
+                self._rebuild_bloom()
+
+    def is_revoked(self, jti: str) -> bool:
+        if jti not in self._bloom:
+            return False
+
+        expires_at = self._revoked.get(jti)
+        if expires_at is None:
+            return False
+        return expires_at > time.time()
+
+    def purge(self) -> int:
+        with self._lock:
+            return self._purge(time.time())
+
+    def _purge(self, now: float) -> int:
+        purged = 0
+        heap = self._expiry_heap
+        while heap and heap[0][0] <= now:
+            expires_at, jti = heapq.heappop(heap)
+            # the jti may have been revoked again with a later expiry
+            if self._revoked.get(jti) == expires_at:
+                del self._revoked[jti]
+                purged += 1
+
+        if purged and self._bloom.count > 2 * len(self._revoked) + 1024:
+            self._rebuild_bloom()
+        return purged
+
+    def _rebuild_bloom(self) -> None:
+        self._bloom = BloomFilter(
+            max(self._bloom.capacity, 2 * len(self._revoked)), self.error_rate
+        )
+        for jti in self._revoked:
+            self._bloom.add(jti)
+
+    def __len__(self) -> int:
+        return len(self._revoked)
+
+
+class SQLiteRevocationStore(RevocationStore):
+    """
+    Revocation store backed by a SQLite database file, so revocations survive
+    restarts and are shared by every worker process on the host using the same file.
+
+    Revocations added by other processes are pulled into a local bloom filter
+    with one indexed query, at most every `sync_interval` seconds,
+    so the "not revoked" answer needs no row lookup. A token revoked by another
+    process may thus still pass for up to `sync_interval` seconds; revocations of
+    this store apply at once. `sync_interval=0` syncs on every check, at the cost of
+    a query per decode.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        sync_interval: float = 1,
+        capacity: int = 100_000,
+        error_rate: float = 0.001,
+    ) -> None:
+        self.path = path
+        self.sync_interval = sync_interval
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._last_id = 0
+        self._last_sync = -math.inf
+
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS revoked_tokens ("
+                # AUTOINCREMENT ids are never reused, which `_sync` relies on
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "jti TEXT NOT NULL UNIQUE, "
+                "expires_at REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS revoked_tokens_expires_at "
+                "ON revoked_tokens (expires_at)"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+    def revoke(self, jti: str, expires_at: float = math.inf) -> None:
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO revoked_tokens (jti, expires_at) VALUES (?, ?)",
+                (jti, expires_at),
+            )
+        with self._lock:
+            self._bloom.add(jti)
+
+    def is_revoked(self, jti: str) -> bool:
+        self._sync()
+        if jti not in self._bloom:
+            return False
+
+        row = (
+            self._connection()
+            .execute("SELECT expires_at FROM revoked_tokens WHERE jti = ?", (jti,))
+            .fetchone()
+        )
+        return row is not None and row[0] > time.time()
+
+    def purge(self) -> int:
+        with self._connection() as connection:
+            purged = connection.execute(
+                "DELETE FROM revoked_tokens WHERE expires_at <= ?", (time.time(),)
+            ).rowcount
+        if purged:
+            with self._lock:
+                self._bloom = BloomFilter(self.capacity, self.error_rate)
+                self._last_id = 0
+            self._sync(force=True)
+        return purged
+
+    def _sync(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._last_sync < self.sync_interval:
+            return
+
+        rows = (
+            self._connection()
+            .execute(
+                "SELECT id, jti FROM revoked_tokens WHERE id > ? ORDER BY id",
+                (self._last_id,),
+            )
+            .fetchall()
+        )
+        with self._lock:
+            for row_id, jti in rows:
+                self._bloom.add(jti)
+                self._last_id = max(self._last_id, row_id)
+            self._last_sync = now
+
+    def close(self) -> None:
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
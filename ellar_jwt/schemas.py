@@ -6,6 +6,16 @@ from ellar.common import Serializer
 from ellar.pydantic import AnyUrl, Field, field_validator
 from jwt import algorithms
 
+from .executors import JWTExecutor
+from .instrumentation import JWTHook
+from .jwks import JWKSFetcher
+from .keyring import Keyring
+from .revocation import RevocationStore
+from .serializers import SERIALIZERS, JSONSerializer, is_available
+
+# claims PyJWT reads by name
+REGISTERED_CLAIMS = frozenset(("exp", "nbf", "iat", "aud", "iss", "sub", "jti"))
+
 
 class JWTConfiguration(Serializer):
     algorithm: t.Literal[
@@ -18,20 +28,97 @@ class JWTConfiguration(Serializer):
         "ES256",
         "ES384",
         "ES512",
+        "PS256",
+        "PS384",
+        "PS512",
+        "EdDSA",
     ] = "HS256"
-    verifying_secret_key: str = ""
+    # PEM/secret strings or already loaded `cryptography` key objects
+    verifying_secret_key: t.Union[str, bytes, t.Any] = ""
     leeway: t.Optional[t.Union[float, int, timedelta]] = 0
 
-    signing_secret_key: str
+    signing_secret_key: t.Union[str, bytes, t.Any]
     audience: t.Optional[str] = Field(None)
 
     issuer: t.Optional[str] = Field(None)
     jwk_url: t.Optional[AnyUrl] = Field(None)
+    jwks_lifespan: int = Field(default=300, gt=0)
+    jwks_max_cached_keys: int = Field(default=16, gt=0)
+    # `ellar_jwt.keyring.Keyring` of kid-indexed keys, used instead of the secret keys
+    keyring: t.Any = Field(default=None)
+    # `ellar_jwt.jwks.JWKSFetcher` used by the `JWKSManager` of `jwk_url`, which
+    # resolves the keys of the async APIs
+    jwks_fetcher: t.Any = Field(default=None)
+    # seconds an unknown `kid` is remembered as missing from the JWK set
+    jwks_negative_cache_ttl: float = Field(default=30, gt=0)
+    # seconds after which a JWK set fetch of the `JWKSManager` is abandoned
+    jwks_fetch_timeout: float = Field(default=10, gt=0)
+
+    # claims added to, and headers set on, every signed token, below the per-token ones
+    default_claims: t.Dict[str, t.Any] = Field(default_factory=dict)
+    default_headers: t.Dict[str, t.Any] = Field(default_factory=dict)
+    # compact tokens for high-volume internal traffic: custom claims are renamed to
+    # their `claim_aliases`, time claims are whole seconds and the jti is shorter
+    compact: bool = Field(default=False)
+    # short names of custom claims, e.g. {"tenant": "tn"}, expanded back by `decode`
+    claim_aliases: t.Dict[str, str] = Field(default_factory=dict)
+
+    # JWE of `JWTService.encrypt` and `decrypt`, signed tokens nested in encrypted ones
+    encryption_algorithm: t.Optional[
+        t.Literal["dir", "A128KW", "A192KW", "A256KW", "RSA-OAEP-256"]
+    ] = Field(default=None)
+    encryption_method: t.Literal["A128GCM", "A192GCM", "A256GCM"] = Field(
+        default="A256GCM"
+    )
+    # AES key of "dir" and "A*KW", or the RSA public key of "RSA-OAEP-256"
+    encryption_key: t.Union[str, bytes, t.Any] = Field(default=None)
+    # RSA private key decrypting "RSA-OAEP-256" tokens, `encryption_key` otherwise
+    decryption_key: t.Union[str, bytes, t.Any] = Field(default=None)
 
     jti: t.Optional[str] = Field("jti")
     lifetime: timedelta = Field(timedelta(minutes=5))
+    # callable returning the epoch time `iat` and `exp` are stamped from, `time.time`
+    # by default. See `ellar_jwt.clock.FakeClock`
+    clock: t.Any = Field(default=None)
 
     json_encoder: t.Any = Field(default=json.JSONEncoder)
+    # "json", "orjson", "msgspec", "auto" or a `JSONSerializer` instance
+    serializer: t.Any = Field(default="json")
+
+    plan_cache_size: int = Field(default=128, ge=0)
+
+    # cheap structure, algorithm, `kid` and expiry checks before key resolution
+    precheck: bool = Field(default=True)
+    # whether `decode` accepts the refresh tokens of `ellar_jwt.refresh.TokenPairService`,
+    # typed "refresh+jwt", as if they were access tokens
+    accept_refresh_tokens: bool = Field(default=False)
+    # longest token accepted, in characters. None accepts tokens of any size
+    max_token_size: t.Optional[int] = Field(default=None, gt=0)
+
+    # "thread", "process", "inline" or a `JWTExecutor` instance
+    executor: t.Any = Field(default="thread")
+    executor_max_workers: t.Optional[int] = Field(default=None, gt=0)
+    # algorithms costing up to this much (see `ellar_jwt.plan.ALGORITHM_COSTS`)
+    # skip the executor in the async APIs. 0 disables the inline fast path.
+    inline_cost_threshold: int = Field(default=1, ge=0)
+
+    # verified-token cache, disabled when `token_cache_size` is 0
+    token_cache_size: int = Field(default=0, ge=0)
+    token_cache_max_bytes: int = Field(default=16 * 1024 * 1024, gt=0)
+    token_cache_ttl: float = Field(default=300, gt=0)
+
+    # `ellar_jwt.revocation.RevocationStore` consulted by `decode`
+    revocation_store: t.Any = Field(default=None)
+
+    # named configuration overrides, e.g. {"admin": {"audience": "admin-api"}}, each
+    # compiled once by `JWTService` and picked with `decode(token, profile="admin")`
+    profiles: t.Dict[str, t.Dict[str, t.Any]] = Field(default_factory=dict)
+
+    # "eager" or "lazy" adds `ellar_jwt.auth.JWTAuthMiddleware` through `JWTModule`
+    auth_middleware: t.Optional[t.Literal["eager", "lazy"]] = Field(default=None)
+
+    # `ellar_jwt.instrumentation.JWTHook` instances receiving a `JWTEvent` per operation
+    hooks: t.List[t.Any] = Field(default_factory=list)
 
     @field_validator("algorithm", mode="before")
     def _validate_algorithm(cls, value: str) -> str:
@@ -44,3 +131,114 @@ class JWTConfiguration(Serializer):
             raise ValueError(f"You must have cryptography installed to use {value}.")
 
         return value
+
+    @field_validator("revocation_store", mode="before")
+    def _validate_revocation_store(cls, value: t.Any) -> t.Any:
+        if value is None or isinstance(value, RevocationStore):
+            return value
+        raise ValueError("revocation_store must be a RevocationStore instance.")
+
+    @field_validator("keyring", mode="before")
+    def _validate_keyring(cls, value: t.Any, info: t.Any) -> t.Any:
+        if value is None:
+            return value
+        if not isinstance(value, Keyring):
+            raise ValueError("keyring must be a Keyring instance.")
+        algorithm = info.data.get("algorithm")
+        if algorithm is not None and value.algorithm != algorithm:
+            raise ValueError(
+                f"keyring holds {value.algorithm} keys, not {algorithm} keys."
+            )
+        return value
+
+    @field_validator("default_headers", mode="before")
+    def _validate_default_headers(cls, value: t.Any) -> t.Any:
+        if value is None:
+            return {}
+        if isinstance(value, dict) and ("alg" in value or "b64" in value):
+            raise ValueError("default_headers can not set 'alg' or 'b64'.")
+        return value
+
+    @field_validator("default_claims", mode="before")
+    def _validate_default_claims(cls, value: t.Any) -> t.Any:
+        return {} if value is None else value
+
+    @field_validator("claim_aliases", mode="before")
+    def _validate_claim_aliases(cls, value: t.Any) -> t.Any:
+        if value is None:
+            return {}
+        if not isinstance(value, dict) or not all(
+            isinstance(name, str) and isinstance(alias, str) and alias
+            for name, alias in value.items()
+        ):
+            raise ValueError("claim_aliases must map claim names to short names.")
+        # PyJWT validates the registered claims by their name
+        registered = sorted(REGISTERED_CLAIMS.intersection([*value, *value.values()]))
+        if registered:
+            raise ValueError(
+                f"claim_aliases can not rename {', '.join(map(repr, registered))}."
+            )
+        if len(set(value.values())) != len(value) or set(value).intersection(
+            value.values()
+        ):
+            raise ValueError("claim_aliases must be unique and not be claim names.")
+        return value
+
+    @field_validator("clock", mode="before")
+    def _validate_clock(cls, value: t.Any) -> t.Any:
+        if value is None or callable(value):
+            return value
+        raise ValueError("clock must be a callable returning the epoch time.")
+
+    @field_validator("jwks_fetcher", mode="before")
+    def _validate_jwks_fetcher(cls, value: t.Any) -> t.Any:
+        if value is None or isinstance(value, JWKSFetcher):
+            return value
+        raise ValueError("jwks_fetcher must be a JWKSFetcher instance.")
+
+    @field_validator("profiles", mode="before")
+    def _validate_profiles(cls, value: t.Any) -> t.Any:
+        if value is None:
+            return {}
+        for name, overrides in dict(value).items():
+            if not isinstance(overrides, dict):
+                raise ValueError("profiles must map names to configuration overrides.")
+            unknown = sorted(set(overrides) - set(cls.model_fields))
+            if "profiles" in overrides:
+                unknown.append("profiles")
+            if unknown:
+                raise ValueError(
+                    f"Profile '{name}' can not set {', '.join(map(repr, unknown))}."
+                )
+        return value
+
+    @field_validator("hooks", mode="before")
+    def _validate_hooks(cls, value: t.Any) -> t.Any:
+        if value is None:
+            return []
+        if all(isinstance(hook, JWTHook) for hook in value):
+            return list(value)
+        raise ValueError("hooks must be JWTHook instances.")
+
+    @field_validator("executor", mode="before")
+    def _validate_executor(cls, value: t.Any) -> t.Any:
+        if isinstance(value, JWTExecutor) or value in ("thread", "process", "inline"):
+            return value
+        raise ValueError(
+            "executor must be 'thread', 'process', 'inline' or a JWTExecutor instance."
+        )
+
+    @field_validator("serializer", mode="before")
+    def _validate_serializer(cls, value: t.Any) -> t.Any:
+        if isinstance(value, JSONSerializer) or value == "auto":
+            return value
+        if value not in SERIALIZERS:
+            raise ValueError(
+                "serializer must be 'json', 'orjson', 'msgspec', 'auto' "
+                "or a JSONSerializer instance."
+            )
+        if not is_available(value):
+            raise ValueError(
+                f"You must have {value} installed to use it as serializer."
+            )
+        return value
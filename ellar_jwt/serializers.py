@@ -0,0 +1,192 @@
+import json
+import typing as t
+from abc import ABC, abstractmethod
+
+from jwt import PyJWT
+from jwt.exceptions import DecodeError
+
+__all__ = [
+    "JSONSerializer",
+    "StdlibJSONSerializer",
+    "OrjsonSerializer",
+    "MsgspecSerializer",
+    "SERIALIZERS",
+    "create_serializer",
+    "is_json_native",
+]
+
+
+class JSONSerializer(ABC):
+    """Encodes claims to and decodes claims from the JSON of a token payload."""
+
+    name: str = ""
+
+    @abstractmethod
+    def dumps(self, obj: t.Any) -> bytes:
+        """Returns the compact JSON encoding of `obj`"""
+
+    @abstractmethod
+    def loads(self, data: t.Union[bytes, str]) -> t.Any:
+        """Decodes JSON `data`, raising a `ValueError` when it is invalid"""
+
+
+class StdlibJSONSerializer(JSONSerializer):
+    """`json` module serializer, producing exactly the payloads PyJWT produces."""
+
+    name = "json"
+
+    def __init__(self, json_encoder: t.Optional[t.Type[json.JSONEncoder]] = None):
+        self.json_encoder = json_encoder
+
+    def dumps(self, obj: t.Any) -> bytes:
+        return json.dumps(obj, separators=(",", ":"), cls=self.json_encoder).encode()
+
+    def loads(self, data: t.Union[bytes, str]) -> t.Any:
+        return json.loads(data)
+
+
+class OrjsonSerializer(JSONSerializer):
+    """
+    `orjson` serializer. Types orjson can't serialize are handed to
+    the `default` method of `json_encoder`, like `json.dumps` would.
+    """
+
+    name = "orjson"
+
+    def __init__(self, json_encoder: t.Optional[t.Type[json.JSONEncoder]] = None):
+        import orjson
+
+        self._dumps = orjson.dumps
+        self._loads = orjson.loads
+        self.json_encoder = json_encoder
+        self._default = _encoder_default(json_encoder)
+
+    def dumps(self, obj: t.Any) -> bytes:
+        return self._dumps(obj, default=self._default)
+
+    def loads(self, data: t.Union[bytes, str]) -> t.Any:
+        return self._loads(data)
+
+    def __reduce__(self) -> t.Tuple[t.Any, ...]:
+        return self.__class__, (self.json_encoder,)
+
+
+class MsgspecSerializer(JSONSerializer):
+    """
+    `msgspec` serializer. Types msgspec can't serialize are handed to
+    the `default` method of `json_encoder`, like `json.dumps` would.
+    """
+
+    name = "msgspec"
+
+    def __init__(self, json_encoder: t.Optional[t.Type[json.JSONEncoder]] = None):
+        import msgspec
+
+        self.json_encoder = json_encoder
+        self._encoder = msgspec.json.Encoder(enc_hook=_encoder_default(json_encoder))
+        self._decoder = msgspec.json.Decoder()
+        self._decode_error = msgspec.DecodeError
+
+    def dumps(self, obj: t.Any) -> bytes:
+        return self._encoder.encode(obj)  # type:ignore[no-any-return]
+
+    def loads(self, data: t.Union[bytes, str]) -> t.Any:
+        try:
+            return self._decoder.decode(data)
+        except self._decode_error as ex:
+            raise ValueError(str(ex)) from ex
+
+    def __reduce__(self) -> t.Tuple[t.Any, ...]:
+        return self.__class__, (self.json_encoder,)
+
+
+SERIALIZERS: t.Dict[str, t.Callable[..., JSONSerializer]] = {
+    "json": StdlibJSONSerializer,
+    "orjson": OrjsonSerializer,
+    "msgspec": MsgspecSerializer,
+}
+
+
+def _encoder_default(
+    json_encoder: t.Optional[t.Type[json.JSONEncoder]],
+) -> t.Optional[t.Callable[[t.Any], t.Any]]:
+    if json_encoder is None or json_encoder is json.JSONEncoder:
+        return None
+    return json_encoder().default
+
+
+def is_available(name: str) -> bool:
+    if name == "json":
+        return True
+    try:
+        __import__(name)
+    except ImportError:
+        return False
+    return True
+
+
+def create_serializer(
+    serializer: t.Union[str, JSONSerializer],
+    json_encoder: t.Optional[t.Type[json.JSONEncoder]] = None,
+) -> JSONSerializer:
+    """
+    Returns the serializer for a `JWTConfiguration.serializer` value.
+
+    "auto" picks orjson, then msgspec, when installed, unless a custom `json_encoder`
+    is configured, whose behaviour only the `json` module reproduces exactly.
+    """
+    if isinstance(serializer, JSONSerializer):
+        return serializer
+
+    if serializer == "auto":
+        serializer = "json"
+        if json_encoder is None or json_encoder is json.JSONEncoder:
+            serializer = next(
+                (name for name in ("orjson", "msgspec") if is_available(name)), "json"
+            )
+    return SERIALIZERS[serializer](json_encoder)
+
+
+_JSON_SCALARS = frozenset((str, int, float, bool, type(None)))
+
+
+def is_json_native(value: t.Any) -> bool:
+    """
+    Returns whether `value` only holds str-keyed dicts, lists, tuples and JSON scalars,
+    i.e. every serializer encodes it as is and `serialize_object` would not change it.
+    """
+    value_type = type(value)
+    if value_type in _JSON_SCALARS:
+        return True
+    if value_type is dict:
+        return all(
+            type(key) is str and is_json_native(item) for key, item in value.items()
+        )
+    if value_type is list or value_type is tuple:
+        return all(is_json_native(item) for item in value)
+    return False
+
+
+class SerializerPyJWT(PyJWT):
+    """`PyJWT` encoding and decoding token payloads with a `JSONSerializer`."""
+
+    def __init__(self, serializer: JSONSerializer) -> None:
+        super().__init__()
+        self.serializer = serializer
+
+    def _encode_payload(
+        self,
+        payload: t.Dict[str, t.Any],
+        headers: t.Optional[t.Dict[str, t.Any]] = None,
+        json_encoder: t.Optional[t.Type[json.JSONEncoder]] = None,
+    ) -> bytes:
+        return self.serializer.dumps(payload)
+
+    def _decode_payload(self, decoded: t.Dict[str, t.Any]) -> t.Any:
+        try:
+            payload = self.serializer.loads(decoded["payload"])
+        except ValueError as e:
+            raise DecodeError(f"Invalid payload string: {e}") from e
+        if not isinstance(payload, dict):
+            raise DecodeError("Invalid payload string: must be a json object")
+        return payload
@@ -1,52 +1,304 @@
-import functools
+import logging
+import math
+import time
 import typing as t
 from datetime import timedelta
 
-import anyio
 import jwt
 from ellar.common import serialize_object
 from ellar.di import injectable
-from jwt import InvalidAlgorithmError, InvalidTokenError, PyJWKClient, PyJWKClientError
+from jwt import (
+    DecodeError,
+    ExpiredSignatureError,
+    ImmatureSignatureError,
+    InvalidAlgorithmError,
+    InvalidAudienceError,
+    InvalidIssuerError,
+    InvalidSignatureError,
+    InvalidTokenError,
+    MissingRequiredClaimError,
+    PyJWKClientError,
+    PyJWKSetError,
+)
+from jwt.exceptions import PyJWKClientConnectionError
 
-from .exceptions import JWTTokenException
+from .cache import VerifiedTokenCache
+from .claims import ClaimsView, V, claims_view
+from .encoding import HeaderSegmentCache, encode_token
+from .exceptions import ErrorCode, JWTTokenException
+from .executors import create_executor
+from .instrumentation import JWTEvent, JWTHook
+from .jwks import JWKSClient, JWKSManager, jwks_registry
+from .keyring import Keyring
+from .keys import ResolvedKey
+from .plan import JWTPlan
+from .precheck import precheck_token
+from .revocation import RevocationStore
 from .schemas import JWTConfiguration
-from .token import Token
+from .serializers import is_json_native
+from .token import REFRESH_TOKEN_TYP, Token
+from .util import LRUCache
 
-__all__ = ["JWTService"]
+__all__ = ["JWTService", "DecodeResult"]
+
+logger = logging.getLogger("ellar_jwt")
+
+# most specific first, e.g. InvalidSignatureError is a DecodeError
+_ERROR_CODES: t.Tuple[t.Tuple[t.Type[InvalidTokenError], str], ...] = (
+    (ExpiredSignatureError, ErrorCode.EXPIRED),
+    (ImmatureSignatureError, ErrorCode.IMMATURE),
+    (InvalidAudienceError, ErrorCode.INVALID_AUDIENCE),
+    (InvalidIssuerError, ErrorCode.INVALID_ISSUER),
+    (MissingRequiredClaimError, ErrorCode.MISSING_CLAIM),
+    (InvalidSignatureError, ErrorCode.INVALID_SIGNATURE),
+    (DecodeError, ErrorCode.MALFORMED),
+)
+
+
+class DecodeResult(t.NamedTuple):
+    token: str
+    payload: t.Optional[t.Dict[str, t.Any]]
+    error: t.Optional[JWTTokenException] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
 
 
 @injectable
 class JWTService:
     def __init__(self, jwt_config: JWTConfiguration) -> None:
         self.jwt_config = jwt_config
+        self.plan = JWTPlan(jwt_config)
+        self._plans: LRUCache[t.Tuple, JWTPlan] = LRUCache(jwt_config.plan_cache_size)
+        self.profiles: t.Dict[str, JWTPlan] = {
+            name: JWTPlan(self._merge_configurations(**overrides))
+            for name, overrides in jwt_config.profiles.items()
+        }
+        self.executor = create_executor(jwt_config)
+        self.token_cache: t.Optional[VerifiedTokenCache] = None
+        if jwt_config.token_cache_size:
+            self.token_cache = VerifiedTokenCache(
+                maxsize=jwt_config.token_cache_size,
+                max_bytes=jwt_config.token_cache_max_bytes,
+                ttl=jwt_config.token_cache_ttl,
+            )
+        self.revocation_store: t.Optional[RevocationStore] = jwt_config.revocation_store
+        self.hooks: t.List[JWTHook] = list(jwt_config.hooks)
+        self.header_segments = HeaderSegmentCache()
+        self._keyring_version = (
+            jwt_config.keyring.version if jwt_config.keyring is not None else None
+        )
 
-    def get_jwks_client(self, jwt_config: JWTConfiguration) -> t.Optional[PyJWKClient]:
-        jwks_client = (
-            PyJWKClient(str(jwt_config.jwk_url)) if jwt_config.jwk_url else None
+    def add_hook(self, hook: JWTHook) -> None:
+        """Attaches `hook` to receive a `JWTEvent` for every operation"""
+        self.hooks = [*self.hooks, hook]
+
+    def remove_hook(self, hook: JWTHook) -> None:
+        self.hooks = [attached for attached in self.hooks if attached is not hook]
+
+    def _emit(self, event: JWTEvent) -> None:
+        for hook in self.hooks:
+            try:
+                hook.on_event(event)
+            except Exception:
+                logger.exception("JWT hook %r failed", hook)
+
+    def _emit_result(
+        self,
+        operation: str,
+        algorithm: str,
+        duration: float,
+        error: t.Optional[BaseException] = None,
+    ) -> None:
+        outcome = "ok"
+        if error is not None:
+            outcome = getattr(error, "code", "error")
+        self._emit(JWTEvent(operation, algorithm, outcome, duration, error))
+
+    def _observe(
+        self, operation: str, algorithm: str, func: t.Callable[..., t.Any], *args: t.Any
+    ) -> t.Any:
+        start = time.perf_counter()
+        try:
+            result = func(*args)
+        except Exception as ex:
+            self._emit_result(operation, algorithm, time.perf_counter() - start, ex)
+            raise
+        self._emit_result(operation, algorithm, time.perf_counter() - start)
+        return result
+
+    async def _observe_async(
+        self, operation: str, algorithm: str, awaitable: t.Awaitable[t.Any]
+    ) -> t.Any:
+        start = time.perf_counter()
+        try:
+            result = await awaitable
+        except Exception as ex:
+            self._emit_result(operation, algorithm, time.perf_counter() - start, ex)
+            raise
+        self._emit_result(operation, algorithm, time.perf_counter() - start)
+        return result
+
+    def get_plan(self, profile: t.Optional[str] = None, **jwt_config: t.Any) -> JWTPlan:
+        """
+        Returns the compiled plan for the given configuration overrides.
+
+        Plans for overrides are memoized by their override items, so the
+        configuration merge and validation only happen the first time an
+        override combination is used.
+
+        `profile` names one of the configured `profiles`, compiled when the service
+        was created, so picking one costs a dict lookup. Overrides apply on top of it.
+        """
+        if profile is not None:
+            plan = self.profiles.get(profile)
+            if plan is None:
+                raise ValueError(f"Unknown JWT profile '{profile}'.")
+            if not jwt_config:
+                return plan
+            jwt_config = {**self.jwt_config.profiles[profile], **jwt_config}
+
+        if not jwt_config:
+            return self.plan
+
+        key = tuple(sorted(jwt_config.items()))
+        try:
+            hash(key)
+        except TypeError:
+            # unhashable override values can not be memoized
+            return JWTPlan(self._merge_configurations(**jwt_config))
+
+        plan = self._plans.get(key)
+        if plan is None:
+            plan = JWTPlan(self._merge_configurations(**jwt_config))
+            self._plans.set(key, plan)
+        return plan
+
+    def get_jwks_client(
+        self, jwt_config: t.Union[JWTConfiguration, JWTPlan]
+    ) -> t.Optional[JWKSClient]:
+        if not jwt_config.jwk_url:
+            return None
+        return jwks_registry.get_client(
+            str(jwt_config.jwk_url),
+            lifespan=jwt_config.jwks_lifespan,
+            max_cached_keys=jwt_config.jwks_max_cached_keys,
         )
-        return jwks_client
-
-    def get_leeway(self, jwt_config: JWTConfiguration) -> timedelta:
-        if jwt_config.leeway is None:
-            return timedelta(seconds=0)
-        elif isinstance(jwt_config.leeway, (int, float)):
-            return timedelta(seconds=jwt_config.leeway)
-        elif isinstance(jwt_config.leeway, timedelta):
-            return jwt_config.leeway
-
-    def get_verifying_key(self, token: t.Any, jwt_config: JWTConfiguration) -> bytes:
-        if self.jwt_config.algorithm.startswith("HS"):
-            return jwt_config.signing_secret_key.encode()
-
-        jwks_client = self.get_jwks_client(jwt_config)
-        if jwks_client:
+
+    def get_leeway(self, jwt_config: t.Union[JWTConfiguration, JWTPlan]) -> timedelta:
+        return JWTPlan._compile_leeway(jwt_config.leeway)
+
+    def get_verifying_key(
+        self,
+        token: t.Any,
+        jwt_config: t.Union[JWTConfiguration, JWTPlan],
+        header: t.Optional[t.Dict[str, t.Any]] = None,
+    ) -> t.Any:
+        """
+        Returns the key to verify `token` with. `header` is the already decoded
+        unverified header of the token, if any.
+        """
+        plan = self._as_plan(jwt_config)
+        if plan.keyring is not None:
+            return plan.keyring.get_verifying_key(self._get_kid(token, header))
+
+        jwks_client = self.get_jwks_client(plan)
+        if jwks_client is None:
+            return plan.verifying_key
+        if not self.hooks:
+            return self._resolve_jwks_key(jwks_client, token, plan, header)
+
+        fetches = jwks_client.fetches
+        start = time.perf_counter()
+        error: t.Optional[JWTTokenException] = None
+        try:
+            return self._resolve_jwks_key(jwks_client, token, plan, header)
+        except JWTTokenException as ex:
+            error = ex
+            raise
+        finally:
+            self._emit_result(
+                "key_resolution", plan.algorithm, time.perf_counter() - start, error
+            )
+            if jwks_client.fetches != fetches:
+                fetch_failed = (
+                    error is not None and error.code == ErrorCode.JWKS_UNAVAILABLE
+                )
+                self._emit_result(
+                    "jwks_fetch",
+                    plan.algorithm,
+                    jwks_client.last_fetch_duration,
+                    error if fetch_failed else None,
+                )
+
+    def get_jwks_manager(
+        self, jwt_config: t.Union[JWTConfiguration, JWTPlan]
+    ) -> t.Optional[JWKSManager]:
+        """Returns the `JWKSManager` started by `JWTModule` for the JWK url, if any"""
+        if not jwt_config.jwk_url:
+            return None
+        return jwks_registry.find_manager(str(jwt_config.jwk_url))
+
+    @staticmethod
+    def _get_kid(
+        token: t.Any, header: t.Optional[t.Dict[str, t.Any]] = None
+    ) -> t.Optional[str]:
+        if header is None:
             try:
-                p_jwk = jwks_client.get_signing_key_from_jwt(token)
-                return p_jwk.key  # type:ignore[no-any-return]
-            except PyJWKClientError as ex:
-                raise JWTTokenException("Token is invalid or expired") from ex
+                header = jwt.get_unverified_header(token)
+            except DecodeError as ex:
+                raise JWTTokenException(
+                    "Token is invalid or expired", ErrorCode.MALFORMED
+                ) from ex
+        kid = header.get("kid")
+        return kid if isinstance(kid, str) else None
+
+    def _resolve_jwks_key(
+        self,
+        jwks_client: JWKSClient,
+        token: t.Any,
+        plan: JWTPlan,
+        header: t.Optional[t.Dict[str, t.Any]] = None,
+    ) -> t.Any:
+        jwks_manager = self.get_jwks_manager(plan)
+        if jwks_manager is not None and not jwks_manager.is_servable:
+            # stale keys nothing revalidates, the IdP may have removed them since
+            jwks_manager = None
+        kid = self._get_kid(token, header) if jwks_manager is not None else None
+        if jwks_manager is not None and kid is not None:
+            p_jwk = jwks_manager.get_cached_key(kid)
+            if p_jwk is not None:
+                return p_jwk.key
+            if jwks_manager.is_missing(kid):
+                raise JWTTokenException(
+                    "Token is invalid or expired", ErrorCode.KEY_NOT_FOUND
+                )
+
+        try:
+            return jwks_client.get_signing_key_from_jwt(token).key
+        except PyJWKClientConnectionError as ex:
+            raise JWTTokenException(
+                "Token is invalid or expired", ErrorCode.JWKS_UNAVAILABLE
+            ) from ex
+        except (PyJWKClientError, PyJWKSetError) as ex:
+            # PyJWKSetError: the JWK set holds no usable signing key
+            raise JWTTokenException(
+                "Token is invalid or expired", ErrorCode.KEY_NOT_FOUND
+            ) from ex
+        except DecodeError as ex:
+            # the header the key id is read from is malformed
+            raise JWTTokenException(
+                "Token is invalid or expired", ErrorCode.MALFORMED
+            ) from ex
 
-        return jwt_config.verifying_secret_key.encode()
+    def _as_plan(self, jwt_config: t.Union[JWTConfiguration, JWTPlan]) -> JWTPlan:
+        # the public helpers taking a configuration also accept its compiled plan
+        if isinstance(jwt_config, JWTPlan):
+            return jwt_config
+        if jwt_config is self.jwt_config:
+            return self.plan
+        return JWTPlan(jwt_config)
 
     def _merge_configurations(self, **jwt_config: t.Any) -> JWTConfiguration:
         jwt_config_default = self.jwt_config.dict()
@@ -62,29 +314,113 @@ class JWTService:
         """
         Returns an encoded token for the given payload dictionary.
         """
-        _jwt_config = self._merge_configurations(**jwt_config)
-        jwt_payload = Token(jwt_config=_jwt_config).build(
-            serialize_object(payload.copy())
+        plan = self.get_plan(**jwt_config)
+        if self.hooks:
+            return self._observe(  # type:ignore[no-any-return]
+                "sign", plan.algorithm, self._sign, payload, headers, plan
+            )
+        return self._sign(payload, headers, plan)
+
+    def _sign(
+        self, payload: dict, headers: t.Optional[t.Dict[str, t.Any]], plan: JWTPlan
+    ) -> str:
+        jwt_payload = Token(jwt_config=plan).build(self._prepare_claims(payload))
+
+        if headers and ("alg" in headers or "b64" in headers):
+            # headers that change the algorithm or payload encoding go through PyJWT
+            return self._sign_with_pyjwt(jwt_payload, headers, plan)
+
+        header_segment, signing_key = self._get_header_segment(headers, plan)
+        return encode_token(
+            header_segment,
+            jwt_payload,
+            plan.algorithm_obj.prepare_key(signing_key),
+            plan.algorithm_obj,
+            plan.serializer,
         )
 
-        return jwt.encode(
+    def _sign_with_pyjwt(
+        self,
+        jwt_payload: t.Dict[str, t.Any],
+        headers: t.Dict[str, t.Any],
+        plan: JWTPlan,
+    ) -> str:
+        if plan.default_headers:
+            headers = {**plan.default_headers, **headers}
+        signing_key = plan.signing_key
+        if plan.keyring is not None:
+            signing_key, headers = self._get_keyring_signing_key(plan.keyring, headers)
+        return (plan.jwt_api or jwt).encode(
             jwt_payload,
-            _jwt_config.signing_secret_key,
-            algorithm=_jwt_config.algorithm,
-            json_encoder=_jwt_config.json_encoder,
+            signing_key,
+            algorithm=plan.algorithm,
+            json_encoder=plan.json_encoder,
             headers=headers,
         )
 
+    def _get_header_segment(
+        self, headers: t.Optional[t.Dict[str, t.Any]], plan: JWTPlan
+    ) -> t.Tuple[bytes, t.Any]:
+        """
+        Returns the encoded header segment and the (unprepared) signing key for
+        `headers`, merged with the default headers and stamped with the `kid` of
+        the keyring key.
+        """
+        if not headers and plan.keyring is None:
+            return plan.header_segment, plan.signing_key
+
+        signing_key = plan.signing_key
+        if plan.default_headers:
+            headers = {**plan.default_headers, **(headers or {})}
+        if plan.keyring is not None:
+            signing_key, headers = self._get_keyring_signing_key(plan.keyring, headers)
+        return (
+            self.header_segments.get(plan.algorithm, headers, plan.json_encoder),
+            signing_key,
+        )
+
+    @staticmethod
+    def _get_keyring_signing_key(
+        keyring: Keyring, headers: t.Optional[t.Dict[str, t.Any]]
+    ) -> t.Tuple[t.Any, t.Dict[str, t.Any]]:
+        # the current key signs unless the headers pick another `kid` of the keyring
+        key = keyring.get_signing_key(headers.get("kid") if headers else None)
+        return key.signing_key, {**(headers or {}), "kid": key.kid}
+
+    @staticmethod
+    def _prepare_claims(payload: dict) -> t.Dict[str, t.Any]:
+        # JSON-native payloads only need a shallow copy for the registered claims
+        if is_json_native(payload):
+            return dict(payload)
+        return serialize_object(payload)  # type:ignore[no-any-return]
+
+    def _sign_unobserved(
+        self,
+        payload: dict,
+        headers: t.Optional[t.Dict[str, t.Any]] = None,
+        **jwt_config: t.Any,
+    ) -> str:
+        # `sign` without events, run by the executors while the caller observes it
+        return self._sign(payload, headers, self.get_plan(**jwt_config))
+
     async def sign_async(
         self,
         payload: dict,
         headers: t.Optional[t.Dict[str, t.Any]] = None,
         **jwt_config: t.Any,
     ) -> str:
-        func = self.sign
-        if jwt_config:
-            func = functools.partial(self.sign, **jwt_config)
-        return await anyio.to_thread.run_sync(func, payload, headers)
+        plan = self.get_plan(**jwt_config)
+        if plan.inline:
+            return self.sign(payload, headers, **jwt_config)
+
+        run = self.executor.run(
+            self, "_sign_unobserved", payload, headers, **jwt_config
+        )
+        if self.hooks:
+            return await self._observe_async(  # type:ignore[no-any-return]
+                "sign", plan.algorithm, run
+            )
+        return await run  # type:ignore[no-any-return]
 
     def decode(
         self, token: str, verify: bool = True, **jwt_config: t.Any
@@ -96,29 +432,682 @@ class JWTService:
         Raises a `TokenBackendError` if the token is malformed, if its
         signature check fails, or if its 'exp' claim indicates it has expired.
         """
+        plan = self.get_plan(**jwt_config)
+        return self._decode(token, plan, verify)
+
+    def _decode(
+        self, token: str, plan: JWTPlan, verify: bool, copy: bool = True
+    ) -> t.Dict[str, t.Any]:
+        if self.hooks:
+            return self._observe(  # type:ignore[no-any-return]
+                "decode",
+                plan.algorithm,
+                self._decode_unobserved,
+                token,
+                plan,
+                verify,
+                copy,
+            )
+        return self._decode_unobserved(token, plan, verify, copy)
+
+    def _decode_unobserved(
+        self, token: str, plan: JWTPlan, verify: bool, copy: bool = True
+    ) -> t.Dict[str, t.Any]:
+        token_cache = self._get_token_cache(verify)
+        if token_cache is not None:
+            self._check_token_type(token)
+            claims = token_cache.get(token, plan, copy)
+            if claims is not None:
+                self._check_revoked(claims, plan)
+                return claims
+
+        payload = self._verify(token, plan, verify)
+        if verify:
+            self._check_revoked(payload, plan)
+
+        if token_cache is not None:
+            token_cache.set(token, plan, payload, plan.leeway.total_seconds())
+        return payload
+
+    def _get_token_cache(self, verify: bool) -> t.Optional[VerifiedTokenCache]:
+        if not verify or self.token_cache is None:
+            return None
+        keyring = self.jwt_config.keyring
+        if keyring is not None and keyring.version != self._keyring_version:
+            # tokens verified with a key that was since removed or retired
+            # must not be served from the cache
+            self._keyring_version = keyring.version
+            self.token_cache.clear()
+        return self.token_cache
+
+    def decode_claims(
+        self,
+        token: str,
+        schema: t.Union[t.Type[V], t.Sequence[str]],
+        verify: bool = True,
+        **jwt_config: t.Any,
+    ) -> V:
+        """
+        Verifies `token` like `decode` and returns a `ClaimsView` of its claims.
+
+        `schema` is a `ClaimsView` subclass, or the names of the claims to project.
+        Only those claims are copied out of the payload, and they are validated once.
+        """
+        view = self._get_claims_view(schema)
+        plan = self.get_plan(**jwt_config)
+        # the view copies what it needs, the cached claims are never handed out
+        return view.from_claims(self._decode(token, plan, verify, copy=False))
+
+    async def decode_claims_async(
+        self,
+        token: str,
+        schema: t.Union[t.Type[V], t.Sequence[str]],
+        verify: bool = True,
+        **jwt_config: t.Any,
+    ) -> V:
+        view = self._get_claims_view(schema)
+        plan = self.get_plan(**jwt_config)
+        if plan.inline:
+            return view.from_claims(self._decode(token, plan, verify, copy=False))
+        return view.from_claims(await self.decode_async(token, verify, **jwt_config))
+
+    @staticmethod
+    def _get_claims_view(schema: t.Union[t.Type[V], t.Sequence[str]]) -> t.Type[V]:
+        if isinstance(schema, type) and issubclass(schema, ClaimsView):
+            return schema
+        if isinstance(schema, str):
+            # would otherwise project one claim per character
+            raise TypeError(
+                "schema must be a ClaimsView subclass or a sequence of claim names, "
+                f"not a str, e.g. [{schema!r}]."
+            )
+        return t.cast(t.Type[V], claims_view(*schema))
+
+    def _check_revoked(self, payload: t.Dict[str, t.Any], plan: JWTPlan) -> None:
+        if self.revocation_store is None or not plan.jti:
+            return
+        jti = payload.get(plan.jti)
+        if jti is not None and self.revocation_store.is_revoked(jti):
+            raise JWTTokenException("Token has been revoked", ErrorCode.REVOKED)
+
+    def _decode_uncached(
+        self,
+        token: str,
+        verify: bool = True,
+        key: t.Optional[ResolvedKey] = None,
+        header: t.Optional[t.Dict[str, t.Any]] = None,
+        **jwt_config: t.Any,
+    ) -> t.Dict[str, t.Any]:
+        # `decode` without the verified-token cache, run by the executors
+        return self._verify(
+            token,
+            self.get_plan(**jwt_config),
+            verify,
+            key.key if key is not None else None,
+            header,
+        )
+
+    def _verify(
+        self,
+        token: str,
+        plan: JWTPlan,
+        verify: bool,
+        key: t.Any = None,
+        header: t.Optional[t.Dict[str, t.Any]] = None,
+    ) -> t.Dict[str, t.Any]:
+        """
+        Verifies `token` and returns its claims. `key` is the verifying key the
+        caller already resolved, if any, e.g. from the JWK set on the event loop,
+        and `header` the header its pre-check returned: the token is not
+        pre-checked again.
+        """
+        if header is None and verify and plan.precheck:
+            header = precheck_token(token, plan)
         try:
-            _jwt_config = self._merge_configurations(**jwt_config)
-            return jwt.decode(  # type:ignore[no-any-return]
+            if verify and not plan.accept_refresh_tokens:
+                self._check_not_refresh_token(token, header)
+            payload: t.Dict[str, t.Any] = (plan.jwt_api or jwt).decode(
                 token,
-                self.get_verifying_key(token, _jwt_config),
-                algorithms=[_jwt_config.algorithm],
-                audience=_jwt_config.audience,
-                issuer=_jwt_config.issuer,
-                leeway=self.get_leeway(_jwt_config),
-                options={
-                    "verify_aud": _jwt_config.audience is not None,
-                    "verify_signature": verify,
-                },
+                # unverified tokens need no key, nor a JWK set fetch
+                (
+                    key
+                    if key is not None
+                    else self.get_verifying_key(token, plan, header)
+                )
+                if verify
+                else b"",
+                algorithms=plan.algorithms,
+                audience=plan.audience,
+                issuer=plan.issuer,
+                leeway=plan.leeway,
+                options=plan.options if verify else plan.unverified_options,
             )
         except InvalidAlgorithmError as ex:
-            raise JWTTokenException("Invalid algorithm specified") from ex
+            raise JWTTokenException(
+                "Invalid algorithm specified", ErrorCode.INVALID_ALGORITHM
+            ) from ex
         except InvalidTokenError as ex:
-            raise JWTTokenException("Token is invalid or expired") from ex
+            raise JWTTokenException(
+                "Token is invalid or expired", self._error_code(ex)
+            ) from ex
+
+        if plan.claim_names:
+            # claims of compact tokens are expanded back to their names
+            names = plan.claim_names
+            return {names.get(name, name): value for name, value in payload.items()}
+        return payload
+
+    @staticmethod
+    def _check_not_refresh_token(
+        token: str, header: t.Optional[t.Dict[str, t.Any]]
+    ) -> None:
+        # long-lived refresh tokens must never pass for access tokens
+        if header is None:
+            header = jwt.get_unverified_header(token)
+        if header.get("typ") == REFRESH_TOKEN_TYP:
+            raise JWTTokenException(
+                "Token is not an access token", ErrorCode.WRONG_TOKEN_TYPE
+            )
+
+    @staticmethod
+    def _error_code(ex: InvalidTokenError) -> str:
+        for error_type, code in _ERROR_CODES:
+            if isinstance(ex, error_type):
+                return code
+        return ErrorCode.INVALID
+
+    def revoke(self, token: str, **jwt_config: t.Any) -> str:
+        """
+        Verifies `token` and revokes its `jti` claim until the token expires,
+        so that `decode` rejects it from now on. Returns the revoked `jti`.
+        """
+        if self.revocation_store is None:
+            raise RuntimeError("No `revocation_store` is configured.")
+
+        plan = self.get_plan(**jwt_config)
+        payload = self._decode(token, plan, verify=True)
+        jti = payload.get(plan.jti) if plan.jti else None
+        if jti is None:
+            raise JWTTokenException(
+                f"Token has no '{plan.jti}' claim to revoke", ErrorCode.MISSING_CLAIM
+            )
+
+        exp = payload.get("exp")
+        expires_at = (
+            exp + plan.leeway.total_seconds()
+            if isinstance(exp, (int, float))
+            else math.inf
+        )
+        self.revocation_store.revoke(jti, expires_at)
+        self.invalidate_token(token)
+        return jti  # type:ignore[no-any-return]
+
+    def invalidate_token(self, token: str) -> bool:
+        """
+        Drops `token` from the verified-token cache, so that the next `decode`
+        verifies it again. Returns whether the token was cached.
+        """
+        if self.token_cache is None:
+            return False
+        return self.token_cache.invalidate(token)
 
     async def decode_async(
         self, token: str, verify: bool = True, **jwt_config: t.Any
     ) -> t.Dict[str, t.Any]:
-        func = self.decode
-        if jwt_config:
-            func = functools.partial(self.decode, **jwt_config)
-        return await anyio.to_thread.run_sync(func, token, verify)
+        plan = self.get_plan(**jwt_config)
+        if plan.inline:
+            return self._decode(token, plan, verify)
+
+        decoding = self._decode_offloaded(token, plan, verify, jwt_config)
+        if self.hooks:
+            return await self._observe_async(  # type:ignore[no-any-return]
+                "decode", plan.algorithm, decoding
+            )
+        return await decoding
+
+    async def _decode_offloaded(
+        self, token: str, plan: JWTPlan, verify: bool, jwt_config: t.Dict[str, t.Any]
+    ) -> t.Dict[str, t.Any]:
+        # cache hits are answered here, without an executor round trip
+        token_cache = self._get_token_cache(verify)
+        if token_cache is not None:
+            self._check_token_type(token)
+            claims = token_cache.get(token, plan)
+            if claims is not None:
+                self._check_revoked(claims, plan)
+                return claims
+
+        key: t.Optional[ResolvedKey] = None
+        header: t.Optional[t.Dict[str, t.Any]] = None
+        if verify:
+            if plan.precheck:
+                # junk is rejected before any JWK set fetch or executor round trip
+                header = precheck_token(token, plan)
+            keys, errors = await self._resolve_jwks_keys([token], plan, [header])
+            if errors:
+                raise errors[0]
+            key = keys.get(0)
+
+        payload: t.Dict[str, t.Any] = await self.executor.run(
+            self, "_decode_uncached", token, verify, key, header, **jwt_config
+        )
+        if verify:
+            self._check_revoked(payload, plan)
+
+        if token_cache is not None:
+            token_cache.set(token, plan, payload, plan.leeway.total_seconds())
+        return payload
+
+    def encrypt(
+        self,
+        payload: dict,
+        headers: t.Optional[t.Dict[str, t.Any]] = None,
+        **jwt_config: t.Any,
+    ) -> str:
+        """
+        Signs `payload` like `sign` and returns the signed token encrypted into
+        a JWE with the configured `encryption_algorithm`.
+        """
+        plan = self.get_plan(**jwt_config)
+        cipher = self._get_cipher(plan)
+        if self.hooks:
+            token = self._observe(
+                "sign", plan.algorithm, self._sign, payload, headers, plan
+            )
+            return self._observe(  # type:ignore[no-any-return]
+                "encrypt", cipher.algorithm, cipher.encrypt, token
+            )
+        return cipher.encrypt(self._sign(payload, headers, plan))  # type:ignore[no-any-return]
+
+    async def encrypt_async(
+        self,
+        payload: dict,
+        headers: t.Optional[t.Dict[str, t.Any]] = None,
+        **jwt_config: t.Any,
+    ) -> str:
+        plan = self.get_plan(**jwt_config)
+        cipher = self._get_cipher(plan)
+        token = await self.sign_async(payload, headers, **jwt_config)
+        # an AES or RSA public key operation, cheap enough for the event loop
+        if self.hooks:
+            return self._observe(  # type:ignore[no-any-return]
+                "encrypt", cipher.algorithm, cipher.encrypt, token
+            )
+        return cipher.encrypt(token)  # type:ignore[no-any-return]
+
+    def decrypt(
+        self, token: str, verify: bool = True, **jwt_config: t.Any
+    ) -> t.Dict[str, t.Any]:
+        """
+        Decrypts a JWE of `encrypt`, then validates the signed token it holds
+        like `decode` and returns its payload dictionary.
+        """
+        plan = self.get_plan(**jwt_config)
+        return self._decode(self._decrypt(token, plan), plan, verify)
+
+    async def decrypt_async(
+        self, token: str, verify: bool = True, **jwt_config: t.Any
+    ) -> t.Dict[str, t.Any]:
+        plan = self.get_plan(**jwt_config)
+        if plan.inline_decryption:
+            signed_token = self._decrypt(token, plan)
+        else:
+            cipher = self._get_cipher(plan)
+            self._check_encrypted_size(token, plan)
+            run = self.executor.run(self, "_decrypt_unobserved", token, **jwt_config)
+            if self.hooks:
+                run = self._observe_async("decrypt", cipher.algorithm, run)
+            signed_token = await run
+        return await self.decode_async(signed_token, verify, **jwt_config)
+
+    def _decrypt(self, token: str, plan: JWTPlan) -> str:
+        cipher = self._get_cipher(plan)
+        self._check_encrypted_size(token, plan)
+        if self.hooks:
+            return self._observe(  # type:ignore[no-any-return]
+                "decrypt", cipher.algorithm, cipher.decrypt, token
+            )
+        return cipher.decrypt(token)  # type:ignore[no-any-return]
+
+    def _decrypt_unobserved(self, token: str, **jwt_config: t.Any) -> str:
+        # `decrypt` without the verification, run by the executors
+        return self._get_cipher(  # type:ignore[no-any-return]
+            self.get_plan(**jwt_config)
+        ).decrypt(token)
+
+    @staticmethod
+    def _get_cipher(plan: JWTPlan) -> t.Any:
+        if plan.cipher is None:
+            raise RuntimeError("No `encryption_algorithm` is configured.")
+        return plan.cipher
+
+    @staticmethod
+    def _check_token_type(token: t.Any) -> None:
+        # checked before the token is digested for the cache
+        if not isinstance(token, (str, bytes)):
+            raise JWTTokenException("Token is invalid or expired", ErrorCode.MALFORMED)
+
+    @staticmethod
+    def _check_encrypted_size(token: t.Any, plan: JWTPlan) -> None:
+        if (
+            plan.max_token_size is not None
+            and isinstance(token, (str, bytes))
+            and len(token) > plan.max_token_size
+        ):
+            raise JWTTokenException("Token is invalid or expired", ErrorCode.MALFORMED)
+
+    def sign_many(
+        self,
+        payloads: t.Iterable[dict],
+        headers: t.Optional[t.Dict[str, t.Any]] = None,
+        **jwt_config: t.Any,
+    ) -> t.List[str]:
+        """
+        Returns an encoded token for each payload dictionary.
+
+        All tokens share one resolved configuration, one signing key, one
+        issued-at time and one encoded header.
+        """
+        plan = self.get_plan(**jwt_config)
+        if not self.hooks:
+            return self._sign_many(payloads, headers, plan)
+
+        payloads = list(payloads)
+        start = time.perf_counter()
+        try:
+            tokens = self._sign_many(payloads, headers, plan)
+        except Exception as ex:
+            self._emit_result("sign", plan.algorithm, time.perf_counter() - start, ex)
+            raise
+        self._emit_batch("sign", plan.algorithm, start, [None] * len(tokens))
+        return tokens
+
+    def _emit_batch(
+        self,
+        operation: str,
+        algorithm: str,
+        start: float,
+        errors: t.Sequence[t.Optional[BaseException]],
+    ) -> None:
+        # one event per item of a batch, each with the mean duration of the batch
+        duration = (time.perf_counter() - start) / max(len(errors), 1)
+        for error in errors:
+            self._emit_result(operation, algorithm, duration, error)
+
+    def _sign_many(
+        self,
+        payloads: t.Iterable[dict],
+        headers: t.Optional[t.Dict[str, t.Any]],
+        plan: JWTPlan,
+    ) -> t.List[str]:
+        if headers and ("alg" in headers or "b64" in headers):
+            return [self._sign(payload, headers, plan) for payload in payloads]
+
+        header_segment, signing_key = self._get_header_segment(headers, plan)
+        signing_key = plan.algorithm_obj.prepare_key(signing_key)
+        current_time = plan.clock()
+
+        return [
+            encode_token(
+                header_segment,
+                Token(jwt_config=plan, current_time=current_time).build(
+                    self._prepare_claims(payload)
+                ),
+                signing_key,
+                plan.algorithm_obj,
+                plan.serializer,
+            )
+            for payload in payloads
+        ]
+
+    async def sign_many_async(
+        self,
+        payloads: t.Iterable[dict],
+        headers: t.Optional[t.Dict[str, t.Any]] = None,
+        **jwt_config: t.Any,
+    ) -> t.List[str]:
+        plan = self.get_plan(**jwt_config)
+        payloads = list(payloads)
+        if not self.hooks:
+            return await self.executor.run(  # type:ignore[no-any-return]
+                self, "_sign_many_unobserved", payloads, headers, **jwt_config
+            )
+
+        start = time.perf_counter()
+        try:
+            tokens: t.List[str] = await self.executor.run(
+                self, "_sign_many_unobserved", payloads, headers, **jwt_config
+            )
+        except Exception as ex:
+            self._emit_result("sign", plan.algorithm, time.perf_counter() - start, ex)
+            raise
+        self._emit_batch("sign", plan.algorithm, start, [None] * len(tokens))
+        return tokens
+
+    def _sign_many_unobserved(
+        self,
+        payloads: t.List[dict],
+        headers: t.Optional[t.Dict[str, t.Any]] = None,
+        **jwt_config: t.Any,
+    ) -> t.List[str]:
+        return self._sign_many(payloads, headers, self.get_plan(**jwt_config))
+
+    def decode_many(
+        self, tokens: t.Iterable[str], verify: bool = True, **jwt_config: t.Any
+    ) -> t.List[DecodeResult]:
+        """
+        Validates each token with one resolved configuration and returns a
+        `DecodeResult` per token, holding either its payload or the
+        `JWTTokenException` it failed with, instead of raising on the first bad token.
+        """
+        plan = self.get_plan(**jwt_config)
+        results = []
+        for token in tokens:
+            try:
+                results.append(DecodeResult(token, self._decode(token, plan, verify)))
+            except JWTTokenException as ex:
+                results.append(DecodeResult(token, None, ex))
+        return results
+
+    async def decode_many_async(
+        self, tokens: t.Iterable[str], verify: bool = True, **jwt_config: t.Any
+    ) -> t.List[DecodeResult]:
+        plan = self.get_plan(**jwt_config)
+        tokens = list(tokens)
+        if plan.inline:
+            return self.decode_many(tokens, verify, **jwt_config)
+
+        # like `decode_async`, the cache and revocation store are consulted here,
+        # as the executor may run in a process that has neither
+        start = time.perf_counter()
+        token_cache = self._get_token_cache(verify)
+        cached: t.Dict[int, t.Dict[str, t.Any]] = {}
+        rejected: t.Dict[int, JWTTokenException] = {}
+        if token_cache is not None:
+            for index, token in enumerate(tokens):
+                try:
+                    self._check_token_type(token)
+                except JWTTokenException as ex:
+                    rejected[index] = ex
+                    continue
+                claims = token_cache.get(token, plan)
+                if claims is not None:
+                    cached[index] = claims
+
+        headers: t.Dict[int, t.Dict[str, t.Any]] = {}
+        if verify and plan.precheck:
+            for index, token in enumerate(tokens):
+                if index in cached or index in rejected:
+                    continue
+                try:
+                    headers[index] = precheck_token(token, plan)
+                except JWTTokenException as ex:
+                    rejected[index] = ex
+
+        pending = [
+            index
+            for index in range(len(tokens))
+            if index not in cached and index not in rejected
+        ]
+        resolved: t.Dict[int, ResolvedKey] = {}
+        if verify:
+            keys, key_errors = await self._resolve_jwks_keys(
+                [tokens[index] for index in pending],
+                plan,
+                [headers.get(index) for index in pending],
+            )
+            for position, key in keys.items():
+                resolved[pending[position]] = key
+            for position, error in key_errors.items():
+                rejected[pending[position]] = error
+        pending = [index for index in pending if index not in rejected]
+        pending_tokens = [tokens[index] for index in pending]
+        pending_keys = [resolved.get(index) for index in pending] if resolved else None
+        pending_headers = [headers[index] for index in pending] if headers else None
+        verified: t.Iterator[DecodeResult] = iter(
+            await self.executor.run(
+                self,
+                "_decode_many_uncached",
+                pending_tokens,
+                verify,
+                pending_keys,
+                pending_headers,
+                **jwt_config,
+            )
+            if pending_tokens
+            else ()
+        )
+
+        results = []
+        for index, token in enumerate(tokens):
+            if index in cached:
+                result = DecodeResult(token, cached[index])
+            elif index in rejected:
+                result = DecodeResult(token, None, rejected[index])
+            else:
+                result = next(verified)
+                if result.payload is not None and token_cache is not None:
+                    token_cache.set(
+                        token, plan, result.payload, plan.leeway.total_seconds()
+                    )
+            results.append(self._check_revoked_result(result, plan, verify))
+
+        if self.hooks:
+            errors = [result.error for result in results]
+            self._emit_batch("decode", plan.algorithm, start, errors)
+        return results
+
+    async def _resolve_jwks_keys(
+        self,
+        tokens: t.List[str],
+        plan: JWTPlan,
+        headers: t.List[t.Optional[t.Dict[str, t.Any]]],
+    ) -> t.Tuple[t.Dict[int, ResolvedKey], t.Dict[int, JWTTokenException]]:
+        """
+        Resolves the JWK set keys of `tokens` on the event loop, with the async fetcher
+        of the `JWKSManager`, and hands them to the executor along with the tokens,
+        so that it only verifies signatures. `headers` are the pre-checked headers of
+        the tokens, None where they were not pre-checked. Returns the key of each
+        token, by index, and the error of each token whose key could not be resolved.
+        """
+        keys: t.Dict[int, ResolvedKey] = {}
+        errors: t.Dict[int, JWTTokenException] = {}
+        jwks_manager = self._get_async_jwks_manager(plan)
+        if jwks_manager is None:
+            return keys, errors
+
+        for index, token in enumerate(tokens):
+            try:
+                kid = self._get_kid(token, headers[index])
+                if kid is None:
+                    # a JWK set never resolves a key without `kid`
+                    raise JWTTokenException(
+                        "Token is invalid or expired", ErrorCode.KEY_NOT_FOUND
+                    )
+                key = await self._resolve_jwks_key_async(jwks_manager, kid, plan)
+            except JWTTokenException as ex:
+                errors[index] = ex
+            else:
+                keys[index] = ResolvedKey(key)
+        return keys, errors
+
+    async def _resolve_jwks_key_async(
+        self, jwks_manager: JWKSManager, kid: str, plan: JWTPlan
+    ) -> t.Any:
+        if not self.hooks:
+            return (await jwks_manager.get_signing_key(kid)).key
+
+        fetches = jwks_manager.fetches
+        start = time.perf_counter()
+        error: t.Optional[JWTTokenException] = None
+        try:
+            return (await jwks_manager.get_signing_key(kid)).key
+        except JWTTokenException as ex:
+            error = ex
+            raise
+        finally:
+            self._emit_result(
+                "key_resolution", plan.algorithm, time.perf_counter() - start, error
+            )
+            if jwks_manager.fetches != fetches:
+                fetch_failed = (
+                    error is not None and error.code == ErrorCode.JWKS_UNAVAILABLE
+                )
+                self._emit_result(
+                    "jwks_fetch",
+                    plan.algorithm,
+                    jwks_manager.last_fetch_duration,
+                    error if fetch_failed else None,
+                )
+
+    def _get_async_jwks_manager(self, plan: JWTPlan) -> t.Optional[JWKSManager]:
+        """
+        Returns the `JWKSManager` of the JWK url, creating it on first use when
+        `JWTModule` didn't start one, so that the async APIs never fetch the JWK set
+        with a blocking request in a worker thread.
+        """
+        if plan.jwk_url is None:
+            return None
+        jwks_manager = jwks_registry.find_manager(plan.jwk_url)
+        if jwks_manager is None:
+            jwt_config = plan.jwt_config
+            jwks_manager = jwks_registry.get_manager(
+                plan.jwk_url,
+                fetcher=jwt_config.jwks_fetcher,
+                refresh_interval=plan.jwks_lifespan,
+                negative_cache_ttl=jwt_config.jwks_negative_cache_ttl,
+                fetch_timeout=jwt_config.jwks_fetch_timeout,
+            )
+        return jwks_manager
+
+    def _decode_many_uncached(
+        self,
+        tokens: t.List[str],
+        verify: bool = True,
+        keys: t.Optional[t.List[t.Optional[ResolvedKey]]] = None,
+        headers: t.Optional[t.List[t.Dict[str, t.Any]]] = None,
+        **jwt_config: t.Any,
+    ) -> t.List[DecodeResult]:
+        plan = self.get_plan(**jwt_config)
+        results = []
+        for index, token in enumerate(tokens):
+            resolved = keys[index] if keys is not None else None
+            key = resolved.key if resolved is not None else None
+            header = headers[index] if headers is not None else None
+            try:
+                payload = self._verify(token, plan, verify, key, header)
+                results.append(DecodeResult(token, payload))
+            except JWTTokenException as ex:
+                results.append(DecodeResult(token, None, ex))
+        return results
+
+    def _check_revoked_result(
+        self, result: DecodeResult, plan: JWTPlan, verify: bool
+    ) -> DecodeResult:
+        if not verify or result.payload is None:
+            return result
+        try:
+            self._check_revoked(result.payload, plan)
+        except JWTTokenException as ex:
+            return DecodeResult(result.token, None, ex)
+        return result
@@ -1,6 +1,12 @@
+import threading
+import typing as t
 from calendar import timegm
+from collections import OrderedDict
 from datetime import datetime, timezone, tzinfo
 
+K = t.TypeVar("K")
+V = t.TypeVar("V")
+
 
 def is_naive(dt: datetime) -> bool:
     """Return True if :class:`~datetime.datetime` is naive, meaning it doesn't have timezone info set."""
@@ -21,7 +27,7 @@ def make_utc(dt: datetime) -> datetime:
 
 
 def aware_utcnow() -> datetime:
-    return make_utc(datetime.utcnow())
+    return datetime.now(timezone.utc)
 
 
 def datetime_to_epoch(dt: datetime) -> int:
@@ -30,3 +36,45 @@ def datetime_to_epoch(dt: datetime) -> int:
 
 # def datetime_from_epoch(ts):
 #     return make_utc(datetime.utcfromtimestamp(ts))
+
+
+class LRUCache(t.Generic[K, V]):
+    """Thread-safe, size bounded mapping that evicts the least recently used entry."""
+
+    __slots__ = ("maxsize", "_data", "_lock")
+
+    def __init__(self, maxsize: int = 128) -> None:
+        self.maxsize = maxsize
+        self._data: "OrderedDict[K, V]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: K) -> t.Optional[V]:
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return None
+            return self._data[key]
+
+    def set(self, key: K, value: V) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: K) -> t.Optional[V]:
+        with self._lock:
+            return self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: t.Any) -> bool:
+        return key in self._data
@@ -0,0 +1,124 @@
+import json
+import threading
+import typing as t
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from cryptography.hazmat.primitives.serialization import load_pem_private_key
+from jwt.algorithms import RSAAlgorithm
+
+from ellar_jwt import JWTConfiguration, JWTService
+from ellar_jwt.exceptions import JWTTokenException
+from ellar_jwt.jwks import jwks_registry
+from ellar_jwt.keyring import Keyring
+
+from .keys import PRIVATE_KEY, PUBLIC_KEY_2
+
+JWK_KID = "230498151c214b788dd97f22b85410a5"
+SECRET = "not_secret"
+# loaded once, parsing a PEM key is slow
+RSA_KEY = load_pem_private_key(PRIVATE_KEY.encode(), None)
+
+
+class JWKSServer:
+    """Local stand-in for an IdP JWKS endpoint that counts every key set fetch."""
+
+    def __init__(self, keys: t.List[t.Dict[str, t.Any]]) -> None:
+        self.keys = keys
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                server.requests += 1
+                body = json.dumps({"keys": server.keys}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args: t.Any) -> None:
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/.well-known/jwks.json"
+
+    def start(self) -> "JWKSServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def make_jwk(public_key: str, kid: str) -> t.Dict[str, t.Any]:
+    key = RSAAlgorithm(RSAAlgorithm.SHA256).prepare_key(public_key)
+    jwk = json.loads(RSAAlgorithm.to_jwk(key))
+    jwk.update(kid=kid, use="sig", alg="RS256")
+    return jwk
+
+
+@pytest.fixture(autouse=True)
+def clear_jwks_registry():
+    jwks_registry.clear()
+    yield
+    jwks_registry.clear()
+
+
+@pytest.fixture
+def jwks_server():
+    server = JWKSServer([make_jwk(PUBLIC_KEY_2, JWK_KID)]).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def make_service():
+    """
+    Builds a `JWTService`, signing with `SECRET` unless told otherwise, or with the
+    keys and algorithm of a `keyring`
+    """
+
+    def make_service(**kwargs: t.Any) -> JWTService:
+        keyring = kwargs.get("keyring")
+        if isinstance(keyring, Keyring):
+            kwargs.setdefault("algorithm", keyring.algorithm)
+            kwargs.setdefault("signing_secret_key", "")
+        kwargs.setdefault("signing_secret_key", SECRET)
+        return JWTService(JWTConfiguration(**kwargs))
+
+    return make_service
+
+
+@pytest.fixture
+def make_rsa_service(make_service):
+    """Builds an RS256 `JWTService` signing with `RSA_KEY`"""
+
+    def make_rsa_service(**kwargs: t.Any) -> JWTService:
+        return make_service(algorithm="RS256", signing_secret_key=RSA_KEY, **kwargs)
+
+    return make_rsa_service
+
+
+@pytest.fixture
+def token_error():
+    """
+    Returns the `JWTTokenException` raised by `operation(*args, **kwargs)`,
+    e.g. `token_error(service.decode, token).code`
+    """
+
+    def token_error(
+        operation: t.Callable[..., t.Any], *args: t.Any, **kwargs: t.Any
+    ) -> JWTTokenException:
+        with pytest.raises(JWTTokenException) as ex:
+            operation(*args, **kwargs)
+        return ex.value
+
+    return token_error
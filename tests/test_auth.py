@@ -0,0 +1,162 @@
+from unittest.mock import patch
+
+import pytest
+from ellar.common import Controller, UseGuards, get
+from ellar.core import Request
+from ellar.testing import Test
+
+from ellar_jwt import JWTModule, JWTService
+from ellar_jwt.auth import (
+    JWTAuthGuard,
+    JWTAuthMiddleware,
+    get_bearer_token,
+    get_request_claims,
+)
+from ellar_jwt.refresh import TokenPairService
+
+SECRET = "not_secret"
+
+
+@Controller("/items")
+class ItemsController:
+    @get("/me")
+    @UseGuards(JWTAuthGuard)
+    async def me(self, request: Request):
+        # e.g. audit logging, sharing the decode of the guard
+        claims = await get_request_claims(request.scope)
+        return {
+            "sub": request.user.sub,
+            "auth_type": request.user.auth_type,
+            "audited": claims["sub"],
+        }
+
+    @get("/public")
+    async def public(self, request: Request):
+        user = request.scope.get("user")
+        return {"authenticated": bool(user and user.is_authenticated)}
+
+
+def _create_client(**kwargs):
+    tm = Test.create_test_module(
+        controllers=[ItemsController],
+        modules=[JWTModule.setup(signing_secret_key=SECRET, **kwargs)],
+    )
+    jwt_service: JWTService = tm.get(JWTService)
+    return tm.get_test_client(), jwt_service
+
+
+def _bearer(token: str):
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.mark.parametrize("auth_middleware", [None, "eager", "lazy"])
+def test_guarded_route_decodes_the_token_once(auth_middleware):
+    client, jwt_service = _create_client(auth_middleware=auth_middleware)
+    token = jwt_service.sign({"sub": "23"})
+
+    with patch.object(
+        jwt_service, "decode_async", wraps=jwt_service.decode_async
+    ) as decode_async:
+        response = client.get("/items/me", headers=_bearer(token))
+
+    assert response.status_code == 200
+    assert response.json() == {"sub": "23", "auth_type": "jwt", "audited": "23"}
+    decode_async.assert_called_once_with(token)
+
+
+def test_invalid_and_missing_tokens_are_rejected_by_the_guard():
+    client, _ = _create_client(auth_middleware="eager")
+
+    response = client.get("/items/me", headers=_bearer("not-a-token"))
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Token is invalid or expired"}
+
+    assert client.get("/items/me").status_code == 401
+
+
+@pytest.mark.parametrize("auth_middleware", [None, "eager"])
+def test_refresh_tokens_are_rejected_by_the_guard(auth_middleware):
+    client, jwt_service = _create_client(auth_middleware=auth_middleware)
+    pair = TokenPairService(jwt_service).issue({"sub": "23"})
+
+    assert (
+        client.get("/items/me", headers=_bearer(pair.access_token)).status_code == 200
+    )
+    response = client.get("/items/me", headers=_bearer(pair.refresh_token))
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Token is not an access token"}
+
+
+@pytest.mark.parametrize("auth_middleware", [None, "eager"])
+def test_auth_type_claim_does_not_break_the_identity(auth_middleware):
+    client, jwt_service = _create_client(auth_middleware=auth_middleware)
+    token = jwt_service.sign({"sub": "23", "auth_type": "password"})
+
+    response = client.get("/items/me", headers=_bearer(token))
+    assert response.status_code == 200
+    assert response.json() == {"sub": "23", "auth_type": "jwt", "audited": "23"}
+
+
+def test_eager_middleware_sets_the_user_of_every_route():
+    client, jwt_service = _create_client(auth_middleware="eager")
+    token = jwt_service.sign({"sub": "23"})
+
+    response = client.get("/items/public", headers=_bearer(token))
+    assert response.json() == {"authenticated": True}
+    response = client.get("/items/public", headers=_bearer("not-a-token"))
+    assert response.json() == {"authenticated": False}
+
+
+def test_lazy_middleware_skips_routes_that_never_read_the_identity():
+    client, jwt_service = _create_client(auth_middleware="lazy")
+    token = jwt_service.sign({"sub": "23"})
+
+    with patch.object(jwt_service, "decode_async") as decode_async:
+        response = client.get("/items/public", headers=_bearer(token))
+
+    assert response.json() == {"authenticated": False}
+    decode_async.assert_not_called()
+
+
+def test_auth_middleware_from_jwt_config():
+    tm = Test.create_test_module(
+        controllers=[ItemsController],
+        modules=[JWTModule.register_setup()],
+        config_module={
+            "JWT_CONFIG": {"signing_secret_key": SECRET, "auth_middleware": "eager"}
+        },
+    )
+    token = tm.get(JWTService).sign({"sub": "23"})
+
+    response = tm.get_test_client().get("/items/public", headers=_bearer(token))
+    assert response.json() == {"authenticated": True}
+
+
+def test_auth_middleware_belongs_to_the_application_of_its_setup():
+    with_middleware = JWTModule.setup(
+        signing_secret_key=SECRET, auth_middleware="eager"
+    )
+    without_middleware = JWTModule.setup(signing_secret_key=SECRET)
+
+    apps = [
+        Test.create_test_module(modules=[module]).create_application()
+        for module in (with_middleware, without_middleware)
+    ]
+    assert [
+        any(item.cls is JWTAuthMiddleware for item in app.config.MIDDLEWARE)
+        for app in apps
+    ] == [True, False]
+
+
+@pytest.mark.parametrize(
+    "authorization, token",
+    [
+        (b"Bearer abc.def.ghi", "abc.def.ghi"),
+        (b"bearer  abc.def.ghi ", "abc.def.ghi"),
+        (b"Basic dXNlcjpwYXNz", None),
+        (b"Bearer ", None),
+    ],
+)
+def test_get_bearer_token(authorization, token):
+    scope = {"headers": [(b"host", b"ellar"), (b"authorization", authorization)]}
+    assert get_bearer_token(scope) == token
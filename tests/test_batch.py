@@ -0,0 +1,110 @@
+from datetime import timedelta
+
+import jwt
+import pytest
+
+from ellar_jwt import JWTConfiguration, JWTService
+from ellar_jwt.exceptions import JWTTokenException
+from ellar_jwt.util import aware_utcnow
+
+from .keys import ES256_PRIVATE_KEY, ES256_PUBLIC_KEY, PRIVATE_KEY, PUBLIC_KEY
+
+SECRET = "not_secret"
+
+backends = (
+    JWTService(JWTConfiguration(algorithm="HS256", signing_secret_key=SECRET)),
+    JWTService(
+        JWTConfiguration(
+            algorithm="RS256",
+            signing_secret_key=PRIVATE_KEY,
+            verifying_secret_key=PUBLIC_KEY,
+            audience="openid-client-id",
+            issuer="https://ellar.com",
+        )
+    ),
+    JWTService(
+        JWTConfiguration(
+            algorithm="ES256",
+            signing_secret_key=ES256_PRIVATE_KEY,
+            verifying_secret_key=ES256_PUBLIC_KEY,
+        )
+    ),
+)
+
+
+@pytest.mark.parametrize("backend", backends)
+def test_sign_many_tokens_are_verified_by_pyjwt(backend):
+    payloads = [{"sub": str(index)} for index in range(5)]
+    tokens = backend.sign_many(payloads, headers={"kid": "key-1"})
+
+    assert len(tokens) == 5
+    issued_at = set()
+    for index, token in enumerate(tokens):
+        assert jwt.get_unverified_header(token) == {
+            "alg": backend.jwt_config.algorithm,
+            "typ": "JWT",
+            "kid": "key-1",
+        }
+        payload = jwt.decode(
+            token,
+            backend.plan.verifying_key,
+            algorithms=[backend.jwt_config.algorithm],
+            audience=backend.jwt_config.audience,
+            issuer=backend.jwt_config.issuer,
+        )
+        assert payload["sub"] == str(index)
+        issued_at.add(payload["iat"])
+
+    # one shared time base for the whole batch
+    assert len(issued_at) == 1
+
+
+def test_sign_many_header_segment_matches_pyjwt():
+    backend = backends[0]
+    token = backend.sign_many([{"sub": "23"}], headers={"kid": "key-1"})[0]
+    expected = jwt.encode(
+        {"sub": "23"}, SECRET, algorithm="HS256", headers={"kid": "key-1"}
+    )
+
+    assert token.split(".")[0] == expected.split(".")[0]
+
+
+def test_sign_many_with_algorithm_header_falls_back_to_sign():
+    backend = backends[0]
+    tokens = backend.sign_many([{"sub": "23"}], headers={"alg": "HS512"})
+
+    assert jwt.get_unverified_header(tokens[0])["alg"] == "HS512"
+
+
+def test_sign_many_with_override_jwt_config():
+    backend = backends[0]
+    tokens = backend.sign_many([{"sub": "23"}], algorithm="HS384")
+
+    assert backend.decode(tokens[0], algorithm="HS384")["sub"] == "23"
+
+
+def test_decode_many_returns_per_item_results():
+    backend = backends[0]
+    valid = backend.sign({"sub": "23"})
+    expired = jwt.encode(
+        {"sub": "24", "exp": aware_utcnow() - timedelta(seconds=10)},
+        SECRET,
+        algorithm="HS256",
+    )
+
+    results = backend.decode_many([valid, "garbage", expired])
+
+    assert [result.ok for result in results] == [True, False, False]
+    assert results[0].payload["sub"] == "23"
+    assert results[1].payload is None
+    assert isinstance(results[1].error, JWTTokenException)
+    assert results[2].token == expired
+
+
+@pytest.mark.asyncio
+async def test_sign_many_async_and_decode_many_async():
+    backend = backends[1]
+    tokens = await backend.sign_many_async({"sub": str(i)} for i in range(3))
+    results = await backend.decode_many_async(iter(tokens))
+
+    assert [result.payload["sub"] for result in results] == ["0", "1", "2"]
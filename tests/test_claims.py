@@ -0,0 +1,135 @@
+import typing as t
+
+import pytest
+
+from ellar_jwt.claims import ClaimsView, claims_view
+from ellar_jwt.exceptions import ErrorCode, JWTTokenException
+
+
+class AccessClaims(ClaimsView):
+    sub: str
+    scope: str = ""
+    exp: int
+    roles: t.Optional[t.List[str]] = None
+    weight: float = 1.0
+
+
+class TenantClaims(AccessClaims):
+    tenant: str
+
+
+def test_claims_view_is_slotted_and_read_only():
+    view = AccessClaims.from_claims({"sub": "23", "exp": 10, "extra": "ignored"})
+
+    assert AccessClaims.__slots__ == ("sub", "scope", "exp", "roles", "weight")
+    assert not hasattr(view, "__dict__")
+    assert view.to_dict() == {
+        "sub": "23",
+        "scope": "",
+        "exp": 10,
+        "roles": None,
+        "weight": 1.0,
+    }
+    assert view == AccessClaims.from_claims({"sub": "23", "exp": 10})
+    with pytest.raises(AttributeError):
+        view.sub = "42"
+
+
+def test_claims_are_validated_once():
+    with pytest.raises(JWTTokenException) as ex:
+        AccessClaims.from_claims({"exp": 10})
+    assert ex.value.code == ErrorCode.MISSING_CLAIM
+
+    for claims in (
+        {"sub": 23, "exp": 10},
+        {"sub": "23", "exp": "10"},
+        {"sub": "23", "exp": 10, "roles": "admin"},
+        {"sub": "23", "exp": 10, "weight": True},
+    ):
+        with pytest.raises(JWTTokenException) as ex:
+            AccessClaims.from_claims(claims)
+        assert ex.value.code == ErrorCode.INVALID
+
+    view = AccessClaims.from_claims({"sub": "23", "exp": 10, "weight": 2})
+    assert view.weight == 2
+
+
+def test_claims_views_inherit_claims():
+    view = TenantClaims.from_claims({"sub": "23", "exp": 10, "tenant": "acme"})
+    assert view.tenant == "acme"
+    assert view.sub == "23"
+    assert TenantClaims.__slots__ == ("tenant",)
+
+
+def test_decode_claims_returns_view(make_service):
+    backend = make_service()
+    token = backend.sign({"sub": "23", "scope": "read", "roles": ["admin"]})
+
+    view = backend.decode_claims(token, AccessClaims)
+
+    assert isinstance(view, AccessClaims)
+    assert (view.sub, view.scope, view.roles) == ("23", "read", ["admin"])
+
+
+def test_decode_claims_projects_named_claims(make_service):
+    backend = make_service()
+    token = backend.sign({"sub": "23", "scope": "read"})
+
+    view = backend.decode_claims(token, ("sub", "scope", "tenant"))
+
+    assert view.to_dict() == {"sub": "23", "scope": "read", "tenant": None}
+    assert type(view) is claims_view("sub", "scope", "tenant")
+
+
+def test_decode_claims_projects_claims_that_are_not_identifiers(make_service):
+    backend = make_service()
+    roles = "https://x.example/roles"
+    token = backend.sign({"sub": "23", roles: ["admin"], "from": "idp"})
+
+    view = backend.decode_claims(token, ["sub", roles, "from", "to_dict"])
+
+    assert view["sub"] == view.sub == "23"
+    assert view[roles] == view.https___x_example_roles == ["admin"]
+    assert view["from"] == view.claim_from == "idp"
+    assert view["to_dict"] is None
+    assert view.to_dict() == {
+        "sub": "23",
+        roles: ["admin"],
+        "from": "idp",
+        "to_dict": None,
+    }
+    with pytest.raises(KeyError):
+        view["scope"]
+
+
+def test_decode_claims_rejects_a_str_schema(make_service):
+    backend = make_service()
+    token = backend.sign({"sub": "23"})
+
+    with pytest.raises(TypeError, match="not a str"):
+        backend.decode_claims(token, "sub")
+
+
+def test_decode_claims_does_not_copy_cached_claims(make_service):
+    backend = make_service(token_cache_size=8)
+    token = backend.sign({"sub": "23"})
+    backend.decode(token)
+
+    cached = backend.token_cache.get(token, backend.plan, copy=False)
+    assert backend.token_cache.get(token, backend.plan) is not cached
+    assert backend.decode_claims(token, ("sub",)).sub == "23"
+    assert backend.decode(token) == cached
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("inline_cost_threshold", [0, 1])
+async def test_decode_claims_async(inline_cost_threshold, make_service):
+    backend = make_service(inline_cost_threshold=inline_cost_threshold)
+    token = backend.sign({"sub": "23"})
+
+    view = await backend.decode_claims_async(token, AccessClaims)
+    assert view.sub == "23"
+
+    with pytest.raises(JWTTokenException) as ex:
+        await backend.decode_claims_async(token, TenantClaims)
+    assert ex.value.code == ErrorCode.MISSING_CLAIM
@@ -0,0 +1,91 @@
+import jwt
+import pytest
+
+from ellar_jwt import JWTConfiguration, JWTService
+from ellar_jwt.encoding import HeaderSegmentCache, encode_header_segment
+from ellar_jwt.keyring import Keyring
+
+from .keys import ES256_PRIVATE_KEY, ES256_PUBLIC_KEY, PRIVATE_KEY, PUBLIC_KEY
+
+SECRET = "not_secret"
+
+configs = (
+    {"algorithm": "HS256", "signing_secret_key": SECRET},
+    {
+        "algorithm": "RS256",
+        "signing_secret_key": PRIVATE_KEY,
+        "verifying_secret_key": PUBLIC_KEY,
+    },
+    {
+        "algorithm": "ES256",
+        "signing_secret_key": ES256_PRIVATE_KEY,
+        "verifying_secret_key": ES256_PUBLIC_KEY,
+    },
+)
+
+
+@pytest.mark.parametrize("config", configs, ids=lambda config: config["algorithm"])
+@pytest.mark.parametrize(
+    "headers", [None, {"kid": "key-1"}, {"kid": "key-1", "typ": "at+jwt", "x": True}]
+)
+def test_signed_tokens_are_verified_by_pyjwt(config, headers):
+    backend = JWTService(JWTConfiguration(**config))
+
+    token = backend.sign({"sub": "23", "roles": ["admin"]}, headers=headers)
+
+    assert jwt.get_unverified_header(token) == {
+        "alg": config["algorithm"],
+        "typ": "JWT",
+        **(headers or {}),
+    }
+    payload = jwt.decode(
+        token, backend.plan.verifying_key, algorithms=[config["algorithm"]]
+    )
+    assert (payload["sub"], payload["roles"]) == ("23", ["admin"])
+
+
+def test_signed_tokens_match_pyjwt_byte_for_byte():
+    backend = JWTService(JWTConfiguration(signing_secret_key=SECRET))
+
+    for headers in (None, {"kid": "key-1", "typ": None}, {"cty": "a", "x5c": ["b"]}):
+        token = backend.sign({"sub": "23", "n": 1.5}, headers=headers)
+        claims = backend.decode(token)
+
+        assert token == jwt.encode(claims, SECRET, "HS256", headers=headers)
+
+
+def test_header_segments_are_cached_per_headers():
+    backend = JWTService(JWTConfiguration(signing_secret_key=SECRET))
+
+    backend.sign({}, headers={"kid": "key-1"})
+    backend.sign_many([{}, {}], headers={"kid": "key-1"})
+    assert len(backend.header_segments) == 1
+
+    backend.sign({}, headers={"kid": "key-2"})
+    backend.sign({}, headers={"kid": "key-1"}, algorithm="HS384")
+    backend.sign({}, headers={"x5c": ["not", "cached"]})
+    assert len(backend.header_segments) == 3
+
+
+def test_equal_header_values_of_other_types_are_not_confused():
+    cache = HeaderSegmentCache()
+
+    for value in (1, True, 1.0):
+        assert cache.get("HS256", {"x": value}) == encode_header_segment(
+            "HS256", {"x": value}
+        )
+    assert len(cache) == 3
+
+
+def test_keyring_kid_is_part_of_the_cached_header():
+    keyring = Keyring()
+    keyring.add("k1", SECRET)
+    backend = JWTService(JWTConfiguration(signing_secret_key=SECRET, keyring=keyring))
+
+    first = backend.sign({"sub": "23"})
+    keyring.rotate("k2", "another_secret")
+    second = backend.sign({"sub": "23"})
+
+    assert jwt.get_unverified_header(first)["kid"] == "k1"
+    assert jwt.get_unverified_header(second)["kid"] == "k2"
+    assert jwt.decode(second, "another_secret", algorithms=["HS256"])["sub"] == "23"
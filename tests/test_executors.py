@@ -0,0 +1,204 @@
+import pickle
+
+import jwt
+import pytest
+from ellar.testing import Test
+
+from ellar_jwt import JWTConfiguration, JWTModule, JWTService
+from ellar_jwt.exceptions import JWTTokenException
+from ellar_jwt.executors import (
+    InlineExecutor,
+    ProcessExecutor,
+    ThreadExecutor,
+    create_executor,
+)
+from ellar_jwt.keys import ResolvedKey
+
+from .conftest import JWK_KID, RSA_KEY
+from .keys import PRIVATE_KEY, PRIVATE_KEY_2, PUBLIC_KEY
+
+
+@pytest.mark.parametrize(
+    "executor, executor_type",
+    [
+        ("thread", ThreadExecutor),
+        ("inline", InlineExecutor),
+        ("process", ProcessExecutor),
+    ],
+)
+def test_create_executor(executor, executor_type, make_rsa_service):
+    assert isinstance(make_rsa_service(executor=executor).executor, executor_type)
+
+
+def test_executor_instance_is_used_as_is(make_rsa_service):
+    executor = InlineExecutor()
+    assert make_rsa_service(executor=executor).executor is executor
+
+
+def test_invalid_executor_raises():
+    with pytest.raises(ValueError, match="executor must be"):
+        JWTConfiguration(signing_secret_key="not_secret", executor="fibers")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("executor", ["thread", "inline"])
+async def test_async_apis_run_through_executor(executor, make_rsa_service):
+    backend = make_rsa_service(executor=executor)
+
+    token = await backend.sign_async({"sub": "23"})
+    assert (await backend.decode_async(token))["sub"] == "23"
+
+    tokens = await backend.sign_many_async([{"sub": "1"}, {"sub": "2"}])
+    results = await backend.decode_many_async(tokens)
+    assert [result.payload["sub"] for result in results] == ["1", "2"]
+
+    with pytest.raises(JWTTokenException):
+        await backend.decode_async("garbage")
+
+
+@pytest.mark.asyncio
+async def test_process_executor_with_worker_resident_keys(
+    make_service, make_rsa_service
+):
+    backend = make_service(
+        algorithm="RS256",
+        signing_secret_key=PRIVATE_KEY,
+        verifying_secret_key=PUBLIC_KEY,
+        executor="process",
+        executor_max_workers=1,
+    )
+    # loaded key objects are shipped to the workers as PEM
+    backend_with_key_objects = make_rsa_service(
+        executor="process", executor_max_workers=1
+    )
+    try:
+        token = await backend.sign_async({"sub": "23"}, algorithm="RS384")
+        assert backend.decode(token, algorithm="RS384")["sub"] == "23"
+        assert (await backend.decode_async(token, algorithm="RS384"))["sub"] == "23"
+
+        token = await backend_with_key_objects.sign_async({"sub": "24"})
+        assert (await backend_with_key_objects.decode_async(token))["sub"] == "24"
+
+        with pytest.raises(JWTTokenException, match="Token is invalid or expired"):
+            await backend.decode_async("garbage")
+    finally:
+        backend.executor.shutdown()
+        backend_with_key_objects.executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_process_workers_verify_with_keys_resolved_by_the_caller(
+    jwks_server, make_rsa_service
+):
+    backend = make_rsa_service(
+        jwk_url=jwks_server.url, executor="process", executor_max_workers=2
+    )
+    token = jwt.encode(
+        {"sub": "23"}, PRIVATE_KEY_2, algorithm="RS256", headers={"kid": JWK_KID}
+    )
+    try:
+        for _ in range(4):
+            assert (await backend.decode_async(token))["sub"] == "23"
+        results = await backend.decode_many_async([token, token])
+        assert [result.payload["sub"] for result in results] == ["23", "23"]
+    finally:
+        backend.executor.shutdown()
+    # fetched once on the event loop, never by the workers
+    assert jwks_server.requests == 1
+
+
+def test_resolved_keys_are_shipped_as_pem_and_loaded_once():
+    public_key = RSA_KEY.public_key()
+
+    loaded = pickle.loads(pickle.dumps(ResolvedKey(public_key)))
+    assert loaded.key.public_numbers() == public_key.public_numbers()
+    assert pickle.loads(pickle.dumps(ResolvedKey(public_key))) is loaded
+    assert pickle.loads(pickle.dumps(ResolvedKey(b"secret"))).key == b"secret"
+
+
+def test_process_executor_can_not_be_shared_between_configurations(make_rsa_service):
+    executor = ProcessExecutor(max_workers=1)
+    backend_1 = make_rsa_service(executor=executor)
+    backend_2 = make_rsa_service(executor=executor)
+    try:
+        executor._get_pool(backend_1.jwt_config)
+        with pytest.raises(RuntimeError, match="can not be shared"):
+            executor._get_pool(backend_2.jwt_config)
+    finally:
+        executor.shutdown()
+
+
+def test_jwt_module_shuts_down_the_executor_with_the_app():
+    class TrackingExecutor(InlineExecutor):
+        shutdowns = 0
+
+        def shutdown(self) -> None:
+            self.shutdowns += 1
+
+    executor = TrackingExecutor()
+    tm = Test.create_test_module(
+        modules=[JWTModule.setup(signing_secret_key="not_secret", executor=executor)]
+    )
+
+    with tm.get_test_client():
+        assert tm.get(JWTService).executor is executor
+        assert executor.shutdowns == 0
+    assert executor.shutdowns == 1
+
+
+def test_create_executor_defaults_to_thread():
+    config = JWTConfiguration(signing_secret_key="not_secret")
+    assert isinstance(create_executor(config), ThreadExecutor)
+
+
+class FailingExecutor(InlineExecutor):
+    async def run(self, service, method, *args, **jwt_config):
+        raise AssertionError("executor should not be used")
+
+
+@pytest.mark.asyncio
+async def test_cheap_algorithms_run_inline_in_async_apis(make_service):
+    backend = make_service(executor=FailingExecutor())
+    assert backend.plan.inline
+
+    token = await backend.sign_async({"sub": "23"})
+    assert (await backend.decode_async(token))["sub"] == "23"
+    token = await backend.sign_async({"sub": "23"}, algorithm="HS512")
+    assert (await backend.decode_async(token, algorithm="HS512"))["sub"] == "23"
+
+
+@pytest.mark.asyncio
+async def test_expensive_algorithms_are_offloaded_to_executor(make_rsa_service):
+    backend = make_rsa_service(executor=FailingExecutor())
+    assert not backend.plan.inline
+
+    with pytest.raises(AssertionError, match="executor should not be used"):
+        await backend.decode_async(backend.sign({"sub": "23"}))
+
+
+@pytest.mark.parametrize(
+    "algorithm, inline_cost_threshold, inline",
+    [
+        ("HS256", 0, False),
+        ("HS256", 1, True),
+        ("RS256", 1, False),
+        ("RS256", 20, True),
+        ("ES512", 20, False),
+    ],
+)
+def test_inline_cost_threshold(
+    algorithm, inline_cost_threshold, inline, make_rsa_service
+):
+    plan = make_rsa_service(
+        executor="thread", inline_cost_threshold=inline_cost_threshold
+    ).get_plan(algorithm=algorithm)
+    assert plan.inline is inline
+
+
+def test_jwks_plans_are_never_inline(make_rsa_service):
+    backend = make_rsa_service(
+        executor="thread",
+        inline_cost_threshold=100,
+        jwk_url="https://randomstring.auth0.com/.well-known/jwks.json",
+    )
+    assert not backend.plan.inline
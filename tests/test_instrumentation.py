@@ -0,0 +1,252 @@
+import pickle
+from datetime import timedelta
+from unittest.mock import patch
+
+import jwt
+import pytest
+from pydantic import ValidationError
+
+from ellar_jwt import JWTConfiguration, JWTService
+from ellar_jwt.exceptions import ErrorCode, JWTTokenException
+from ellar_jwt.instrumentation import (
+    DurationHistogram,
+    EventCounter,
+    JWTEvent,
+    JWTHook,
+    PrometheusMetrics,
+)
+from ellar_jwt.jwks import jwks_registry
+from ellar_jwt.revocation import InMemoryRevocationStore
+from ellar_jwt.util import aware_utcnow
+
+from .conftest import JWK_KID, SECRET
+from .keys import PRIVATE_KEY, PRIVATE_KEY_2, PUBLIC_KEY
+
+
+class RecordingHook(JWTHook):
+    def __init__(self):
+        self.events = []
+
+    def on_event(self, event):
+        self.events.append(event)
+
+
+def test_decode_errors_carry_codes(make_service, token_error):
+    backend = make_service(audience="api", issuer="ellar")
+    now = aware_utcnow()
+    claims = {"aud": "api", "iss": "ellar", "exp": now + timedelta(minutes=1)}
+
+    expired = jwt.encode({**claims, "exp": now - timedelta(minutes=1)}, SECRET)
+    immature = jwt.encode({**claims, "nbf": now + timedelta(minutes=1)}, SECRET)
+    wrong_audience = jwt.encode({**claims, "aud": "other"}, SECRET)
+    wrong_issuer = jwt.encode({**claims, "iss": "other"}, SECRET)
+    wrong_signature = jwt.encode(claims, "other_secret")
+    wrong_algorithm = jwt.encode(claims, SECRET, algorithm="HS512")
+
+    assert token_error(backend.decode, expired).code == ErrorCode.EXPIRED
+    assert token_error(backend.decode, immature).code == ErrorCode.IMMATURE
+    assert (
+        token_error(backend.decode, wrong_audience).code == ErrorCode.INVALID_AUDIENCE
+    )
+    assert token_error(backend.decode, wrong_issuer).code == ErrorCode.INVALID_ISSUER
+    assert (
+        token_error(backend.decode, wrong_signature).code == ErrorCode.INVALID_SIGNATURE
+    )
+    assert token_error(backend.decode, "not-a-token").code == ErrorCode.MALFORMED
+
+    error = token_error(backend.decode, wrong_algorithm)
+    assert error.code == ErrorCode.INVALID_ALGORITHM
+    assert str(error) == "Invalid algorithm specified"
+    # the messages stay generic
+    assert str(token_error(backend.decode, expired)) == "Token is invalid or expired"
+
+
+def test_revoked_and_jwks_errors_carry_codes(jwks_server, make_service, token_error):
+    backend = make_service(revocation_store=InMemoryRevocationStore())
+    token = backend.sign({"sub": "23"})
+    backend.revoke(token)
+    assert token_error(backend.decode, token).code == ErrorCode.REVOKED
+
+    jwks_backend = JWTService(
+        JWTConfiguration(
+            algorithm="RS256", signing_secret_key=PRIVATE_KEY, jwk_url=jwks_server.url
+        )
+    )
+    token = jwt.encode({"sub": "23"}, PRIVATE_KEY_2, "RS256", headers={"kid": "?"})
+    assert token_error(jwks_backend.decode, token).code == ErrorCode.KEY_NOT_FOUND
+
+    unavailable = "http://127.0.0.1:9/.well-known/jwks.json"
+    assert token_error(jwks_backend.decode, token, jwk_url=unavailable).code == (
+        ErrorCode.JWKS_UNAVAILABLE
+    )
+
+
+def test_error_code_survives_pickling():
+    error = pickle.loads(pickle.dumps(JWTTokenException("Revoked", ErrorCode.REVOKED)))
+    assert (str(error), error.code) == ("Revoked", ErrorCode.REVOKED)
+    assert JWTTokenException().code == ErrorCode.INVALID
+
+
+def test_sign_and_decode_emit_events(make_service):
+    hook = RecordingHook()
+    backend = make_service(hooks=[hook])
+
+    token = backend.sign({"sub": "23"})
+    backend.decode(token)
+    with pytest.raises(JWTTokenException):
+        backend.decode(token + "x")
+
+    assert [(event.operation, event.outcome) for event in hook.events] == [
+        ("sign", "ok"),
+        ("decode", "ok"),
+        ("decode", ErrorCode.INVALID_SIGNATURE),
+    ]
+    assert all(event.algorithm == "HS256" for event in hook.events)
+    assert all(event.duration >= 0 for event in hook.events)
+    assert isinstance(hook.events[-1].error, JWTTokenException)
+
+
+def test_no_events_are_timed_without_hooks(make_service):
+    backend = make_service()
+    with patch.object(backend, "_observe") as observe, patch.object(
+        backend, "_emit"
+    ) as emit:
+        backend.decode(backend.sign({"sub": "23"}))
+    observe.assert_not_called()
+    emit.assert_not_called()
+
+
+def test_hooks_can_be_attached_and_removed(make_service):
+    backend = make_service()
+    hook = RecordingHook()
+
+    backend.add_hook(hook)
+    backend.sign({"sub": "23"})
+    backend.remove_hook(hook)
+    backend.sign({"sub": "23"})
+
+    assert len(hook.events) == 1
+
+
+def test_failing_hook_does_not_fail_the_operation(make_service):
+    class FailingHook(JWTHook):
+        def on_event(self, event):
+            raise RuntimeError("metrics backend down")
+
+    backend = make_service(hooks=[FailingHook()])
+    assert backend.decode(backend.sign({"sub": "23"}))["sub"] == "23"
+
+
+def test_jwks_key_resolution_and_fetch_events(jwks_server):
+    hook = RecordingHook()
+    backend = JWTService(
+        JWTConfiguration(
+            algorithm="RS256",
+            signing_secret_key=PRIVATE_KEY,
+            jwk_url=jwks_server.url,
+            hooks=[hook],
+        )
+    )
+    token = jwt.encode(
+        {"sub": "23"}, PRIVATE_KEY_2, algorithm="RS256", headers={"kid": JWK_KID}
+    )
+
+    backend.decode(token)
+    backend.decode(token)
+
+    operations = [event.operation for event in hook.events]
+    assert operations == [
+        "key_resolution",
+        "jwks_fetch",
+        "decode",
+        "key_resolution",
+        "decode",
+    ]
+    assert all(event.ok for event in hook.events)
+
+
+@pytest.mark.asyncio
+async def test_async_jwks_decodes_resolve_each_key_once(jwks_server, make_rsa_service):
+    hook = RecordingHook()
+    backend = make_rsa_service(jwk_url=jwks_server.url, hooks=[hook])
+    token = jwt.encode(
+        {"sub": "23"}, PRIVATE_KEY_2, algorithm="RS256", headers={"kid": JWK_KID}
+    )
+
+    await backend.decode_async(token)
+    operations = [event.operation for event in hook.events]
+    assert operations == ["key_resolution", "jwks_fetch", "decode"]
+    manager = jwks_registry.find_manager(jwks_server.url)
+    # the fetch alone, not the whole key resolution
+    assert hook.events[1].duration == manager.last_fetch_duration
+
+    hook.events.clear()
+    await backend.decode_many_async([token, token])
+    operations = [event.operation for event in hook.events]
+    assert operations == ["key_resolution", "key_resolution", "decode", "decode"]
+
+
+@pytest.mark.asyncio
+async def test_async_and_batch_apis_emit_one_event_per_token():
+    counter = EventCounter()
+    backend = JWTService(
+        JWTConfiguration(
+            algorithm="RS256",
+            signing_secret_key=PRIVATE_KEY,
+            verifying_secret_key=PUBLIC_KEY,
+            hooks=[counter],
+        )
+    )
+
+    token = await backend.sign_async({"sub": "23"})
+    await backend.decode_async(token)
+    tokens = await backend.sign_many_async([{"sub": "1"}, {"sub": "2"}])
+    await backend.decode_many_async([*tokens, "invalid"])
+    backend.decode_many(tokens)
+
+    assert counter.count("sign") == 3
+    assert counter.count("decode", outcome="ok") == 5
+    assert counter.count("decode", outcome=ErrorCode.MALFORMED) == 1
+    assert counter.count("decode", algorithm="HS256") == 0
+
+
+def test_prometheus_metrics_render():
+    metrics = PrometheusMetrics()
+    metrics.on_event(JWTEvent("decode", "RS256", "ok", 0.0003))
+    metrics.on_event(JWTEvent("decode", "RS256", "expired", 0.002))
+
+    text = metrics.render()
+
+    assert "# TYPE ellar_jwt_operations_total counter" in text
+    assert (
+        'ellar_jwt_operations_total{operation="decode",algorithm="RS256",outcome="expired"} 1'
+        in text
+    )
+    assert "# TYPE ellar_jwt_operation_duration_seconds histogram" in text
+    assert (
+        'ellar_jwt_operation_duration_seconds_bucket{operation="decode",algorithm="RS256",le="0.0005"} 1'
+        in text
+    )
+    assert (
+        'ellar_jwt_operation_duration_seconds_bucket{operation="decode",algorithm="RS256",le="+Inf"} 2'
+        in text
+    )
+    assert (
+        'ellar_jwt_operation_duration_seconds_count{operation="decode",algorithm="RS256"} 2'
+        in text
+    )
+
+
+def test_duration_histogram_summary():
+    histogram = DurationHistogram(buckets=(0.1, 1))
+    histogram.on_event(JWTEvent("sign", "HS256", "ok", 0.5))
+    histogram.on_event(JWTEvent("sign", "HS256", "ok", 5))
+
+    assert histogram.buckets == (0.1, 1, float("inf"))
+    assert histogram.summary("sign", "HS256") == (2, 5.5)
+    assert histogram.summary("decode", "HS256") == (0, 0.0)
+
+
+def test_hooks_must_be_jwt_hooks(make_service):
+    with pytest.raises(ValidationError, match="hooks must be JWTHook instances"):
+        make_service(hooks=[print])
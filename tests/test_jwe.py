@@ -0,0 +1,153 @@
+import json
+from unittest.mock import patch
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from jwt.utils import base64url_decode, base64url_encode
+
+from ellar_jwt import jwe
+from ellar_jwt.exceptions import ErrorCode
+
+from .conftest import RSA_KEY, SECRET
+from .keys import PRIVATE_KEY, PUBLIC_KEY
+
+AES_KEY = b"0123456789abcdef0123456789abcdef"
+
+configs = (
+    {"encryption_algorithm": "dir", "encryption_key": AES_KEY},
+    {
+        "encryption_algorithm": "dir",
+        "encryption_method": "A128GCM",
+        "encryption_key": AES_KEY[:16],
+    },
+    {"encryption_algorithm": "A256KW", "encryption_key": AES_KEY},
+    {"encryption_algorithm": "RSA-OAEP-256", "decryption_key": RSA_KEY},
+)
+
+
+@pytest.mark.parametrize(
+    "config", configs, ids=lambda config: config["encryption_algorithm"]
+)
+@pytest.mark.asyncio
+async def test_encrypted_tokens_round_trip(config, make_service):
+    service = make_service(**config)
+
+    token = service.encrypt({"sub": "23", "email": "user@ellar.com"})
+    assert token.count(".") == 4
+    assert "user@ellar.com" not in token
+    assert service.decrypt(token)["email"] == "user@ellar.com"
+
+    token = await service.encrypt_async({"sub": "42"})
+    assert (await service.decrypt_async(token))["sub"] == "42"
+
+
+def test_dir_tokens_are_nested_jwts_without_an_encrypted_key(make_service):
+    service = make_service(encryption_algorithm="dir", encryption_key=AES_KEY)
+
+    token = service.encrypt({"sub": "23"})
+    header, encrypted_key, iv, ciphertext, tag = token.split(".")
+
+    assert json.loads(base64url_decode(header)) == {
+        "alg": "dir",
+        "enc": "A256GCM",
+        "cty": "JWT",
+    }
+    assert encrypted_key == ""
+    signed_token = AESGCM(AES_KEY).decrypt(
+        base64url_decode(iv),
+        base64url_decode(ciphertext) + base64url_decode(tag),
+        header.encode(),
+    )
+    assert jwt.decode(signed_token, SECRET, algorithms=["HS256"])["sub"] == "23"
+
+
+def test_tampered_and_foreign_tokens_are_rejected(make_service, token_error):
+    service = make_service(encryption_algorithm="A256KW", encryption_key=AES_KEY)
+    token = service.encrypt({"sub": "23"})
+    header, encrypted_key, iv, ciphertext, tag = token.split(".")
+
+    flipped = base64url_encode(bytes([base64url_decode(ciphertext)[0] ^ 1]))
+    tampered = ".".join(
+        (header, encrypted_key, iv, flipped.decode() + ciphertext[2:], tag)
+    )
+    assert token_error(service.decrypt, tampered).code == ErrorCode.DECRYPTION_FAILED
+
+    other = make_service(encryption_algorithm="A256KW", encryption_key=AES_KEY[::-1])
+    assert token_error(other.decrypt, token).code == ErrorCode.DECRYPTION_FAILED
+
+    dir_header = base64url_encode(b'{"alg":"dir","enc":"A256GCM"}').decode()
+    error = token_error(
+        service.decrypt, ".".join((dir_header, encrypted_key, iv, ciphertext, tag))
+    )
+    assert error.code == ErrorCode.INVALID_ALGORITHM
+
+    for junk in ("a.b.c", "a.b.c.d.e", service.sign({"sub": "23"})):
+        assert token_error(service.decrypt, junk).code == ErrorCode.MALFORMED
+
+
+def test_encrypted_token_holding_an_invalid_signature_is_rejected(
+    make_service, token_error
+):
+    service = make_service(encryption_algorithm="dir", encryption_key=AES_KEY)
+    forged = make_service(
+        signing_secret_key="another_secret",
+        encryption_algorithm="dir",
+        encryption_key=AES_KEY,
+    )
+
+    error = token_error(service.decrypt, forged.encrypt({"sub": "23"}))
+    assert error.code == ErrorCode.INVALID_SIGNATURE
+
+
+def test_keys_are_loaded_once(make_service):
+    service = make_service(
+        encryption_algorithm="RSA-OAEP-256",
+        encryption_key=PUBLIC_KEY,
+        decryption_key=PRIVATE_KEY,
+    )
+
+    with patch.object(
+        jwe, "load_pem_private_key", side_effect=AssertionError
+    ), patch.object(jwe, "load_pem_public_key", side_effect=AssertionError):
+        for _ in range(2):
+            assert service.decrypt(service.encrypt({"sub": "23"}))["sub"] == "23"
+
+
+@pytest.mark.asyncio
+async def test_rsa_decryption_runs_on_the_executor(make_service):
+    service = make_service(encryption_algorithm="RSA-OAEP-256", decryption_key=RSA_KEY)
+    token = service.encrypt({"sub": "23"})
+
+    with patch.object(service.executor, "run", wraps=service.executor.run) as run:
+        assert (await service.decrypt_async(token))["sub"] == "23"
+    assert run.call_args_list[0].args[1] == "_decrypt_unobserved"
+
+
+def test_encryption_must_be_configured(make_service):
+    service = make_service()
+
+    with pytest.raises(RuntimeError, match="No `encryption_algorithm` is configured"):
+        service.encrypt({"sub": "23"})
+
+
+@pytest.mark.parametrize(
+    "config, message",
+    [
+        (
+            {"encryption_algorithm": "dir", "encryption_key": "short"},
+            "encryption_key of A256GCM must be 32 bytes",
+        ),
+        (
+            {"encryption_algorithm": "A128KW", "encryption_key": AES_KEY},
+            "encryption_key of A128KW must be 16 bytes",
+        ),
+        (
+            {"encryption_algorithm": "RSA-OAEP-256", "encryption_key": AES_KEY},
+            "must be an RSA public key",
+        ),
+    ],
+)
+def test_encryption_keys_are_validated(config, message, make_service):
+    with pytest.raises(ValueError, match=message):
+        make_service(**config)
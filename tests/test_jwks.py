@@ -0,0 +1,95 @@
+import json
+from datetime import timedelta
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import ed25519
+from jwt.algorithms import OKPAlgorithm
+
+from ellar_jwt import JWTConfiguration, JWTService
+from ellar_jwt.exceptions import JWTTokenException
+from ellar_jwt.jwks import jwks_registry
+from ellar_jwt.util import aware_utcnow
+
+from .conftest import JWK_KID, JWKSServer
+from .keys import PRIVATE_KEY_2
+
+
+def _make_token(kid: str = JWK_KID) -> str:
+    return jwt.encode(
+        {"sub": "23", "exp": aware_utcnow() + timedelta(days=1)},
+        PRIVATE_KEY_2,
+        algorithm="RS256",
+        headers={"kid": kid},
+    )
+
+
+def test_many_decodes_cause_a_single_jwks_fetch(jwks_server, make_rsa_service):
+    backend = make_rsa_service(jwk_url=jwks_server.url)
+    token = _make_token()
+
+    for _ in range(10):
+        assert backend.decode(token)["sub"] == "23"
+
+    assert jwks_server.requests == 1
+    stats = jwks_registry.stats(jwks_server.url)
+    assert stats.fetches == 1
+    assert stats.misses == 1
+    assert stats.hits == 9
+
+
+def test_jwks_client_is_shared_between_services(jwks_server, make_rsa_service):
+    backend_1 = make_rsa_service(jwk_url=jwks_server.url)
+    backend_2 = make_rsa_service(jwk_url=jwks_server.url)
+
+    assert backend_1.get_jwks_client(backend_1.jwt_config) is backend_2.get_jwks_client(
+        backend_2.jwt_config
+    )
+
+    token = _make_token()
+    backend_1.decode(token)
+    backend_2.decode(token)
+    assert jwks_server.requests == 1
+
+
+def test_jwks_client_uses_configured_cache_settings(jwks_server, make_rsa_service):
+    backend = make_rsa_service(
+        jwk_url=jwks_server.url, jwks_lifespan=60, jwks_max_cached_keys=2
+    )
+    client = backend.get_jwks_client(backend.jwt_config)
+
+    assert client.jwk_set_cache.lifespan == 60
+    assert client.get_signing_key.cache_parameters()["maxsize"] == 2
+
+
+def test_jwks_unknown_kid_raises(jwks_server, make_rsa_service):
+    backend = make_rsa_service(jwk_url=jwks_server.url)
+
+    with pytest.raises(JWTTokenException, match="Token is invalid or expired"):
+        backend.decode(_make_token(kid="unknown"))
+
+    assert jwks_registry.stats().misses == 1
+
+
+def test_jwks_lifespan_must_be_positive():
+    with pytest.raises(ValueError):
+        JWTConfiguration(signing_secret_key="not_secret", jwks_lifespan=0)
+
+
+def test_eddsa_tokens_are_verified_with_okp_jwks():
+    signing_key = ed25519.Ed25519PrivateKey.generate()
+    jwk = json.loads(OKPAlgorithm.to_jwk(signing_key.public_key()))
+    jwk.update(kid=JWK_KID, use="sig", alg="EdDSA")
+    server = JWKSServer([jwk]).start()
+    try:
+        backend = JWTService(
+            JWTConfiguration(
+                algorithm="EdDSA", signing_secret_key=signing_key, jwk_url=server.url
+            )
+        )
+        token = jwt.encode(
+            {"sub": "23"}, signing_key, algorithm="EdDSA", headers={"kid": JWK_KID}
+        )
+        assert backend.decode(token)["sub"] == "23"
+    finally:
+        server.stop()
@@ -0,0 +1,301 @@
+import asyncio
+from unittest.mock import patch
+
+import jwt
+import pytest
+from ellar.testing import Test
+
+from ellar_jwt import JWTConfiguration, JWTModule, JWTService
+from ellar_jwt.exceptions import ErrorCode, JWTTokenException
+from ellar_jwt.jwks import (
+    HTTPXJWKSFetcher,
+    JWKSFetcher,
+    JWKSManager,
+    URLLibJWKSFetcher,
+    jwks_registry,
+)
+
+from .conftest import JWK_KID, make_jwk
+from .keys import PRIVATE_KEY, PRIVATE_KEY_2, PUBLIC_KEY, PUBLIC_KEY_2
+
+# nothing listens here, any fetch bypassing the fake fetcher fails
+JWK_URL = "http://127.0.0.1:9/.well-known/jwks.json"
+
+
+class FakeFetcher(JWKSFetcher):
+    def __init__(self, keys, delay: float = 0):
+        self.keys = keys
+        self.delay = delay
+        self.calls = 0
+        self.fail = False
+
+    async def fetch(self, uri):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise OSError("IdP is down")
+        return {"keys": list(self.keys)}
+
+
+def _make_token(private_key: str = PRIVATE_KEY_2, kid: str = JWK_KID) -> str:
+    return jwt.encode(
+        {"sub": "23"}, private_key, algorithm="RS256", headers={"kid": kid}
+    )
+
+
+async def _start_manager(fetcher: FakeFetcher, **kwargs) -> JWKSManager:
+    manager = jwks_registry.get_manager(JWK_URL, fetcher=fetcher, **kwargs)
+    await manager.start()
+    return manager
+
+
+@pytest.mark.asyncio
+async def test_decode_async_uses_prefetched_keys(make_rsa_service):
+    fetcher = FakeFetcher([make_jwk(PUBLIC_KEY_2, JWK_KID)])
+    manager = await _start_manager(fetcher)
+    backend = make_rsa_service(jwk_url=JWK_URL)
+    try:
+        for _ in range(5):
+            assert (await backend.decode_async(_make_token()))["sub"] == "23"
+        # the synchronous API is answered from memory as well
+        assert backend.decode(_make_token())["sub"] == "23"
+        assert fetcher.calls == 1
+    finally:
+        await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_unknown_kid_lookups_share_one_fetch(make_rsa_service):
+    fetcher = FakeFetcher([make_jwk(PUBLIC_KEY_2, JWK_KID)], delay=0.05)
+    manager = await _start_manager(fetcher, min_refresh_interval=0)
+    backend = make_rsa_service(jwk_url=JWK_URL)
+    try:
+        # the IdP rotates to a new key
+        fetcher.keys.append(make_jwk(PUBLIC_KEY, "rotated"))
+        token = _make_token(PRIVATE_KEY, "rotated")
+
+        payloads = await asyncio.gather(
+            *(backend.decode_async(token) for _ in range(10))
+        )
+
+        assert all(payload["sub"] == "23" for payload in payloads)
+        assert fetcher.calls == 2
+    finally:
+        await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_unknown_kid_is_negatively_cached(make_rsa_service):
+    fetcher = FakeFetcher([make_jwk(PUBLIC_KEY_2, JWK_KID)])
+    manager = await _start_manager(fetcher, min_refresh_interval=0)
+    backend = make_rsa_service(jwk_url=JWK_URL)
+    token = _make_token(kid="unknown")
+    try:
+        for _ in range(3):
+            with pytest.raises(JWTTokenException) as ex:
+                await backend.decode_async(token)
+            assert ex.value.code == ErrorCode.KEY_NOT_FOUND
+        with pytest.raises(JWTTokenException) as ex:
+            backend.decode(token)
+        assert ex.value.code == ErrorCode.KEY_NOT_FOUND
+
+        assert fetcher.calls == 2
+        assert manager.is_missing("unknown")
+    finally:
+        await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_stale_keys_are_served_while_refresh_fails(make_rsa_service):
+    fetcher = FakeFetcher([make_jwk(PUBLIC_KEY_2, JWK_KID)])
+    manager = await _start_manager(
+        fetcher, refresh_interval=3600, min_refresh_interval=0.5
+    )
+    backend = make_rsa_service(jwk_url=JWK_URL)
+    token = _make_token()
+    try:
+        fetcher.fail = True
+        manager.refresh_interval = 0
+        assert manager.is_stale
+        await asyncio.sleep(0.5)
+
+        assert (await backend.decode_async(token))["sub"] == "23"
+        await asyncio.sleep(0.01)  # lets the background revalidation fail
+        assert fetcher.calls == 2
+        # no new attempt within `min_refresh_interval` of the failed one
+        for _ in range(5):
+            assert (await backend.decode_async(token))["sub"] == "23"
+        assert fetcher.calls == 2
+    finally:
+        await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_sync_decode_serves_stale_keys_during_an_outage(make_rsa_service):
+    fetcher = FakeFetcher([make_jwk(PUBLIC_KEY_2, JWK_KID)])
+    manager = await _start_manager(
+        fetcher, refresh_interval=3600, min_refresh_interval=0
+    )
+    backend = make_rsa_service(jwk_url=JWK_URL)
+    token = _make_token()
+    try:
+        fetcher.fail = True
+        manager.refresh_interval = 0
+        assert manager.is_stale and manager.is_servable
+        # answered from the running manager, not a blocking fetch of JWK_URL
+        assert backend.decode(token)["sub"] == "23"
+
+        await manager.stop()
+        assert not manager.is_servable
+        await manager._refresh_safely()
+        # the stale key set outlives the failed refresh
+        assert manager.is_servable
+        assert backend.decode(token)["sub"] == "23"
+    finally:
+        await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_unavailable_jwks_without_keys():
+    fetcher = FakeFetcher([])
+    fetcher.fail = True
+    manager = await _start_manager(fetcher, min_refresh_interval=0)
+    try:
+        with pytest.raises(JWTTokenException) as ex:
+            await manager.get_signing_key(JWK_KID)
+        assert ex.value.code == ErrorCode.JWKS_UNAVAILABLE
+    finally:
+        await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_manager_refreshes_in_background():
+    fetcher = FakeFetcher([make_jwk(PUBLIC_KEY_2, JWK_KID)])
+    manager = await _start_manager(
+        fetcher, refresh_interval=0.02, min_refresh_interval=0
+    )
+    assert manager.is_running
+
+    await asyncio.sleep(0.1)
+    await manager.stop()
+    calls = fetcher.calls
+    await asyncio.sleep(0.05)
+
+    assert calls >= 3
+    assert fetcher.calls == calls
+    assert not manager.is_running
+
+
+def test_jwt_module_runs_the_jwks_manager_during_the_app_lifespan():
+    fetcher = FakeFetcher([make_jwk(PUBLIC_KEY_2, JWK_KID)])
+    tm = Test.create_test_module(
+        modules=[
+            JWTModule.setup(
+                algorithm="RS256",
+                signing_secret_key=PRIVATE_KEY,
+                jwk_url=JWK_URL,
+                jwks_fetcher=fetcher,
+            )
+        ]
+    )
+
+    with tm.get_test_client():
+        manager = jwks_registry.find_manager(JWK_URL)
+        assert manager is not None and manager.is_running
+        assert fetcher.calls == 1
+        assert tm.get(JWTService).decode(_make_token())["sub"] == "23"
+
+    assert not manager.is_running
+    assert jwks_registry.find_manager(JWK_URL) is None
+
+
+def test_jwks_fetcher_must_be_a_jwks_fetcher():
+    with pytest.raises(ValueError, match="jwks_fetcher must be a JWKSFetcher"):
+        JWTConfiguration(signing_secret_key="secret", jwks_fetcher=object())
+
+
+@pytest.mark.asyncio
+async def test_decode_async_resolves_keys_without_a_started_manager(make_rsa_service):
+    fetcher = FakeFetcher([make_jwk(PUBLIC_KEY_2, JWK_KID)])
+    backend = make_rsa_service(jwk_url=JWK_URL, jwks_fetcher=fetcher)
+    token = _make_token()
+
+    for _ in range(3):
+        assert (await backend.decode_async(token))["sub"] == "23"
+    assert backend.decode(token)["sub"] == "23"
+
+    assert fetcher.calls == 1
+    assert not jwks_registry.find_manager(JWK_URL).is_running
+    # the blocking PyJWKClient never fetched
+    assert jwks_registry.stats().fetches == 0
+
+
+@pytest.mark.asyncio
+async def test_slow_jwks_fetch_times_out(make_rsa_service):
+    fetcher = FakeFetcher([make_jwk(PUBLIC_KEY_2, JWK_KID)], delay=5)
+    backend = make_rsa_service(
+        jwk_url=JWK_URL, jwks_fetcher=fetcher, jwks_fetch_timeout=0.05
+    )
+
+    with pytest.raises(JWTTokenException) as ex:
+        await asyncio.wait_for(backend.decode_async(_make_token()), 1)
+    assert ex.value.code == ErrorCode.JWKS_UNAVAILABLE
+
+
+@pytest.mark.asyncio
+async def test_decode_many_async_only_offloads_tokens_with_resolved_keys(
+    make_rsa_service,
+):
+    fetcher = FakeFetcher([make_jwk(PUBLIC_KEY_2, JWK_KID)])
+    backend = make_rsa_service(jwk_url=JWK_URL, jwks_fetcher=fetcher)
+    token = _make_token()
+    tokens = [token, _make_token(kid="unknown"), token]
+
+    with patch.object(backend.executor, "run", wraps=backend.executor.run) as run:
+        results = await backend.decode_many_async(tokens)
+
+    assert [result.ok for result in results] == [True, False, True]
+    assert results[1].error.code == ErrorCode.KEY_NOT_FOUND
+    assert run.call_args.args[2] == [token, token]
+    assert fetcher.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_unverified_decode_async_does_not_fetch(make_rsa_service):
+    fetcher = FakeFetcher([])
+    backend = make_rsa_service(jwk_url=JWK_URL, jwks_fetcher=fetcher)
+
+    assert (await backend.decode_async(_make_token(), verify=False))["sub"] == "23"
+    assert fetcher.calls == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("fetcher_class", [HTTPXJWKSFetcher, URLLibJWKSFetcher])
+async def test_fetchers_fetch_the_jwk_set(jwks_server, fetcher_class):
+    data = await fetcher_class(timeout=5).fetch(jwks_server.url)
+
+    assert [key["kid"] for key in data["keys"]] == [JWK_KID]
+    assert jwks_server.requests == 1
+
+
+@pytest.mark.asyncio
+async def test_decode_refetches_keys_once_the_manager_is_stale(
+    jwks_server, make_rsa_service
+):
+    backend = make_rsa_service(jwk_url=jwks_server.url)
+    token = _make_token()
+
+    assert (await backend.decode_async(token))["sub"] == "23"
+    assert backend.decode(token)["sub"] == "23"
+    assert jwks_server.requests == 1
+
+    # the IdP removed the key and the manager's key set outlived `jwks_lifespan`
+    jwks_server.keys = []
+    manager = jwks_registry.find_manager(jwks_server.url)
+    manager.refresh_interval = manager.min_refresh_interval = 0
+    assert not manager.is_servable
+
+    with pytest.raises(JWTTokenException) as ex:
+        backend.decode(token)
+    assert ex.value.code == ErrorCode.KEY_NOT_FOUND
+    assert jwks_server.requests == 2
@@ -348,7 +348,7 @@ class TestJWTService:
         # Payload copied
         self.payload["exp"] = datetime_to_epoch(self.payload["exp"])
 
-        with patch("ellar_jwt.services.PyJWKClient") as mock_jwk_module:
+        with patch("ellar_jwt.jwks.JWKSClient") as mock_jwk_module:
             mock_jwk_client = mock.MagicMock()
             mock_signing_key = mock.MagicMock()
 
@@ -383,7 +383,7 @@ class TestJWTService:
             headers={"kid": "230498151c214b788dd97f22b85410a5"},
         )
 
-        with patch("ellar_jwt.services.PyJWKClient") as mock_jwk_module:
+        with patch("ellar_jwt.jwks.JWKSClient") as mock_jwk_module:
             mock_jwk_client = mock.MagicMock()
 
             mock_jwk_module.return_value = mock_jwk_client
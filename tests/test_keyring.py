@@ -0,0 +1,152 @@
+import time
+from datetime import timedelta
+from unittest.mock import patch
+
+import jwt
+import pytest
+from pydantic import ValidationError
+
+from ellar_jwt import JWTConfiguration
+from ellar_jwt.exceptions import ErrorCode, JWTTokenException
+from ellar_jwt.keyring import Keyring
+
+from .keys import PRIVATE_KEY, PRIVATE_KEY_2, PUBLIC_KEY
+
+
+def test_sign_stamps_the_current_kid_and_decode_selects_key_by_kid(make_service):
+    keyring = Keyring()
+    keyring.add("2024-01", "first-secret")
+    service = make_service(keyring=keyring)
+
+    token = service.sign({"sub": "23"})
+
+    assert jwt.get_unverified_header(token)["kid"] == "2024-01"
+    assert jwt.decode(token, "first-secret", algorithms=["HS256"])["sub"] == "23"
+    assert service.decode(token)["sub"] == "23"
+
+
+def test_rotation_keeps_previous_tokens_valid_until_retirement(make_service):
+    keyring = Keyring()
+    keyring.add("old", "old-secret")
+    service = make_service(keyring=keyring)
+    old_token = service.sign({"sub": "23"})
+
+    keyring.rotate("new", "new-secret", grace=timedelta(minutes=5))
+    new_token = service.sign({"sub": "23"})
+
+    assert jwt.get_unverified_header(new_token)["kid"] == "new"
+    assert service.decode(old_token)["sub"] == "23"
+    assert service.decode(new_token)["sub"] == "23"
+
+    with patch("ellar_jwt.keyring.time.time", return_value=time.time() + 301):
+        with pytest.raises(JWTTokenException) as ex:
+            service.decode(old_token)
+        assert ex.value.code == ErrorCode.KEY_NOT_FOUND
+        assert service.decode(new_token)["sub"] == "23"
+
+
+def test_decode_never_tries_other_keys(make_service):
+    keyring = Keyring()
+    keyring.add("first", "first-secret")
+    keyring.add("second", "second-secret")
+    service = make_service(keyring=keyring)
+
+    # signed with the key of "first", but claiming to be signed by "second"
+    forged = jwt.encode(
+        {"sub": "23"}, "first-secret", algorithm="HS256", headers={"kid": "second"}
+    )
+    with pytest.raises(JWTTokenException) as ex:
+        service.decode(forged)
+    assert ex.value.code == ErrorCode.INVALID_SIGNATURE
+
+    for headers in ({"kid": "unknown"}, None):
+        token = jwt.encode({"sub": "23"}, "first-secret", headers=headers)
+        with pytest.raises(JWTTokenException) as ex:
+            service.decode(token)
+        assert ex.value.code == ErrorCode.KEY_NOT_FOUND
+
+
+def test_sign_with_kid_header_picks_keyring_key(make_service):
+    keyring = Keyring()
+    keyring.add("first", "first-secret")
+    keyring.add("second", "second-secret")
+    keyring.add("public", verifying_key="third-secret")
+    service = make_service(keyring=keyring)
+
+    token = service.sign({"sub": "23"}, headers={"kid": "second"})
+    assert jwt.decode(token, "second-secret", algorithms=["HS256"])["sub"] == "23"
+    assert service.sign_many([{"sub": "23"}], headers={"kid": "second"})[0].startswith(
+        token.split(".")[0]
+    )
+
+    with pytest.raises(ValueError, match="Key 'public' has no signing key"):
+        service.sign({"sub": "23"}, headers={"kid": "public"})
+    with pytest.raises(ValueError, match="Key 'unknown' is not in the keyring"):
+        service.sign({"sub": "23"}, headers={"kid": "unknown"})
+    keyring.retire("first", at=0)
+    with pytest.raises(ValueError, match="Key 'first' is retired"):
+        service.sign({"sub": "23"}, headers={"kid": "first"})
+
+
+def test_removed_key_is_rejected_from_the_token_cache(make_service):
+    keyring = Keyring()
+    keyring.add("first", "first-secret")
+    service = make_service(keyring=keyring, token_cache_size=16)
+    token = service.sign({"sub": "23"})
+    service.decode(token)
+    assert len(service.token_cache) == 1
+
+    keyring.remove("first")
+
+    with pytest.raises(JWTTokenException) as ex:
+        service.decode(token)
+    assert ex.value.code == ErrorCode.KEY_NOT_FOUND
+    with pytest.raises(RuntimeError):
+        service.sign({"sub": "23"})
+
+
+def test_asymmetric_keyring_derives_public_keys(make_service):
+    keyring = Keyring("RS256")
+    keyring.add("rsa-1", PRIVATE_KEY)
+    keyring.add("rsa-2", PRIVATE_KEY_2, current=True)
+    keyring.add("partner", verifying_key=PUBLIC_KEY)
+    service = make_service(keyring=keyring)
+
+    token = service.sign({"sub": "23"})
+    assert jwt.get_unverified_header(token)["kid"] == "rsa-2"
+    assert service.decode(token)["sub"] == "23"
+
+    partner_token = jwt.encode(
+        {"sub": "42"}, PRIVATE_KEY, algorithm="RS256", headers={"kid": "partner"}
+    )
+    assert service.decode(partner_token)["sub"] == "42"
+
+
+def test_keyring_algorithm_must_match_configuration():
+    with pytest.raises(ValidationError, match="keyring holds RS256 keys"):
+        JWTConfiguration(
+            algorithm="HS256", signing_secret_key="", keyring=Keyring("RS256")
+        )
+    with pytest.raises(ValidationError, match="keyring must be a Keyring instance"):
+        JWTConfiguration(signing_secret_key="", keyring={"kid": "secret"})
+
+
+@pytest.mark.asyncio
+async def test_process_workers_pick_up_rotated_keys(make_service):
+    keyring = Keyring()
+    keyring.add("old", "old-secret")
+    service = make_service(keyring=keyring, executor="process", inline_cost_threshold=0)
+    try:
+        old_token = service.sign({"sub": "23"})
+        assert (await service.decode_async(old_token))["sub"] == "23"
+
+        keyring.rotate("new", "new-secret")
+        keyring.remove("old")
+        new_token = await service.sign_async({"sub": "23"})
+
+        assert jwt.get_unverified_header(new_token)["kid"] == "new"
+        assert (await service.decode_async(new_token))["sub"] == "23"
+        with pytest.raises(JWTTokenException):
+            await service.decode_async(old_token)
+    finally:
+        service.executor.shutdown()
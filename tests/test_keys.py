@@ -0,0 +1,145 @@
+from unittest.mock import patch
+
+import pytest
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+from cryptography.hazmat.primitives.serialization import (
+    load_pem_private_key,
+    load_pem_public_key,
+)
+from jwt import algorithms
+
+from ellar_jwt import JWTConfiguration, JWTService
+from ellar_jwt.keys import get_signature_size
+
+from .keys import (
+    ED25519_PRIVATE_KEY,
+    ED25519_PUBLIC_KEY,
+    ES256_PRIVATE_KEY,
+    ES256_PUBLIC_KEY,
+    PRIVATE_KEY,
+    PUBLIC_KEY,
+)
+
+RSA_KEY = load_pem_private_key(PRIVATE_KEY.encode(), password=None)
+
+
+@pytest.mark.parametrize(
+    "algorithm, private_key, public_key, private_type, public_type",
+    [
+        (
+            "RS256",
+            PRIVATE_KEY,
+            PUBLIC_KEY,
+            rsa.RSAPrivateKey,
+            rsa.RSAPublicKey,
+        ),
+        (
+            "ES256",
+            ES256_PRIVATE_KEY,
+            ES256_PUBLIC_KEY,
+            ec.EllipticCurvePrivateKey,
+            ec.EllipticCurvePublicKey,
+        ),
+        (
+            "EdDSA",
+            ED25519_PRIVATE_KEY,
+            ED25519_PUBLIC_KEY,
+            ed25519.Ed25519PrivateKey,
+            ed25519.Ed25519PublicKey,
+        ),
+    ],
+)
+def test_pem_keys_are_loaded_once(
+    algorithm, private_key, public_key, private_type, public_type
+):
+    backend = JWTService(
+        JWTConfiguration(
+            algorithm=algorithm,
+            signing_secret_key=private_key,
+            verifying_secret_key=public_key,
+        )
+    )
+    assert isinstance(backend.plan.signing_key, private_type)
+    assert isinstance(backend.plan.verifying_key, public_type)
+
+    with patch.object(
+        algorithms, "load_pem_private_key", side_effect=AssertionError
+    ), patch.object(algorithms, "load_pem_public_key", side_effect=AssertionError):
+        for _ in range(3):
+            token = backend.sign({"sub": "23"})
+            assert backend.decode(token)["sub"] == "23"
+
+
+def test_configuration_accepts_loaded_key_objects():
+    private_key = load_pem_private_key(PRIVATE_KEY.encode(), password=None)
+    public_key = load_pem_public_key(PUBLIC_KEY.encode())
+    backend = JWTService(
+        JWTConfiguration(
+            algorithm="RS256",
+            signing_secret_key=private_key,
+            verifying_secret_key=public_key,
+        )
+    )
+
+    assert backend.plan.signing_key is private_key
+    assert backend.plan.verifying_key is public_key
+    token = backend.sign({"sub": "23"})
+    assert backend.decode(token)["sub"] == "23"
+
+
+def test_verifying_key_is_derived_from_signing_key():
+    backend = JWTService(
+        JWTConfiguration(algorithm="RS256", signing_secret_key=PRIVATE_KEY)
+    )
+
+    assert isinstance(backend.plan.verifying_key, rsa.RSAPublicKey)
+    token = backend.sign({"sub": "23"})
+    assert backend.decode(token)["sub"] == "23"
+
+
+def test_hmac_keys_are_prepared_as_bytes():
+    backend = JWTService(JWTConfiguration(signing_secret_key="not_secret"))
+
+    assert backend.plan.signing_key == b"not_secret"
+    assert backend.plan.verifying_key == b"not_secret"
+
+
+@pytest.mark.parametrize(
+    "algorithm, signing_key",
+    [
+        ("PS256", RSA_KEY),
+        ("PS512", RSA_KEY),
+        ("EdDSA", ed25519.Ed25519PrivateKey.generate()),
+    ],
+)
+@pytest.mark.asyncio
+async def test_pss_and_eddsa_tokens_round_trip(algorithm, signing_key):
+    backend = JWTService(
+        JWTConfiguration(algorithm=algorithm, signing_secret_key=signing_key)
+    )
+
+    token = backend.sign({"sub": "23"})
+    assert backend.decode(token)["sub"] == "23"
+    token = await backend.sign_async({"sub": "42"})
+    assert (await backend.decode_async(token))["sub"] == "42"
+    tokens = backend.sign_many([{"sub": "1"}, {"sub": "2"}])
+    assert [result.payload["sub"] for result in backend.decode_many(tokens)] == [
+        "1",
+        "2",
+    ]
+
+
+@pytest.mark.parametrize(
+    "algorithm, verifying_key, size",
+    [
+        ("HS384", b"not_secret", 48),
+        ("RS256", RSA_KEY.public_key(), 256),
+        ("PS512", RSA_KEY.public_key(), 256),
+        ("ES256", ec.generate_private_key(ec.SECP256R1()).public_key(), 64),
+        ("ES512", ec.generate_private_key(ec.SECP521R1()).public_key(), 132),
+        ("EdDSA", ed25519.Ed25519PrivateKey.generate().public_key(), 64),
+        ("RS256", b"not a key", None),
+    ],
+)
+def test_signature_size_is_told_from_the_verifying_key(algorithm, verifying_key, size):
+    assert get_signature_size(algorithm, verifying_key) == size
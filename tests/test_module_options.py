@@ -5,6 +5,8 @@ from ellar.testing import Test
 
 from ellar_jwt import JWTModule, JWTService
 
+from .keys import PRIVATE_KEY, PUBLIC_KEY
+
 
 def test_jwt_module_configuration_case_1():
     tm = Test.create_test_module(
@@ -56,3 +58,20 @@ def test_jwt_module_configuration_case_2_fails():
         RuntimeError, match="Could not find `JWT_CONFIG` in application config."
     ):
         tm.get(JWTService)
+
+
+def test_jwt_module_configuration_with_verifying_key():
+    tm = Test.create_test_module(
+        modules=[
+            JWTModule.setup(
+                algorithm="RS256",
+                signing_secret_key=PRIVATE_KEY,
+                verifying_secret_key=PUBLIC_KEY,
+            )
+        ]
+    )
+    jwt_service: JWTService = tm.get(JWTService)
+
+    assert jwt_service.jwt_config.verifying_secret_key == PUBLIC_KEY
+    token = jwt_service.sign({"sub": "23"})
+    assert jwt_service.decode(token)["sub"] == "23"
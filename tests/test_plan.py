@@ -0,0 +1,161 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+import pytest
+
+from ellar_jwt import JWTConfiguration, JWTService
+from ellar_jwt.exceptions import ErrorCode, JWTTokenException
+from ellar_jwt.plan import JWTPlan
+
+from .keys import PRIVATE_KEY, PUBLIC_KEY
+
+SECRET = "not_secret"
+
+
+def test_plan_is_compiled_once_from_configuration():
+    config = JWTConfiguration(
+        algorithm="RS256",
+        signing_secret_key=PRIVATE_KEY,
+        verifying_secret_key=PUBLIC_KEY,
+        audience="openid-client-id",
+        leeway=30,
+    )
+    plan = JWTPlan(config)
+
+    assert plan.algorithms == ["RS256"]
+    assert plan.leeway == timedelta(seconds=30)
+    assert plan.options == {"verify_aud": True, "verify_signature": True}
+    assert plan.unverified_options == {"verify_aud": True, "verify_signature": False}
+
+
+def test_plan_is_immutable():
+    plan = JWTPlan(JWTConfiguration(signing_secret_key=SECRET))
+
+    with pytest.raises(AttributeError, match="JWTPlan is immutable"):
+        plan.algorithm = "HS512"
+
+    with pytest.raises(AttributeError):
+        plan.some_attribute = 1
+
+
+def test_service_helpers_accept_configurations_and_plans():
+    backend = JWTService(
+        JWTConfiguration(
+            algorithm="RS256",
+            signing_secret_key=PRIVATE_KEY,
+            verifying_secret_key=PUBLIC_KEY,
+            leeway=30,
+        )
+    )
+    token = backend.sign({"sub": "23"})
+    config = backend.jwt_config
+
+    for jwt_config in (config, backend.plan, JWTConfiguration(**config.dict())):
+        assert backend.get_leeway(jwt_config) == timedelta(seconds=30)
+        key = backend.get_verifying_key(token, jwt_config)
+        assert key.public_numbers() == backend.plan.verifying_key.public_numbers()
+
+
+def test_hmac_plan_ignores_jwk_url():
+    plan = JWTPlan(
+        JWTConfiguration(
+            signing_secret_key=SECRET,
+            jwk_url="https://randomstring.auth0.com/.well-known/jwks.json",
+        )
+    )
+    assert plan.jwk_url is None
+    assert plan.verifying_key == SECRET.encode()
+
+
+def test_sign_and_decode_without_overrides_skip_configuration_merge():
+    backend = JWTService(JWTConfiguration(signing_secret_key=SECRET))
+
+    with patch.object(
+        backend, "_merge_configurations", wraps=backend._merge_configurations
+    ) as merge:
+        token = backend.sign({"sub": "23"})
+        assert backend.decode(token)["sub"] == "23"
+
+    merge.assert_not_called()
+
+
+def test_override_plans_are_memoized():
+    backend = JWTService(JWTConfiguration(signing_secret_key=SECRET))
+
+    with patch.object(
+        backend, "_merge_configurations", wraps=backend._merge_configurations
+    ) as merge:
+        for _ in range(5):
+            token = backend.sign({"sub": "23"}, algorithm="HS384")
+            assert backend.decode(token, algorithm="HS384")["sub"] == "23"
+
+    assert merge.call_count == 1
+    assert backend.get_plan(algorithm="HS384") is backend.get_plan(algorithm="HS384")
+
+
+def test_override_plan_cache_is_bounded():
+    backend = JWTService(JWTConfiguration(signing_secret_key=SECRET, plan_cache_size=2))
+
+    for leeway in range(5):
+        backend.get_plan(leeway=leeway)
+
+    assert len(backend._plans) == 2
+
+
+def test_unhashable_overrides_are_not_memoized():
+    backend = JWTService(JWTConfiguration(signing_secret_key=SECRET))
+    plan = backend.get_plan(json_encoder={}, jti="id")
+
+    assert plan.jti == "id"
+    assert len(backend._plans) == 0
+
+
+def _make_profiled_backend() -> JWTService:
+    return JWTService(
+        JWTConfiguration(
+            signing_secret_key=SECRET,
+            audience="api",
+            profiles={"admin": {"audience": "admin-api", "issuer": "ellar"}},
+        )
+    )
+
+
+def test_profiles_are_compiled_when_the_service_is_created():
+    backend = _make_profiled_backend()
+    plan = backend.get_plan(profile="admin")
+
+    assert (plan.audience, plan.issuer) == ("admin-api", "ellar")
+    assert backend.get_plan(profile="admin") is plan is backend.profiles["admin"]
+    assert backend.get_plan(profile="admin", leeway=5).audience == "admin-api"
+
+
+@pytest.mark.asyncio
+async def test_decode_with_profile_skips_configuration_merge():
+    backend = _make_profiled_backend()
+    admin_token = backend.sign({"sub": "23"}, profile="admin")
+    token = backend.sign({"sub": "23"}, issuer="ellar")
+
+    with patch.object(
+        backend, "_merge_configurations", wraps=backend._merge_configurations
+    ) as merge:
+        assert backend.decode(admin_token, profile="admin")["aud"] == "admin-api"
+        payload = await backend.decode_async(admin_token, profile="admin")
+        assert payload["iss"] == "ellar"
+        results = await backend.decode_many_async([admin_token], profile="admin")
+        assert results[0].ok
+    merge.assert_not_called()
+
+    with pytest.raises(JWTTokenException) as ex:
+        backend.decode(token, profile="admin")
+    assert ex.value.code == ErrorCode.INVALID_AUDIENCE
+
+
+def test_unknown_profiles_are_rejected():
+    backend = _make_profiled_backend()
+    with pytest.raises(ValueError, match="Unknown JWT profile 'missing'"):
+        backend.get_plan(profile="missing")
+
+    with pytest.raises(ValueError, match="Profile 'admin' can not set 'audiences'"):
+        JWTConfiguration(
+            signing_secret_key=SECRET, profiles={"admin": {"audiences": ""}}
+        )
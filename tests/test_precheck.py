@@ -0,0 +1,170 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+
+from ellar_jwt.exceptions import ErrorCode, JWTTokenException
+from ellar_jwt.precheck import precheck_token
+from ellar_jwt.util import aware_utcnow
+
+from .conftest import JWK_KID, RSA_KEY, SECRET
+from .keys import PRIVATE_KEY_2
+
+
+@pytest.mark.parametrize(
+    "token",
+    ["", "not-a-token", "a.b", "a.b.c.d", ".e30.sig", "e30.e30.", "!!!.e30.sig"],
+)
+def test_malformed_tokens_are_rejected_before_key_resolution(
+    token, make_rsa_service, token_error
+):
+    backend = make_rsa_service()
+    with patch.object(backend, "get_verifying_key") as get_verifying_key:
+        assert token_error(backend.decode, token).code == ErrorCode.MALFORMED
+    get_verifying_key.assert_not_called()
+
+
+def test_oversized_tokens_are_malformed(make_service, token_error):
+    backend = make_service(max_token_size=256)
+    token = backend.sign({"data": "x" * 256})
+    assert token_error(backend.decode, token).code == ErrorCode.MALFORMED
+
+
+def test_large_tokens_decode_with_default_settings(make_service):
+    backend = make_service()
+    payload = {f"claim_{index}": "x" * 100 for index in range(200)}
+
+    token = backend.sign(payload)
+    assert len(token) > 20_000
+    assert backend.decode(token)["claim_199"] == "x" * 100
+
+
+def test_algorithm_mismatch_is_rejected_before_key_resolution(
+    make_rsa_service, token_error
+):
+    backend = make_rsa_service()
+    token = jwt.encode({"sub": "23"}, SECRET, algorithm="HS256")
+
+    with patch.object(backend, "get_verifying_key") as get_verifying_key:
+        error = token_error(backend.decode, token)
+    assert error.code == ErrorCode.INVALID_ALGORITHM
+    assert str(error) == "Invalid algorithm specified"
+    get_verifying_key.assert_not_called()
+
+
+def test_truncated_hmac_signature_is_rejected(make_service, token_error):
+    backend = make_service()
+    token = backend.sign({"sub": "23"})
+    assert token_error(backend.decode, token[:-2]).code == ErrorCode.INVALID_SIGNATURE
+
+
+@pytest.mark.parametrize(
+    "algorithm, signing_key",
+    [
+        ("RS256", RSA_KEY),
+        ("PS256", RSA_KEY),
+        ("ES256", ec.generate_private_key(ec.SECP256R1())),
+        ("EdDSA", ed25519.Ed25519PrivateKey.generate()),
+    ],
+)
+def test_asymmetric_signature_of_the_wrong_length_skips_verification(
+    algorithm, signing_key, make_service, token_error
+):
+    backend = make_service(algorithm=algorithm, signing_secret_key=signing_key)
+    token = backend.sign({"sub": "23"})
+
+    with patch.object(backend, "get_verifying_key") as get_verifying_key:
+        for forged in (token[:-2], token + "AA"):
+            assert (
+                token_error(backend.decode, forged).code == ErrorCode.INVALID_SIGNATURE
+            )
+    get_verifying_key.assert_not_called()
+    assert backend.decode(token)["sub"] == "23"
+
+
+def test_expired_and_immature_tokens_skip_signature_verification(
+    make_rsa_service, token_error
+):
+    # margins far wider than any test run, so slow machines don't flip the outcome
+    backend = make_rsa_service(leeway=600)
+    now = aware_utcnow()
+    expired = jwt.encode({"exp": now - timedelta(seconds=3600)}, RSA_KEY, "RS256")
+    immature = jwt.encode({"nbf": now + timedelta(seconds=3600)}, RSA_KEY, "RS256")
+    within_leeway = jwt.encode({"exp": now - timedelta(seconds=60)}, RSA_KEY, "RS256")
+
+    with patch.object(backend, "get_verifying_key") as get_verifying_key:
+        assert token_error(backend.decode, expired).code == ErrorCode.EXPIRED
+        assert token_error(backend.decode, immature).code == ErrorCode.IMMATURE
+    get_verifying_key.assert_not_called()
+
+    assert "exp" in backend.decode(within_leeway)
+
+
+def test_missing_kid_never_reaches_the_jwk_set(
+    jwks_server, make_rsa_service, token_error
+):
+    backend = make_rsa_service(jwk_url=jwks_server.url)
+    token = jwt.encode({"sub": "23"}, PRIVATE_KEY_2, algorithm="RS256")
+
+    assert token_error(backend.decode, token).code == ErrorCode.KEY_NOT_FOUND
+    assert jwks_server.requests == 0
+
+    token = jwt.encode(
+        {"sub": "23"}, PRIVATE_KEY_2, algorithm="RS256", headers={"kid": JWK_KID}
+    )
+    assert backend.decode(token)["sub"] == "23"
+
+
+@pytest.mark.asyncio
+async def test_async_decodes_reject_junk_without_an_executor_round_trip(
+    make_rsa_service,
+):
+    backend = make_rsa_service()
+    token = backend.sign({"sub": "23"})
+
+    with patch.object(backend.executor, "run", wraps=backend.executor.run) as run:
+        with pytest.raises(JWTTokenException):
+            await backend.decode_async("not-a-token")
+        run.assert_not_called()
+
+        results = await backend.decode_many_async(["junk", token, "a.b.c"])
+    assert [result.ok for result in results] == [False, True, False]
+    assert results[0].error.code == ErrorCode.MALFORMED
+    assert run.call_args.args[2] == [token]
+
+
+@pytest.mark.asyncio
+async def test_async_decodes_precheck_each_token_once(make_rsa_service):
+    backend = make_rsa_service()
+    token = backend.sign({"sub": "23"})
+
+    with patch("ellar_jwt.services.precheck_token", wraps=precheck_token) as prechecks:
+        assert (await backend.decode_async(token))["sub"] == "23"
+        assert prechecks.call_count == 1
+
+        results = await backend.decode_many_async([token, token])
+    assert all(result.ok for result in results)
+    # the executor verifies with the headers pre-checked on the event loop
+    assert prechecks.call_count == 3
+
+
+def test_prechecked_headers_are_copies(make_rsa_service):
+    backend = make_rsa_service()
+    token = backend.sign({"sub": "23"})
+
+    precheck_token(token, backend.plan)["alg"] = "none"
+    assert precheck_token(token, backend.plan)["alg"] == "RS256"
+    assert backend.decode(token)["sub"] == "23"
+
+
+def test_precheck_can_be_disabled(make_rsa_service, token_error):
+    backend = make_rsa_service(precheck=False)
+    token = jwt.encode({"sub": "23"}, SECRET, algorithm="HS256")
+
+    with patch.object(
+        backend, "get_verifying_key", wraps=backend.get_verifying_key
+    ) as get_verifying_key:
+        assert token_error(backend.decode, token).code == ErrorCode.INVALID_ALGORITHM
+    get_verifying_key.assert_called_once()
@@ -0,0 +1,126 @@
+import time
+from datetime import timedelta
+from unittest.mock import patch
+
+import pytest
+
+from ellar_jwt import JWTConfiguration, JWTService
+from ellar_jwt.exceptions import ErrorCode, JWTTokenException
+from ellar_jwt.refresh import InMemoryRefreshTokenStore, TokenPairService
+
+SECRET = "not_secret"
+
+
+@pytest.fixture
+def pair_service():
+    jwt_service = JWTService(
+        JWTConfiguration(signing_secret_key=SECRET, lifetime=timedelta(minutes=5))
+    )
+    return TokenPairService(jwt_service, refresh_lifetime=timedelta(days=7))
+
+
+def test_issue_returns_access_and_refresh_tokens(pair_service):
+    pair = pair_service.issue({"sub": "user-1"})
+
+    access = pair_service.decode_access(pair.access_token)
+    refresh = pair_service.jwt_service.decode(
+        pair.refresh_token, accept_refresh_tokens=True
+    )
+
+    assert access["sub"] == "user-1"
+    assert access["token_type"] == "access"
+    assert refresh["token_type"] == "refresh"
+    assert refresh["fam"] and refresh["jti"]
+    assert refresh["exp"] - refresh["iat"] == int(timedelta(days=7).total_seconds())
+    assert access["exp"] - access["iat"] == int(timedelta(minutes=5).total_seconds())
+
+
+def test_rotate_carries_claims_into_the_same_family(pair_service):
+    pair = pair_service.issue({"sub": "user-1", "role": "admin"})
+    new_pair = pair_service.rotate(pair.refresh_token)
+
+    old_refresh = pair_service.jwt_service.decode(
+        pair.refresh_token, accept_refresh_tokens=True
+    )
+    new_refresh = pair_service.jwt_service.decode(
+        new_pair.refresh_token, accept_refresh_tokens=True
+    )
+    access = pair_service.decode_access(new_pair.access_token)
+
+    assert new_refresh["fam"] == old_refresh["fam"]
+    assert new_refresh["jti"] != old_refresh["jti"]
+    assert access["sub"] == "user-1"
+    assert access["role"] == "admin"
+    assert "fam" not in access
+
+
+def test_refresh_token_reuse_revokes_the_family(pair_service):
+    pair = pair_service.issue({"sub": "user-1"})
+    new_pair = pair_service.rotate(pair.refresh_token)
+
+    with pytest.raises(JWTTokenException, match="Refresh token reuse detected"):
+        pair_service.rotate(pair.refresh_token)
+
+    family = pair_service.jwt_service.decode(
+        pair.refresh_token, accept_refresh_tokens=True
+    )["fam"]
+    assert pair_service.store.is_family_revoked(family)
+    # the legitimate holder of the latest refresh token is locked out as well
+    with pytest.raises(JWTTokenException, match="Refresh token reuse detected"):
+        pair_service.rotate(new_pair.refresh_token)
+
+
+def test_rotate_rejects_access_tokens(pair_service):
+    pair = pair_service.issue({"sub": "user-1"})
+
+    with pytest.raises(JWTTokenException, match="Token is not a refresh token"):
+        pair_service.rotate(pair.access_token)
+
+
+def test_decode_access_rejects_refresh_tokens_without_the_store(pair_service):
+    pair = pair_service.issue({"sub": "user-1"})
+
+    with patch.object(pair_service, "store") as store:
+        assert pair_service.decode_access(pair.access_token)["sub"] == "user-1"
+        with pytest.raises(JWTTokenException, match="Token is not an access token"):
+            pair_service.decode_access(pair.refresh_token)
+    assert not store.mock_calls
+
+
+@pytest.mark.asyncio
+async def test_refresh_tokens_do_not_pass_for_access_tokens(pair_service):
+    jwt_service = pair_service.jwt_service
+    refresh_token = pair_service.issue({"sub": "user-1"}).refresh_token
+
+    with pytest.raises(JWTTokenException) as ex:
+        jwt_service.decode(refresh_token)
+    assert ex.value.code == ErrorCode.WRONG_TOKEN_TYPE
+    with pytest.raises(JWTTokenException, match="Token is not an access token"):
+        await jwt_service.decode_async(refresh_token)
+    with pytest.raises(JWTTokenException, match="Token is not an access token"):
+        jwt_service.decode(refresh_token, precheck=False)
+    assert not jwt_service.decode_many([refresh_token])[0].ok
+
+
+def test_in_memory_store_purges_expired_families():
+    store = InMemoryRefreshTokenStore()
+    now = time.time()
+    store.create_family("active", "jti-1", now + 60)
+    store.create_family("expired", "jti-2", now - 1)
+
+    assert store.purge() == 1
+    assert len(store) == 1
+    assert store.rotate("active", "jti-1", "jti-3", now + 60)
+    assert not store.rotate("active", "jti-1", "jti-4", now + 60)
+
+
+@pytest.mark.asyncio
+async def test_async_issue_and_rotate(pair_service):
+    pair = await pair_service.issue_async({"sub": "user-1"})
+    new_pair = await pair_service.rotate_async(pair.refresh_token)
+
+    access = await pair_service.decode_access_async(new_pair.access_token)
+    assert access["sub"] == "user-1"
+
+    with pytest.raises(JWTTokenException, match="Refresh token reuse detected"):
+        await pair_service.rotate_async(pair.refresh_token)
@@ -0,0 +1,248 @@
+import math
+import time
+from datetime import timedelta
+from unittest.mock import patch
+
+import jwt
+import pytest
+
+from ellar_jwt import JWTConfiguration, JWTService
+from ellar_jwt.exceptions import JWTTokenException
+from ellar_jwt.revocation import (
+    BloomFilter,
+    InMemoryRevocationStore,
+    SQLiteRevocationStore,
+)
+
+from .keys import PRIVATE_KEY, PUBLIC_KEY
+
+SECRET = "not_secret"
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    keys = [f"jti-{index}" for index in range(1000)]
+    for key in keys:
+        bloom.add(key)
+
+    assert all(key in bloom for key in keys)
+    false_positives = sum(f"other-{index}" in bloom for index in range(10000))
+    assert false_positives < 300
+
+
+def test_in_memory_store_expires_revocations():
+    store = InMemoryRevocationStore()
+    now = time.time()
+
+    store.revoke("active", now + 60)
+    store.revoke("expired", now - 1)
+    store.revoke("forever")
+
+    assert store.is_revoked("active")
+    assert store.is_revoked("forever")
+    assert not store.is_revoked("expired")
+    assert not store.is_revoked("unknown")
+
+    with patch("ellar_jwt.revocation.time.time", return_value=now + 120):
+        assert not store.is_revoked("active")
+        # "expired" was already purged by the later revoke calls
+        assert store.purge() == 1
+    assert len(store) == 1
+
+
+def test_in_memory_store_answers_not_revoked_from_bloom_filter():
+    store = InMemoryRevocationStore()
+    store.revoke("revoked")
+
+    with patch.object(store, "_revoked") as revoked:
+        assert not store.is_revoked("not-revoked")
+    revoked.get.assert_not_called()
+
+
+def test_in_memory_store_grows_its_bloom_filter():
+    store = InMemoryRevocationStore(capacity=10)
+    for index in range(50):
+        store.revoke(f"jti-{index}")
+
+    assert all(store.is_revoked(f"jti-{index}") for index in range(50))
+    assert store._bloom.capacity >= 50
+
+
+def test_sqlite_store_is_shared_and_persistent(tmp_path):
+    path = str(tmp_path / "revocations.db")
+    store_1 = SQLiteRevocationStore(path)
+    store_2 = SQLiteRevocationStore(path)
+
+    store_1.revoke("jti-1", time.time() + 60)
+    store_1.revoke("jti-expired", time.time() - 1)
+
+    assert store_2.is_revoked("jti-1")
+    assert not store_2.is_revoked("jti-expired")
+    assert not store_2.is_revoked("jti-2")
+
+    store_1.close()
+    store_2.close()
+
+    restarted = SQLiteRevocationStore(path)
+    assert restarted.is_revoked("jti-1")
+    assert restarted.purge() == 1
+    assert restarted.is_revoked("jti-1")
+    restarted.close()
+
+
+def test_sqlite_store_sync_interval(tmp_path):
+    path = str(tmp_path / "revocations.db")
+    writer = SQLiteRevocationStore(path)
+    reader = SQLiteRevocationStore(path, sync_interval=3600)
+
+    assert not reader.is_revoked("jti-1")
+    writer.revoke("jti-1")
+    # not pulled into the reader's bloom filter until the next sync
+    assert not reader.is_revoked("jti-1")
+    reader._sync(force=True)
+    assert reader.is_revoked("jti-1")
+
+
+def test_sqlite_store_does_not_query_on_every_check(tmp_path):
+    store = SQLiteRevocationStore(str(tmp_path / "revocations.db"))
+    assert store.sync_interval == 1
+
+    with patch.object(time, "monotonic", return_value=1000.0):
+        assert not store.is_revoked("jti-1")
+        with patch.object(store, "_connection", side_effect=AssertionError):
+            for _ in range(10):
+                assert not store.is_revoked("jti-1")
+
+    with patch.object(time, "monotonic", return_value=1001.0):
+        store.revoke("jti-2")
+        assert store.is_revoked("jti-2")
+
+
+@pytest.mark.parametrize(
+    "store_factory",
+    [
+        lambda tmp_path: InMemoryRevocationStore(),
+        lambda tmp_path: SQLiteRevocationStore(str(tmp_path / "revocations.db")),
+    ],
+)
+def test_decode_rejects_revoked_tokens(tmp_path, store_factory):
+    store = store_factory(tmp_path)
+    backend = JWTService(
+        JWTConfiguration(
+            signing_secret_key=SECRET, revocation_store=store, token_cache_size=8
+        )
+    )
+    token = backend.sign({"sub": "23"})
+    other_token = backend.sign({"sub": "24"})
+    backend.decode(token)
+
+    jti = backend.revoke(token)
+
+    assert jti == jwt.decode(token, SECRET, algorithms=["HS256"])["jti"]
+    with pytest.raises(JWTTokenException, match="Token has been revoked"):
+        backend.decode(token)
+    assert backend.decode(other_token)["sub"] == "24"
+    assert backend.decode(token, verify=False)["sub"] == "23"
+    assert not backend.decode_many([token])[0].ok
+
+
+def test_revoked_token_cached_before_revocation_is_rejected():
+    store = InMemoryRevocationStore()
+    backend = JWTService(
+        JWTConfiguration(
+            signing_secret_key=SECRET, revocation_store=store, token_cache_size=8
+        )
+    )
+    token = backend.sign({"sub": "23"})
+    backend.decode(token)
+
+    store.revoke(jwt.decode(token, SECRET, algorithms=["HS256"])["jti"])
+
+    with pytest.raises(JWTTokenException, match="Token has been revoked"):
+        backend.decode(token)
+
+
+def test_revocation_lasts_until_token_expiry():
+    store = InMemoryRevocationStore()
+    backend = JWTService(
+        JWTConfiguration(
+            signing_secret_key=SECRET,
+            revocation_store=store,
+            leeway=10,
+            lifetime=timedelta(minutes=1),
+        )
+    )
+    token = backend.sign({"sub": "23"})
+    backend.revoke(token)
+
+    exp = jwt.decode(token, SECRET, algorithms=["HS256"])["exp"]
+    assert store._revoked.popitem()[1] == exp + 10
+
+    token = jwt.encode({"jti": "no-exp"}, SECRET, algorithm="HS256")
+    backend.revoke(token)
+    assert store._revoked["no-exp"] == math.inf
+
+
+@pytest.mark.asyncio
+async def test_decode_async_rejects_revoked_tokens():
+    backend = JWTService(
+        JWTConfiguration(
+            algorithm="RS256",
+            signing_secret_key=PRIVATE_KEY,
+            verifying_secret_key=PUBLIC_KEY,
+            revocation_store=InMemoryRevocationStore(),
+        )
+    )
+    token = backend.sign({"sub": "23"})
+    backend.revoke(token)
+
+    with pytest.raises(JWTTokenException, match="Token has been revoked"):
+        await backend.decode_async(token)
+
+
+def test_revoke_requires_a_store_and_a_jti():
+    backend = JWTService(JWTConfiguration(signing_secret_key=SECRET))
+    with pytest.raises(RuntimeError, match="No `revocation_store` is configured."):
+        backend.revoke(backend.sign({}))
+
+    backend = JWTService(
+        JWTConfiguration(
+            signing_secret_key=SECRET, revocation_store=InMemoryRevocationStore()
+        )
+    )
+    token = jwt.encode({"sub": "23"}, SECRET, algorithm="HS256")
+    with pytest.raises(JWTTokenException, match="Token has no 'jti' claim"):
+        backend.revoke(token)
+
+
+def test_invalid_revocation_store_raises():
+    with pytest.raises(ValueError, match="revocation_store must be"):
+        JWTConfiguration(signing_secret_key=SECRET, revocation_store=object())
+
+
+@pytest.mark.asyncio
+async def test_decode_many_async_rejects_revoked_tokens_with_process_executor():
+    backend = JWTService(
+        JWTConfiguration(
+            algorithm="RS256",
+            signing_secret_key=PRIVATE_KEY,
+            verifying_secret_key=PUBLIC_KEY,
+            revocation_store=InMemoryRevocationStore(),
+            token_cache_size=8,
+            executor="process",
+            executor_max_workers=1,
+        )
+    )
+    try:
+        revoked, valid = backend.sign({"sub": "23"}), backend.sign({"sub": "24"})
+        backend.revoke(revoked)
+
+        results = await backend.decode_many_async([revoked, valid, "invalid"])
+        assert [result.ok for result in results] == [False, True, False]
+        assert str(results[0].error) == "Token has been revoked"
+
+        # the verified token is now answered from the parent's cache
+        assert (await backend.decode_many_async([valid]))[0].payload["sub"] == "24"
+        assert backend.token_cache.stats().hits == 1
+    finally:
+        backend.executor.shutdown()
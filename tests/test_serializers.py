@@ -0,0 +1,162 @@
+import base64
+import json
+import uuid
+from dataclasses import dataclass
+from unittest.mock import patch
+
+import jwt
+import pytest
+from jwt.api_jwt import PyJWT
+from pydantic import ValidationError
+
+from ellar_jwt import JWTConfiguration, JWTService
+from ellar_jwt.exceptions import JWTTokenException
+from ellar_jwt.serializers import (
+    OrjsonSerializer,
+    StdlibJSONSerializer,
+    create_serializer,
+    is_available,
+    is_json_native,
+)
+
+SECRET = "not_secret"
+
+orjson_only = pytest.mark.skipif(
+    not is_available("orjson"), reason="orjson is not installed"
+)
+
+
+class CustomEncoder(json.JSONEncoder):
+    def default(self, o):
+        if isinstance(o, uuid.UUID):
+            return f"uuid:{o.hex}"
+        return super().default(o)
+
+
+@dataclass
+class Profile:
+    name: str
+    uid: uuid.UUID
+
+
+def _payload_segment(token: str) -> bytes:
+    segment = token.split(".")[1]
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+def test_stdlib_serializer_matches_pyjwt():
+    claims = {"sub": "23", "scopes": ["read", "write"], "meta": {"é": 1.5, "n": None}}
+    assert StdlibJSONSerializer().dumps(claims) == PyJWT()._encode_payload(claims)
+
+    backend = JWTService(JWTConfiguration(signing_secret_key=SECRET))
+    token = backend.sign(claims)
+    decoded = jwt.decode(token, SECRET, algorithms=["HS256"])
+    assert _payload_segment(token) == PyJWT()._encode_payload(decoded)
+    assert backend.plan.jwt_api is None
+
+
+def test_is_json_native():
+    assert is_json_native({"a": [1, 2.5, True, None, ("x", {"b": "c"})]})
+    assert not is_json_native({1: "int key"})
+    assert not is_json_native({"uid": uuid.uuid4()})
+    assert not is_json_native({"profile": Profile("a", uuid.uuid4())})
+
+
+def test_json_native_payloads_skip_serialize_object():
+    backend = JWTService(JWTConfiguration(signing_secret_key=SECRET))
+    payload = {"sub": "23", "roles": ["admin"]}
+
+    with patch("ellar_jwt.services.serialize_object") as serialize_object:
+        token = backend.sign(payload)
+        backend.sign_many([payload])
+    serialize_object.assert_not_called()
+
+    assert backend.decode(token)["roles"] == ["admin"]
+    assert payload == {"sub": "23", "roles": ["admin"]}
+
+
+@pytest.mark.parametrize(
+    "serializer", ["json", pytest.param("orjson", marks=orjson_only)]
+)
+def test_non_native_payloads_are_serialized(serializer):
+    backend = JWTService(
+        JWTConfiguration(signing_secret_key=SECRET, serializer=serializer)
+    )
+    uid = uuid.uuid4()
+
+    payload = backend.decode(backend.sign({"profile": Profile("ellar", uid), 1: "a"}))
+
+    assert payload["profile"] == {"name": "ellar", "uid": str(uid)}
+    assert payload["1"] == "a"
+
+
+@orjson_only
+def test_orjson_tokens_are_interchangeable_with_stdlib_tokens():
+    orjson_backend = JWTService(
+        JWTConfiguration(signing_secret_key=SECRET, serializer="orjson")
+    )
+    json_backend = JWTService(JWTConfiguration(signing_secret_key=SECRET))
+    claims = {"sub": "23", "scopes": ["read"], "meta": {"ratio": 0.5, "on": True}}
+
+    token = orjson_backend.sign(claims)
+    [batch_token] = orjson_backend.sign_many([claims])
+
+    assert isinstance(orjson_backend.plan.serializer, OrjsonSerializer)
+    for signed in (token, batch_token):
+        assert json_backend.decode(signed)["meta"] == claims["meta"]
+    assert orjson_backend.decode(json_backend.sign(claims))["scopes"] == ["read"]
+
+
+@orjson_only
+def test_orjson_serializer_rejects_invalid_payloads():
+    backend = JWTService(
+        JWTConfiguration(signing_secret_key=SECRET, serializer="orjson")
+    )
+    header, _, _ = backend.sign({}).split(".")
+    payload = base64.urlsafe_b64encode(b"[1, 2]").rstrip(b"=").decode()
+    signing_input = f"{header}.{payload}".encode()
+    signature = backend.plan.algorithm_obj.sign(signing_input, SECRET.encode())
+    token = f"{header}.{payload}.{jwt.utils.base64url_encode(signature).decode()}"
+
+    with pytest.raises(JWTTokenException, match="Token is invalid or expired"):
+        backend.decode(token)
+
+
+@orjson_only
+def test_custom_json_encoder_is_used_by_orjson():
+    class Money:
+        cents = 150
+
+    class MoneyEncoder(json.JSONEncoder):
+        def default(self, o):
+            if isinstance(o, Money):
+                return o.cents
+            return super().default(o)
+
+    serializer = create_serializer("orjson", MoneyEncoder)
+
+    assert serializer.dumps({"price": Money()}) == b'{"price":150}'
+    with pytest.raises(TypeError):
+        serializer.dumps({"value": object()})
+
+
+def test_auto_serializer_keeps_custom_json_encoder_on_stdlib():
+    serializer = create_serializer("auto", CustomEncoder)
+    assert type(serializer) is StdlibJSONSerializer
+    assert serializer.dumps({"uid": uuid.UUID(int=1)}) == (
+        b'{"uid":"uuid:00000000000000000000000000000001"}'
+    )
+
+    expected = "orjson" if is_available("orjson") else "json"
+    if not is_available("orjson") and is_available("msgspec"):
+        expected = "msgspec"
+    assert create_serializer("auto").name == expected
+
+
+def test_invalid_serializer():
+    with pytest.raises(ValidationError, match="serializer must be 'json'"):
+        JWTConfiguration(signing_secret_key=SECRET, serializer="pickle")
+
+    if not is_available("msgspec"):
+        with pytest.raises(ValidationError, match="You must have msgspec installed"):
+            JWTConfiguration(signing_secret_key=SECRET, serializer="msgspec")
@@ -0,0 +1,230 @@
+import re
+from calendar import timegm
+from datetime import datetime, timedelta, timezone
+
+import jwt
+import pytest
+
+from ellar_jwt import JWTConfiguration, JWTService
+from ellar_jwt.clock import FakeClock
+from ellar_jwt.plan import JWTPlan
+from ellar_jwt.token import Token, generate_compact_jti, generate_jti
+
+SECRET = "not_secret"
+NOW = datetime(2024, 1, 1, 12, 0, 0, 999_999, tzinfo=timezone.utc)
+
+
+def _legacy_claims(current_time: datetime, lifetime: timedelta):
+    # what `Token` computed with datetime math before the epoch fast path
+    return {
+        "exp": timegm((current_time + lifetime).utctimetuple()),
+        "iat": timegm(current_time.utctimetuple()),
+    }
+
+
+@pytest.mark.parametrize(
+    "lifetime",
+    [
+        timedelta(minutes=5),
+        timedelta(days=1, seconds=1),
+        timedelta(seconds=0.5),
+        timedelta(microseconds=1),
+        timedelta(seconds=-10),
+    ],
+)
+@pytest.mark.parametrize(
+    "current_time",
+    [NOW, NOW.replace(microsecond=0), NOW.replace(microsecond=500_000)],
+)
+def test_epoch_claims_match_datetime_math(current_time, lifetime):
+    config = JWTConfiguration(signing_secret_key=SECRET, lifetime=lifetime)
+
+    payload = Token(config, current_time=current_time).build({})
+
+    expected = _legacy_claims(current_time, lifetime)
+    assert {"exp": payload["exp"], "iat": payload["iat"]} == expected
+    assert type(payload["exp"]) is int and type(payload["iat"]) is int
+
+
+def test_explicit_times_still_use_datetimes():
+    token = Token(JWTConfiguration(signing_secret_key=SECRET), current_time=NOW)
+    token.set_exp("refresh_exp", lifetime=timedelta(days=1))
+    token.set_iat("auth_time", at_time=NOW - timedelta(hours=1))
+
+    assert token.current_time == NOW
+    assert token.payload == {
+        "refresh_exp": timegm((NOW + timedelta(days=1)).utctimetuple()),
+        "auth_time": timegm((NOW - timedelta(hours=1)).utctimetuple()),
+    }
+
+
+def test_current_time_can_be_reassigned():
+    token = Token(JWTConfiguration(signing_secret_key=SECRET))
+
+    token.current_time = NOW
+    assert token.current_time == NOW
+    token.set_iat()
+    assert token.payload["iat"] == timegm(NOW.utctimetuple())
+
+    token.current_time = NOW.timestamp() + 60
+    assert token.current_time == NOW + timedelta(seconds=60)
+
+
+def test_jti_has_uuid4_hex_format():
+    jtis = {generate_jti() for _ in range(100)}
+    assert len(jtis) == 100
+    assert all(re.fullmatch("[0-9a-f]{32}", jti) for jti in jtis)
+
+
+def test_fake_clock_drives_issued_tokens():
+    clock = FakeClock(NOW)
+    service = JWTService(JWTConfiguration(signing_secret_key=SECRET, clock=clock))
+
+    options = {"verify_exp": False}
+    first = jwt.decode(
+        service.sign({"sub": "23"}), SECRET, algorithms=["HS256"], options=options
+    )
+    clock.advance(timedelta(seconds=30))
+    later = [
+        jwt.decode(token, SECRET, algorithms=["HS256"], options=options)
+        for token in service.sign_many([{"sub": "23"}, {"sub": "42"}])
+    ]
+
+    assert first["iat"] == timegm(NOW.utctimetuple())
+    assert first["exp"] == first["iat"] + 300
+    assert [claims["iat"] for claims in later] == [first["iat"] + 30] * 2
+
+
+def test_clock_must_be_callable():
+    with pytest.raises(ValueError, match="clock must be a callable"):
+        JWTConfiguration(signing_secret_key=SECRET, clock=1700000000)
+
+
+def test_plan_template_builds_the_same_claims_as_the_configuration():
+    config = JWTConfiguration(
+        signing_secret_key=SECRET, audience="api", issuer="ellar", jti="id"
+    )
+    payload = {"sub": "23", "aud": "other"}
+
+    from_config = Token(config, current_time=NOW).build(dict(payload))
+    from_plan = Token(JWTPlan(config), current_time=NOW).build(dict(payload))
+
+    assert (
+        list(from_plan)
+        == list(from_config)
+        == ["exp", "iat", "id", "sub", "aud", "iss"]
+    )
+    assert from_plan["aud"] == "api"
+    assert {**from_plan, "id": None} == {**from_config, "id": None}
+
+
+def test_default_claims_and_headers_are_added_to_every_token():
+    service = JWTService(
+        JWTConfiguration(
+            signing_secret_key=SECRET,
+            audience="api",
+            default_claims={"tenant": "acme", "env": "prod", "aud": "ignored"},
+            default_headers={"kid": "k1", "typ": "at+jwt"},
+        )
+    )
+
+    tokens = [
+        service.sign({"sub": "23", "env": "staging"}),
+        *service.sign_many([{"sub": "23", "env": "staging"}]),
+    ]
+    for token in tokens:
+        claims = jwt.decode(token, SECRET, algorithms=["HS256"], audience="api")
+        assert (claims["tenant"], claims["env"], claims["aud"]) == (
+            "acme",
+            "staging",
+            "api",
+        )
+        assert jwt.get_unverified_header(token) == {
+            "alg": "HS256",
+            "kid": "k1",
+            "typ": "at+jwt",
+        }
+
+    token = service.sign({"sub": "23"}, headers={"kid": "k2"})
+    assert jwt.get_unverified_header(token)["kid"] == "k2"
+    assert (
+        service.sign_many([{}], headers={"kid": "k2"})[0].split(".")[0]
+        == (token.split(".")[0])
+    )
+
+
+def test_default_headers_can_not_change_algorithm():
+    with pytest.raises(ValueError, match="default_headers can not set 'alg'"):
+        JWTConfiguration(signing_secret_key=SECRET, default_headers={"alg": "none"})
+
+
+def test_compact_jti_is_shorter():
+    jtis = {generate_compact_jti() for _ in range(100)}
+    assert len(jtis) == 100
+    assert all(re.fullmatch("[A-Za-z0-9_-]{16}", jti) for jti in jtis)
+
+
+def test_compact_tokens_alias_claims_and_decode_expands_them():
+    service = JWTService(
+        JWTConfiguration(
+            signing_secret_key=SECRET,
+            claim_aliases={"tenant": "tn", "permissions": "p"},
+            default_claims={"tenant": "acme"},
+            default_headers={"typ": None},
+        )
+    )
+    payload = {"sub": "23", "permissions": ["read"], "nbf": 1700000000.25}
+
+    token = service.sign(payload, compact=True)
+    regular = service.sign(payload)
+
+    raw = jwt.decode(token, SECRET, algorithms=["HS256"])
+    assert set(raw) == {"exp", "iat", "jti", "tn", "sub", "p", "nbf"}
+    assert raw["nbf"] == 1700000001
+    assert len(raw["jti"]) == 16
+    assert jwt.get_unverified_header(token) == {"alg": "HS256"}
+    assert len(token) < len(regular)
+
+    for claims in (
+        service.decode(token),
+        service.decode_many([token])[0].payload,
+        service.decode(service.sign_many([payload], compact=True)[0]),
+    ):
+        assert claims["tenant"] == "acme"
+        assert claims["permissions"] == ["read"]
+        assert "tn" not in claims and "p" not in claims
+    assert service.decode(regular)["tenant"] == "acme"
+
+
+@pytest.mark.asyncio
+async def test_compact_tokens_of_a_profile_round_trip_async():
+    service = JWTService(
+        JWTConfiguration(
+            signing_secret_key=SECRET,
+            profiles={"mesh": {"compact": True, "claim_aliases": {"tenant": "tn"}}},
+        )
+    )
+
+    tokens = [
+        await service.sign_async({"tenant": "acme"}, profile="mesh"),
+        *service.sign_many([{"tenant": "acme"}], profile="mesh"),
+    ]
+    for token in tokens:
+        assert "tn" in jwt.decode(token, SECRET, algorithms=["HS256"])
+        claims = await service.decode_async(token, profile="mesh")
+        assert claims["tenant"] == "acme"
+
+
+@pytest.mark.parametrize(
+    "claim_aliases, message",
+    [
+        ({"exp": "e"}, "claim_aliases can not rename 'exp'"),
+        ({"tenant": "sub"}, "claim_aliases can not rename 'sub'"),
+        ({"tenant": "t", "team": "t"}, "must be unique"),
+        ({"tenant": "team", "team": "tm"}, "must be unique"),
+        ({"tenant": ""}, "must map claim names to short names"),
+    ],
+)
+def test_claim_aliases_are_validated(claim_aliases, message):
+    with pytest.raises(ValueError, match=message):
+        JWTConfiguration(signing_secret_key=SECRET, claim_aliases=claim_aliases)
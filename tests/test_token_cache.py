@@ -0,0 +1,157 @@
+import time
+from datetime import timedelta
+from unittest.mock import patch
+
+import jwt
+import pytest
+
+from ellar_jwt.cache import VerifiedTokenCache
+from ellar_jwt.exceptions import ErrorCode, JWTTokenException
+from ellar_jwt.util import aware_utcnow
+
+from .conftest import SECRET
+
+
+def test_token_cache_is_disabled_by_default(make_service):
+    backend = make_service()
+    assert backend.token_cache is None
+    assert backend.invalidate_token("token") is False
+
+
+def test_repeated_decode_is_served_from_cache(make_service):
+    backend = make_service(token_cache_size=8)
+    token = backend.sign({"sub": "23"})
+
+    with patch.object(jwt, "decode", wraps=jwt.decode) as decode:
+        for _ in range(5):
+            assert backend.decode(token)["sub"] == "23"
+
+    assert decode.call_count == 1
+    stats = backend.token_cache.stats()
+    assert (stats.hits, stats.misses, stats.size) == (4, 1, 1)
+    assert stats.hit_rate == 0.8
+
+
+def test_cached_claims_are_copies(make_service):
+    backend = make_service(token_cache_size=8)
+    token = backend.sign({"sub": "23"})
+
+    backend.decode(token)["sub"] = "mutated"
+    assert backend.decode(token)["sub"] == "23"
+
+
+def test_nested_cached_claims_are_copies(make_service):
+    backend = make_service(token_cache_size=8)
+    token = backend.sign({"sub": "23", "roles": ["user"], "org": {"id": 1}})
+
+    payload = backend.decode(token)
+    payload["roles"].append("admin")
+    payload["org"]["id"] = 2
+    payload = backend.decode(token)
+    assert (payload["roles"], payload["org"]) == (["user"], {"id": 1})
+
+
+@pytest.mark.parametrize("token", [None, 123, ["a.b.c"]])
+@pytest.mark.asyncio
+async def test_non_string_tokens_are_malformed_with_the_cache(
+    token, make_service, token_error
+):
+    backend = make_service(token_cache_size=8)
+
+    assert token_error(backend.decode, token).code == ErrorCode.MALFORMED
+    with pytest.raises(JWTTokenException) as ex:
+        await backend.decode_async(token)
+    assert ex.value.code == ErrorCode.MALFORMED
+    results = await backend.decode_many_async([token, backend.sign({"sub": "23"})])
+    assert results[0].error.code == ErrorCode.MALFORMED
+    assert results[1].payload["sub"] == "23"
+
+
+def test_bytes_tokens_share_the_entry_of_their_str(make_service):
+    backend = make_service(token_cache_size=8)
+    token = backend.sign({"sub": "23"})
+
+    assert backend.decode(token.encode())["sub"] == "23"
+    assert backend.decode(token)["sub"] == "23"
+    stats = backend.token_cache.stats()
+    assert (stats.hits, stats.misses, stats.size) == (1, 1, 1)
+    assert backend.invalidate_token(token.encode()) is True
+
+
+def test_unverified_decode_is_not_cached(make_service):
+    backend = make_service(token_cache_size=8)
+    backend.decode(backend.sign({"sub": "23"}), verify=False)
+    assert len(backend.token_cache) == 0
+
+
+def test_cache_entries_are_tied_to_their_plan(make_service):
+    backend = make_service(token_cache_size=8)
+    token = backend.sign({"sub": "23"})
+    backend.decode(token)
+
+    with pytest.raises(JWTTokenException):
+        backend.decode(token, algorithm="HS384")
+
+
+def test_invalidate_token(make_service):
+    backend = make_service(token_cache_size=8)
+    token = backend.sign({"sub": "23"})
+    backend.decode(token)
+
+    assert backend.invalidate_token(token) is True
+    assert backend.invalidate_token(token) is False
+    assert len(backend.token_cache) == 0
+
+
+def test_cache_entry_expires_with_token_exp_and_leeway():
+    cache = VerifiedTokenCache(ttl=300)
+    now = time.time()
+
+    cache.set("expired", None, {"exp": now - 10}, leeway=5)
+    assert cache.get("expired", None) is None
+
+    cache.set("in-leeway", None, {"exp": now - 10}, leeway=20)
+    assert cache.get("in-leeway", None) == {"exp": now - 10}
+
+    cache.set("no-exp", None, {"sub": "23"})
+    with patch("ellar_jwt.cache.time.time", return_value=now + 301):
+        assert cache.get("no-exp", None) is None
+        assert cache.get("in-leeway", None) is None
+
+
+def test_expired_token_is_rejected_after_cache_entry_expires(make_service):
+    backend = make_service(token_cache_size=8)
+    token = jwt.encode(
+        {"sub": "23", "exp": aware_utcnow() + timedelta(seconds=30)},
+        SECRET,
+        algorithm="HS256",
+    )
+    backend.decode(token)
+
+    with patch("ellar_jwt.cache.time.time", return_value=time.time() + 60):
+        assert backend.token_cache.get(token, backend.plan) is None
+
+
+def test_cache_is_bounded_by_size_and_bytes():
+    cache = VerifiedTokenCache(maxsize=2)
+    for index in range(4):
+        cache.set(f"token-{index}", None, {"sub": index})
+    assert len(cache) == 2
+    assert cache.get("token-0", None) is None
+    assert cache.get("token-3", None) == {"sub": 3}
+
+    cache = VerifiedTokenCache(maxsize=100, max_bytes=1000)
+    for index in range(50):
+        cache.set(f"token-{index}", None, {"sub": index})
+    assert 0 < cache.stats().bytes <= 1000
+    assert len(cache) < 50
+
+
+@pytest.mark.asyncio
+async def test_decode_async_cache_hits_skip_the_executor(make_rsa_service):
+    backend = make_rsa_service(token_cache_size=8)
+    token = backend.sign({"sub": "23"})
+    assert (await backend.decode_async(token))["sub"] == "23"
+
+    with patch.object(backend.executor, "run", side_effect=AssertionError):
+        assert (await backend.decode_async(token))["sub"] == "23"